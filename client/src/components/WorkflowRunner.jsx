@@ -12,6 +12,7 @@ export default function WorkflowRunner() {
   const [steps, setSteps] = useState([])
   const [events, setEvents] = useState([])
   const [artifacts, setArtifacts] = useState({})
+  const [drafts, setDrafts] = useState({})
   const [finalDoc, setFinalDoc] = useState('')
   const [error, setError] = useState('')
   const [isSubmitting, setIsSubmitting] = useState(false)
@@ -23,6 +24,7 @@ export default function WorkflowRunner() {
   const [idePrompt, setIdePrompt] = useState('')
   const [activeStep, setActiveStep] = useState('all')
   const eventCursorRef = useRef(0)
+  const lastEventIdRef = useRef('')
   const streamRef = useRef(null)
   const runStatusRef = useRef(runStatus)
 
@@ -45,7 +47,9 @@ export default function WorkflowRunner() {
 
   useEffect(() => {
     eventCursorRef.current = 0
+    lastEventIdRef.current = ''
     setEvents([])
+    setDrafts({})
     setIdeExportMessage('')
     setIdePrompt('')
   }, [runId])
@@ -117,8 +121,11 @@ export default function WorkflowRunner() {
         return
       }
       const startFrom = Math.max(0, eventCursorRef.current || 0)
+      const resume = lastEventIdRef.current
+        ? `last_event_id=${encodeURIComponent(lastEventIdRef.current)}`
+        : `start=${startFrom}`
       const stream = new EventSource(
-        `${API_BASE_URL}/runs/${runId}/events?start=${startFrom}`
+        `${API_BASE_URL}/runs/${runId}/events?${resume}`
       )
       streamRef.current = stream
 
@@ -126,14 +133,37 @@ export default function WorkflowRunner() {
         if (!event.data) {
           return
         }
-        const lastId = Number(event.lastEventId)
-        if (!Number.isNaN(lastId)) {
-          eventCursorRef.current = lastId + 1
-        } else {
-          eventCursorRef.current += 1
+        if (event.lastEventId) {
+          lastEventIdRef.current = event.lastEventId
         }
+        eventCursorRef.current += 1
         try {
           const parsed = JSON.parse(event.data)
+          if (parsed.type === 'artifact_delta') {
+            setDrafts((prev) => {
+              const current = prev[parsed.step] || ''
+              const offset = Math.min(parsed.offset ?? current.length, current.length)
+              return {
+                ...prev,
+                [parsed.step]: current.slice(0, offset) + (parsed.delta || ''),
+              }
+            })
+            return
+          }
+          if (
+            parsed.type === 'step_started' ||
+            parsed.type === 'step_completed' ||
+            parsed.type === 'step_failed'
+          ) {
+            setDrafts((prev) => {
+              if (!(parsed.step in prev)) {
+                return prev
+              }
+              const next = { ...prev }
+              delete next[parsed.step]
+              return next
+            })
+          }
           setEvents((prev) => [parsed, ...prev].slice(0, EVENT_LIMIT))
         } catch (err) {
           setEvents((prev) =>
@@ -648,6 +678,14 @@ export default function WorkflowRunner() {
               ))}
             </div>
           )}
+          {Object.entries(drafts)
+            .filter(([step]) => activeStep === 'all' || activeStep === step)
+            .map(([step, text]) => (
+              <div key={step} className="draft-preview">
+                <h4>{step.toUpperCase()} (writing…)</h4>
+                <pre>{text}</pre>
+              </div>
+            ))}
           <div className="artifact-chip-row">
             {Object.entries(artifacts).map(([name, present]) => (
               <span
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Benchmark GET /runs/{run_id}: Redis round trips and latency per status poll.
+
+Compares the previous call sequence (run_exists, get_run_status, get_step_statuses,
+one EXISTS per artifact) with the pipelined get_run_snapshot(), then times the
+endpoint itself through the ASGI app. Needs a Redis at REDIS_URL.
+
+    python scripts/bench_get_run.py --iterations 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis  # noqa: E402
+
+from teamflow_fastapi import storage, storage_redis  # noqa: E402
+
+
+class CountingConnection(redis.Connection):
+    round_trips = 0
+
+    def send_packed_command(self, command, check_health=True):
+        CountingConnection.round_trips += 1
+        return super().send_packed_command(command, check_health=check_health)
+
+
+def _legacy_poll(run_id: str) -> None:
+    storage.run_exists(run_id)
+    storage.get_run_status(run_id)
+    storage.get_step_statuses(run_id)
+    r = storage_redis.get_redis()
+    for name in storage.ARTIFACT_NAMES:
+        if storage_redis.COMPACT_LAYOUT:
+            r.hexists(storage_redis._run_key(run_id), f"a:{name}")
+        else:
+            r.exists(storage_redis._artifact_key(run_id, name))
+
+
+def _snapshot_poll(run_id: str) -> None:
+    storage.get_run_snapshot(run_id)
+
+
+def _measure(label: str, fn, iterations: int) -> None:
+    fn()  # warm the pool
+    CountingConnection.round_trips = 0
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    print(
+        f"{label:<22} round_trips/poll={CountingConnection.round_trips / iterations:5.1f}  "
+        f"p50={statistics.median(samples):.3f}ms  "
+        f"p95={samples[int(len(samples) * 0.95) - 1]:.3f}ms"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--skip-endpoint", action="store_true")
+    args = parser.parse_args()
+
+    storage.set_backend(storage_redis.RedisBackend())
+    storage_redis.get_redis().connection_pool.connection_class = CountingConnection
+    storage_redis.get_binary_redis().connection_pool.connection_class = CountingConnection
+    run_id = f"run_bench_{uuid.uuid4().hex}"
+    storage.init_run(run_id, "Benchmark idea")
+    for name in ("prd", "arch", "api"):
+        storage.set_artifact(run_id, name, f"# {name}\n\n- bench content")
+
+    try:
+        _measure("legacy sequence", lambda: _legacy_poll(run_id), args.iterations)
+        _measure("get_run_snapshot", lambda: _snapshot_poll(run_id), args.iterations)
+        if not args.skip_endpoint:
+            from fastapi.testclient import TestClient
+
+            from teamflow_fastapi.main import app
+
+            client = TestClient(app)
+            _measure(
+                "GET /runs/{run_id}",
+                lambda: client.get(f"/runs/{run_id}").raise_for_status(),
+                args.iterations,
+            )
+    finally:
+        storage_redis.get_redis().delete(
+            storage_redis._run_key(run_id),
+            storage_redis._meta_key(run_id),
+            storage_redis._idea_key(run_id),
+            storage_redis._step_key(run_id),
+            *[storage_redis._artifact_key(run_id, name) for name in storage.ARTIFACT_NAMES],
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
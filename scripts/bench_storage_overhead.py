@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Split GET /runs/{run_id} latency into storage time and framework time, per backend.
+
+For each backend it times get_run_snapshot() called directly (storage only), GET /health
+through the ASGI app (framework only) and GET /runs/{run_id} (both). Everything runs in
+this process; the redis backend is skipped when REDIS_URL is unreachable.
+
+    python scripts/bench_storage_overhead.py --iterations 2000 --backends memory,sqlite,redis
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from teamflow_fastapi import storage  # noqa: E402
+
+
+def _backend(name: str, tmpdir: str):
+    if name == "memory":
+        from teamflow_fastapi.storage_memory import MemoryBackend
+
+        return MemoryBackend()
+    if name == "sqlite":
+        from teamflow_fastapi.storage_sqlite import SQLiteBackend
+
+        return SQLiteBackend(os.path.join(tmpdir, "bench.sqlite3"))
+    from teamflow_fastapi import storage_redis
+
+    try:
+        storage_redis.get_redis().ping()
+    except Exception as exc:  # noqa: BLE001
+        print(f"{name:<8} skipped ({exc})")
+        return None
+    return storage_redis.RedisBackend()
+
+
+def _p50(fn, iterations: int) -> float:
+    fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--backends", default="memory,sqlite,redis")
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    from teamflow_fastapi.main import app
+
+    client = TestClient(app)
+    print(f"{'backend':<8} {'storage':>10} {'framework':>10} {'endpoint':>10}  storage share")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in args.backends.split(","):
+            backend = _backend(name.strip(), tmpdir)
+            if backend is None:
+                continue
+            storage.set_backend(backend)
+            run_id = f"run_bench_{uuid.uuid4().hex}"
+            storage.init_run(run_id, "Benchmark idea")
+            for artifact in ("prd", "arch", "api"):
+                storage.set_artifact(run_id, artifact, f"# {artifact}\n\n- bench content")
+
+            direct = _p50(lambda: storage.get_run_snapshot(run_id), args.iterations)
+            health = _p50(lambda: client.get("/health").raise_for_status(), args.iterations)
+            endpoint = _p50(
+                lambda: client.get(f"/runs/{run_id}").raise_for_status(), args.iterations
+            )
+            print(
+                f"{name:<8} {direct:>8.3f}ms {health:>8.3f}ms {endpoint:>8.3f}ms  "
+                f"{direct / endpoint:6.1%}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""End-to-end runs against the stub model backend: orchestration overhead, no network.
+
+Each run goes through init_run, orchestrate_run and finalize in this process, with
+--concurrency runs in flight. With the default zero model latency, run time is pure
+orchestrator + storage + event overhead; set --latency (TEAMFLOW_STUB_LATENCY_MS
+syntax) to see it next to realistic model time. SSE cost shows up as --viewers
+threads tailing each run's event log like the /events endpoint does.
+
+    python scripts/bench_stub_runs.py --runs 200 --concurrency 20 --backend memory
+    python scripts/bench_stub_runs.py --backend redis --latency lognormal:800:0.4 --viewers 2
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--backend", default="memory", help="memory | sqlite | redis")
+    parser.add_argument("--latency", default="fixed:0")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--output-chars", type=int, default=3000)
+    parser.add_argument("--viewers", type=int, default=0, help="event-log readers per run")
+    args = parser.parse_args()
+
+    os.environ.update(
+        TEAMFLOW_MODEL_BACKEND="stub",
+        TEAMFLOW_STUB_LATENCY_MS=args.latency,
+        TEAMFLOW_STUB_FAILURE_RATE=str(args.failure_rate),
+        TEAMFLOW_STUB_OUTPUT_CHARS=str(args.output_chars),
+        TEAMFLOW_STORAGE_BACKEND=args.backend,
+        CELERY_TASK_ALWAYS_EAGER="true",
+    )
+    os.environ.setdefault("TEAMFLOW_LOG_AGENT_PAYLOADS", "false")
+    os.environ.setdefault("TEAMFLOW_AGENT_LOG_LEVEL", "WARNING")
+
+    from teamflow_fastapi import storage, tasks
+
+    def view(run_id: str, stop: threading.Event, counts: list) -> None:
+        after = "0-0"
+        while not stop.is_set():
+            events = storage.read_events(run_id, after, count=100, block_ms=200)
+            if events:
+                after = events[-1][0]
+                counts.append(len(events))
+
+    def one_run(index: int):
+        run_id = f"bench_{uuid.uuid4().hex}"
+        storage.init_run(run_id, f"Benchmark idea {index}: a task tracker for small teams")
+        stop = threading.Event()
+        delivered: list = []
+        viewers = [
+            threading.Thread(target=view, args=(run_id, stop, delivered), daemon=True)
+            for _ in range(args.viewers)
+        ]
+        for viewer in viewers:
+            viewer.start()
+        started = time.perf_counter()
+        try:
+            # .run() calls the task body directly; Celery's per-task request stack is
+            # not set up in these benchmark threads.
+            tasks.orchestrate_run.run(run_id)
+            tasks.finalize.run(run_id)
+        except Exception:  # noqa: BLE001 - injected failures are part of the run mix
+            pass
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for viewer in viewers:
+            viewer.join()
+        status = storage.get_run_status(run_id)
+        return elapsed, status, len(storage.get_events(run_id)), sum(delivered)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one_run, range(args.runs)))
+    wall = time.perf_counter() - started
+
+    times = [elapsed * 1000 for elapsed, _, _, _ in results]
+    statuses = {}
+    for _, status, _, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(
+        f"backend={args.backend} latency={args.latency} runs={args.runs} "
+        f"concurrency={args.concurrency} viewers={args.viewers}"
+    )
+    print(f"statuses: {statuses}")
+    print(
+        f"run ms: p50={statistics.median(times):.1f} p95={_percentile(times, 95):.1f} "
+        f"max={max(times):.1f}"
+    )
+    print(f"throughput: {args.runs / wall:.1f} runs/s over {wall:.2f}s")
+    print(f"events per run: {statistics.mean(events for _, _, events, _ in results):.1f}")
+    if args.viewers:
+        print(f"events delivered per run: {statistics.mean(d for *_, d in results):.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
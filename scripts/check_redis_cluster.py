@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Exercise run storage against a Redis Cluster and check per-run keys share one slot.
+
+Run with REDIS_CLUSTER_MODE=true and REDIS_URL pointing at any cluster node (see
+scripts/redis_cluster_local.sh). Works for both REDIS_STORAGE_LAYOUT values.
+"""
+import collections
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redis.crc import key_slot  # noqa: E402
+
+from teamflow_fastapi import storage, storage_redis  # noqa: E402
+
+
+def _exercise(run_id: str) -> None:
+    storage.init_run(run_id, "Cluster check idea")
+    storage.set_run_meta(run_id, {"fast_mode": "true"})
+    assert storage.transition_run(
+        run_id,
+        run_status="running",
+        steps={"pm": "running"},
+        events=[{"type": "run_started"}],
+    )
+    storage.set_artifact(run_id, "prd", "# PRD\n\n" + "- requirement\n" * 200)
+    storage.set_artifact(run_id, "arch", "# System Architecture")
+    storage.append_event(run_id, {"type": "step_completed", "step": "pm"})
+    snapshot = storage.get_run_snapshot(run_id)
+    assert snapshot and snapshot["meta"]["status"] == "running", snapshot
+    assert snapshot["artifacts"]["prd"] and snapshot["artifacts"]["arch"]
+    storage.clear_artifacts(run_id, ["arch", "api", "final"])
+    assert storage.get_artifact(run_id, "arch") is None
+    assert storage.get_artifact(run_id, "prd").startswith("# PRD")
+    assert len(storage.read_events(run_id)) == 2
+
+
+def main() -> int:
+    if not storage_redis.REDIS_CLUSTER_MODE:
+        print("Set REDIS_CLUSTER_MODE=true and point REDIS_URL at a cluster node.")
+        return 2
+    storage.set_backend(storage_redis.RedisBackend())
+    r = storage_redis.get_redis()
+    per_node = collections.Counter()
+    run_ids = [f"run_cluster_{uuid.uuid4().hex}" for _ in range(int(os.getenv("RUNS", "24")))]
+    try:
+        for run_id in run_ids:
+            _exercise(run_id)
+            keys = list(r.scan_iter(match=f"{storage_redis._run_prefix(run_id)}*", count=100))
+            slots = {key_slot(key.encode()) for key in keys}
+            assert len(slots) == 1, f"{run_id} keys span slots {slots}: {keys}"
+            node = r.get_node_from_key(keys[0])
+            per_node[f"{node.host}:{node.port}"] += 1
+    finally:
+        for run_id in run_ids:
+            keys = list(r.scan_iter(match=f"{storage_redis._run_prefix(run_id)}*", count=100))
+            if keys:
+                r.delete(*keys)
+    print(f"{len(run_ids)} runs OK ({storage_redis.REDIS_STORAGE_LAYOUT} layout); runs per primary:")
+    for node, count in sorted(per_node.items()):
+        print(f"  {node}: {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
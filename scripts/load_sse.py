@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Load test for GET /runs/{run_id}/events: how many SSE streams can one API worker hold?
+
+Opens --clients concurrent event streams against a running API, then measures
+GET /health latency while they are all open. A threadpool-bound endpoint stalls at
+roughly 40 streams and /health starves; the async endpoint keeps every stream open.
+
+    uvicorn teamflow_fastapi.main:app --port 8000 --workers 1
+    python scripts/load_sse.py --clients 2000
+
+The run is seeded directly in Redis (REDIS_URL), so no Celery worker or model key is
+needed. Raise `ulimit -n` above --clients first.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from teamflow_fastapi import storage  # noqa: E402
+
+
+async def _open_stream(host: str, port: int, path: str, opened: asyncio.Queue, hold: asyncio.Event):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        await opened.put(False)
+        return
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    try:
+        status_line = await reader.readline()
+        await opened.put(b" 200 " in status_line)
+        await hold.wait()
+    finally:
+        writer.close()
+
+
+async def _health_latency(host: str, port: int, samples: int, timeout: float) -> list:
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write(f"GET /health HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+            await writer.drain()
+            await asyncio.wait_for(reader.read(), timeout)
+            writer.close()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except (asyncio.TimeoutError, OSError):
+            latencies.append(float("inf"))
+    return latencies
+
+
+async def _main(args) -> int:
+    url = urlparse(args.api)
+    host, port = url.hostname or "127.0.0.1", url.port or 80
+    run_id = f"run_load_{uuid.uuid4().hex}"
+    storage.init_run(run_id, "SSE load test")
+    storage.append_event(run_id, {"type": "run_started", "timestamp": int(time.time())})
+
+    opened: asyncio.Queue = asyncio.Queue()
+    hold = asyncio.Event()
+    path = f"/runs/{run_id}/events"
+    tasks = [
+        asyncio.create_task(_open_stream(host, port, path, opened, hold))
+        for _ in range(args.clients)
+    ]
+
+    ok = 0
+    deadline = time.monotonic() + args.open_timeout
+    for _ in range(args.clients):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            ok += 1 if await asyncio.wait_for(opened.get(), remaining) else 0
+        except asyncio.TimeoutError:
+            break
+
+    latencies = await _health_latency(host, port, args.health_samples, args.health_timeout)
+    hold.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    finite = sorted(x for x in latencies if x != float("inf"))
+    print(f"streams requested: {args.clients}")
+    print(f"streams open within {args.open_timeout:.0f}s: {ok}")
+    print(
+        f"/health while streams open: {len(finite)}/{len(latencies)} answered, "
+        f"p50={statistics.median(finite) if finite else float('inf'):.1f}ms"
+    )
+    return 0 if ok == args.clients and len(finite) == len(latencies) else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--api", default=os.getenv("TEAMFLOW_API_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--open-timeout", type=float, default=20.0)
+    parser.add_argument("--health-samples", type=int, default=20)
+    parser.add_argument("--health-timeout", type=float, default=5.0)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""Move every split-layout run in REDIS_URL into the compact one-hash-per-run layout."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from teamflow_fastapi import storage_redis as storage  # noqa: E402
+
+
+def main() -> int:
+    migrated = storage.migrate_all_runs()
+    print(f"Migrated {migrated} run(s) to the compact layout.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env bash
+# Start (or stop) a local 3-primary / 3-replica Redis Cluster on ports 7000-7005 for
+# validating REDIS_CLUSTER_MODE. Needs redis-server and redis-cli on PATH.
+#
+#   scripts/redis_cluster_local.sh start
+#   REDIS_CLUSTER_MODE=true REDIS_URL=redis://127.0.0.1:7000/0 \
+#     CELERY_BROKER_URL=redis://localhost:6379/0 python scripts/check_redis_cluster.py
+#   scripts/redis_cluster_local.sh stop
+set -euo pipefail
+
+PORTS=(7000 7001 7002 7003 7004 7005)
+DATA_DIR="${TEAMFLOW_CLUSTER_DIR:-/tmp/teamflow-redis-cluster}"
+
+start() {
+  mkdir -p "$DATA_DIR"
+  for port in "${PORTS[@]}"; do
+    mkdir -p "$DATA_DIR/$port"
+    redis-server --port "$port" --cluster-enabled yes \
+      --cluster-config-file "$DATA_DIR/$port/nodes.conf" \
+      --dir "$DATA_DIR/$port" --appendonly no --save "" --daemonize yes
+  done
+  sleep 1
+  hosts=()
+  for port in "${PORTS[@]}"; do
+    hosts+=("127.0.0.1:$port")
+  done
+  redis-cli --cluster create "${hosts[@]}" --cluster-replicas 1 --cluster-yes
+}
+
+stop() {
+  for port in "${PORTS[@]}"; do
+    redis-cli -p "$port" shutdown nosave >/dev/null 2>&1 || true
+  done
+  rm -rf "$DATA_DIR"
+}
+
+case "${1:-}" in
+  start) start ;;
+  stop) stop ;;
+  *) echo "usage: $0 start|stop" >&2; exit 1 ;;
+esac
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Start one Celery worker per lane, sized by TEAMFLOW_LANE_WEIGHTS.
+
+Each lane gets its own worker and concurrency, so a large batch fills only the batch
+worker's slots while fast and regenerate runs keep theirs. Weights are worker slots per
+lane ("fast=4,regenerate=2,full=2,batch=1"); a lane with weight 0 gets no worker.
+Arguments after the script name are passed to every worker, e.g.
+
+    python scripts/run_lane_workers.py --pool threads --loglevel=INFO
+"""
+import os
+import signal
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from teamflow_fastapi.celery_app import LANES, lane_queue  # noqa: E402
+
+DEFAULT_WEIGHTS = "fast=4,regenerate=2,full=2,batch=1"
+
+
+def parse_weights(spec: str) -> dict:
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        lane, _, weight = item.partition("=")
+        lane = lane.strip()
+        if lane not in LANES:
+            raise SystemExit(f"Unknown lane in TEAMFLOW_LANE_WEIGHTS: {lane}")
+        weights[lane] = max(0, int(weight or 1))
+    return weights
+
+
+def main() -> int:
+    weights = parse_weights(os.getenv("TEAMFLOW_LANE_WEIGHTS", DEFAULT_WEIGHTS))
+    workers = []
+    for lane in LANES:
+        concurrency = weights.get(lane, 0)
+        if not concurrency:
+            continue
+        cmd = [
+            sys.executable,
+            "-m",
+            "celery",
+            "-A",
+            "teamflow_fastapi.celery_app.celery_app",
+            "worker",
+            "-Q",
+            lane_queue(lane),
+            "-n",
+            f"{lane}@%h",
+            "--concurrency",
+            str(concurrency),
+            *sys.argv[1:],
+        ]
+        print(f"Starting {lane} worker: concurrency={concurrency}", flush=True)
+        workers.append(subprocess.Popen(cmd))
+    if not workers:
+        print("No lane has a weight above 0", file=sys.stderr)
+        return 1
+
+    def forward(signum, _frame):
+        for worker in workers:
+            if worker.poll() is None:
+                worker.send_signal(signum)
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    # Stop everything once any worker exits, so a supervisor restarts the whole set.
+    code = 0
+    while workers:
+        pid, status = os.wait()
+        exited = [worker for worker in workers if worker.pid == pid]
+        if not exited:
+            continue
+        workers.remove(exited[0])
+        code = code or os.waitstatus_to_exitcode(status)
+        forward(signal.SIGTERM, None)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
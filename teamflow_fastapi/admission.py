@@ -0,0 +1,120 @@
+"""Admission control for new runs, from live broker depth and in-flight runs.
+
+POST /runs checks the depth of the run's lane queue on the broker and the number of
+runs holding a lease (running on some worker). Past TEAMFLOW_ADMISSION_MAX_QUEUED or
+TEAMFLOW_ADMISSION_MAX_RUNNING a new run either goes to a bounded waiting list
+(TEAMFLOW_ADMISSION_MAX_WAITING, FIFO) and is enqueued once capacity frees up, or is
+refused with 429 and a Retry-After estimate when the waiting list is full or disabled.
+All limits default to 0 (off), in which case nothing is measured.
+"""
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .celery_app import LANES, celery_app, lane_queue
+from .storage import count_active_runs, count_waiting_runs
+
+# Queued runs per lane on the broker, runs in flight fleet-wide, runs parked in the
+# waiting list. 0 = no limit (for the waiting list: refuse instead of waiting).
+TEAMFLOW_ADMISSION_MAX_QUEUED = max(0, int(os.getenv("TEAMFLOW_ADMISSION_MAX_QUEUED", "0")))
+TEAMFLOW_ADMISSION_MAX_RUNNING = max(0, int(os.getenv("TEAMFLOW_ADMISSION_MAX_RUNNING", "0")))
+TEAMFLOW_ADMISSION_MAX_WAITING = max(0, int(os.getenv("TEAMFLOW_ADMISSION_MAX_WAITING", "0")))
+# Expected run length, used to turn a position in line into a start-time estimate.
+TEAMFLOW_ADMISSION_RUN_SECONDS = max(
+    1.0, float(os.getenv("TEAMFLOW_ADMISSION_RUN_SECONDS", "90"))
+)
+
+ADMISSION_ENABLED = bool(TEAMFLOW_ADMISSION_MAX_QUEUED or TEAMFLOW_ADMISSION_MAX_RUNNING)
+
+logger = logging.getLogger("teamflow.admission")
+
+
+@dataclass
+class Decision:
+    admit: bool
+    wait: bool = False
+    retry_after: int = 0
+    reason: str = ""
+
+
+def lane_depths() -> Dict[str, int]:
+    """Messages waiting on each lane's broker queue (0 for all in eager mode)."""
+    depths = {lane: 0 for lane in LANES}
+    if celery_app.conf.task_always_eager:
+        return depths
+    with celery_app.pool.acquire(block=True) as conn:
+        channel = conn.default_channel
+        for lane in LANES:
+            try:
+                depths[lane] = channel.queue_declare(
+                    queue=lane_queue(lane), passive=True
+                ).message_count
+            except conn.channel_errors:
+                # The queue does not exist yet, i.e. nothing was ever sent to it.
+                depths[lane] = 0
+    return depths
+
+
+def _slots(running: int) -> int:
+    # Runs that finish per TEAMFLOW_ADMISSION_RUN_SECONDS: the running cap when set,
+    # otherwise however many runs the workers hold right now.
+    return max(1, TEAMFLOW_ADMISSION_MAX_RUNNING or running)
+
+
+def estimate_wait_seconds(ahead: int, running: int) -> int:
+    """Seconds until a run with ahead runs in front of it is likely to start."""
+    return int(math.ceil(ahead / _slots(running)) * TEAMFLOW_ADMISSION_RUN_SECONDS)
+
+
+def free_slots(depths: Dict[str, int], running: int, lane: Optional[str] = None) -> int:
+    """How many more runs can be enqueued now; a large number when unlimited."""
+    free = 1 << 30
+    if TEAMFLOW_ADMISSION_MAX_RUNNING:
+        queued = sum(depth for name, depth in depths.items() if name != "batch")
+        free = min(free, TEAMFLOW_ADMISSION_MAX_RUNNING - running - queued)
+    if TEAMFLOW_ADMISSION_MAX_QUEUED:
+        lanes = [lane] if lane else [name for name in LANES if name != "batch"]
+        free = min(free, TEAMFLOW_ADMISSION_MAX_QUEUED - max(depths[name] for name in lanes))
+    return max(0, free)
+
+
+def check(lane: str) -> Decision:
+    """Whether a new run for lane can be enqueued now, parked, or must be refused."""
+    if not ADMISSION_ENABLED:
+        return Decision(admit=True)
+    try:
+        depths = lane_depths()
+        running = count_active_runs()
+        waiting = count_waiting_runs()
+    except Exception as exc:
+        # Refusing every run because the broker cannot be measured helps nobody.
+        logger.warning("Admission check failed, admitting: %s", exc)
+        return Decision(admit=True)
+    # Parked runs go first, so a new run is only admitted directly once they are gone.
+    if not waiting and free_slots(depths, running, lane):
+        return Decision(admit=True)
+    reason = f"lane {lane}: {depths[lane]} queued, {running} running, {waiting} waiting"
+    if waiting < TEAMFLOW_ADMISSION_MAX_WAITING:
+        return Decision(admit=False, wait=True, reason=reason)
+    ahead = waiting + sum(depths.values()) + 1
+    return Decision(
+        admit=False, retry_after=max(1, estimate_wait_seconds(ahead, running)), reason=reason
+    )
+
+
+def queue_stats() -> Dict:
+    depths = lane_depths()
+    running = count_active_runs()
+    return {
+        "lanes": depths,
+        "running": running,
+        "waiting": count_waiting_runs(),
+        "free_slots": free_slots(depths, running) if ADMISSION_ENABLED else None,
+        "limits": {
+            "max_queued_per_lane": TEAMFLOW_ADMISSION_MAX_QUEUED,
+            "max_running": TEAMFLOW_ADMISSION_MAX_RUNNING,
+            "max_waiting": TEAMFLOW_ADMISSION_MAX_WAITING,
+        },
+    }
@@ -0,0 +1,84 @@
+"""Shared asyncio loop for agent calls (TEAMFLOW_AGENT_EXECUTION=async).
+
+Each worker process runs one event loop in a background thread. Task threads hand
+their agent coroutines to it and wait for the result, so hundreds of in-flight LLM
+calls share one process and one loop instead of one process each. At most
+TEAMFLOW_AGENT_CONCURRENCY calls run at once per process; the rest wait in FIFO order.
+A waiting thread can abort its call: cancelling the coroutine closes the model request.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Awaitable, Callable, Optional, TypeVar
+
+TEAMFLOW_AGENT_EXECUTION = os.getenv("TEAMFLOW_AGENT_EXECUTION", "sync").lower()
+TEAMFLOW_AGENT_CONCURRENCY = max(1, int(os.getenv("TEAMFLOW_AGENT_CONCURRENCY", "64")))
+ASYNC_AGENTS = TEAMFLOW_AGENT_EXECUTION == "async"
+
+T = TypeVar("T")
+
+
+class AgentCallCancelled(Exception):
+    """The caller's should_cancel() returned True; the coroutine was cancelled."""
+
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_loop_pid: Optional[int] = None
+
+
+def _serve(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _semaphore, _loop_pid
+    pid = os.getpid()
+    if _loop is None or _loop_pid != pid:
+        with _lock:
+            # A forked child inherits the parent's loop object but not its thread.
+            if _loop is None or _loop_pid != pid:
+                loop = asyncio.new_event_loop()
+                _semaphore = asyncio.Semaphore(TEAMFLOW_AGENT_CONCURRENCY)
+                threading.Thread(
+                    target=_serve, args=(loop,), name="teamflow-agent-loop", daemon=True
+                ).start()
+                _loop, _loop_pid = loop, pid
+    return _loop
+
+
+async def _limited(factory: Callable[[], Awaitable[T]]) -> T:
+    async with _semaphore:
+        return await factory()
+
+
+def run_on_agent_loop(
+    factory: Callable[[], Awaitable[T]],
+    *,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    poll_seconds: float = 0.5,
+) -> T:
+    """Run factory() on the shared loop and block the calling thread for the result.
+
+    factory is called on the loop, so contextvars set inside it (e.g. tracing) stay
+    with the coroutine. With should_cancel, it is checked every poll_seconds while the
+    call runs; once it returns True the coroutine is cancelled and AgentCallCancelled
+    is raised.
+    """
+    loop = _get_loop()
+    future = asyncio.run_coroutine_threadsafe(_limited(factory), loop)
+    try:
+        while True:
+            try:
+                return future.result(timeout=poll_seconds if should_cancel else None)
+            except concurrent.futures.TimeoutError:
+                if future.done():
+                    raise  # raised by the call itself
+            if should_cancel():
+                raise AgentCallCancelled()
+    except BaseException:
+        future.cancel()
+        raise
@@ -2,31 +2,57 @@ import os
 import re
 import time
 import uuid
-from typing import Generator, List, Optional
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from celery import chain
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import Response, StreamingResponse
-from .models import RunCreateRequest, RunCreateResponse, RunStatusResponse, StepStatus
+from .models import (
+    BatchStatusResponse,
+    RunBatchCreateRequest,
+    RunBatchCreateResponse,
+    RunCreateRequest,
+    RunCreateResponse,
+    RunStatusResponse,
+    StepStatus,
+)
 from .storage import (
     STEP_ORDER,
-    append_event,
     clear_artifacts,
+    create_batch,
+    event_id_at_index_async,
     get_artifact,
+    get_batch,
+    get_metrics,
     get_run_meta,
+    get_run_snapshot,
     get_run_status,
     get_step_statuses,
     init_run,
-    list_artifacts,
+    init_runs,
+    is_event_id,
     run_exists,
+    run_exists_async,
     is_run_cancelled,
+    set_artifact,
     set_run_meta,
-    set_run_status,
     set_step_status,
+    transition_run,
+)
+from . import admission
+from .checkpoints import clear_checkpoints, write_checkpoint
+from .events_hub import event_hub
+from .rate_limit import rate_limit_metrics
+from .similarity import TEAMFLOW_REUSE_SIMILAR, index_and_match
+from .tasks import (
+    PIPELINE,
+    TEAMFLOW_INCREMENTAL_REGENERATE,
+    batch_group,
+    enqueue_run,
+    park_run,
+    revoke_run_tasks,
 )
-from .tasks import finalize, orchestrate_run
-from pathlib import Path
+from .templates import registry as prompt_templates
 
 load_dotenv()
 
@@ -34,18 +60,12 @@ router = APIRouter()
 
 REVIEW_ENABLED = os.getenv("REVIEW_ENABLED", "false").lower() in {"1", "true", "yes"}
 STREAM_TIMEOUT_SECONDS = int(os.getenv("SSE_STREAM_TIMEOUT_SECONDS", "60"))
-POLL_INTERVAL_SECONDS = float(os.getenv("SSE_POLL_INTERVAL_SECONDS", "1.0"))
+KEEPALIVE_SECONDS = max(1.0, float(os.getenv("SSE_KEEPALIVE_SECONDS", "15")))
 
 STEP_SEQUENCE = ["pm", "tech", "qa", "principal", "review"]
-ARTIFACTS_BY_STEP = {
-    "pm": ["prd"],
-    "tech": ["arch", "api"],
-    "qa": ["test", "risk"],
-    "principal": ["stack"],
-    "review": ["review"],
-}
-
-PROMPT_DIR = Path(__file__).resolve().parent / "prompts"
+# "expired": the run's state outlived its TTL (batch progress only).
+_TERMINAL_STATUSES = {"completed", "failed", "cancelled", "expired"}
+
 CURSOR_PROMPT_MAX_CHARS = int(os.getenv("CURSOR_PROMPT_MAX_CHARS", "5200"))
 
 
@@ -81,11 +101,6 @@ def _extract_max_chars(idea: str) -> Optional[int]:
     return None
 
 
-def _load_prompt(name: str) -> str:
-    path = PROMPT_DIR / f"{name}.md"
-    return path.read_text(encoding="utf-8")
-
-
 def _clip(text: str, limit: int) -> str:
     if len(text) <= limit:
         return text
@@ -209,15 +224,80 @@ def _build_cursor_prompt(run_id: str, ide_prompt: str) -> str:
     return candidate
 
 
-def _build_chain(run_id: str, start_step: str = "pm"):
-    if start_step not in STEP_SEQUENCE:
-        raise ValueError("Unknown step")
-    return chain(orchestrate_run.si(run_id, start_step), finalize.si(run_id))
+def _seed_from_similar(
+    run_id: str, idea: str, matches: List[Tuple[str, float]]
+) -> Optional[str]:
+    """Copy artifacts from the best usable near-duplicate run.
 
+    Returns the step to start orchestration at, or None when a completed run was
+    reused whole (TEAMFLOW_REUSE_SIMILAR=all) and there is nothing left to run.
+    """
+    meta = get_run_meta(run_id)
+    for seed_id, score in matches:
+        seed = get_run_snapshot(seed_id)
+        # Length limits change every step's output, so only reuse like-for-like runs.
+        if not seed or seed["meta"].get("max_chars") != meta.get("max_chars"):
+            continue
+        reuse_all = TEAMFLOW_REUSE_SIMILAR == "all" and seed["meta"].get("status") == "completed"
+        if reuse_all:
+            names = [name for name, present in seed["artifacts"].items() if present]
+        elif seed["artifacts"].get("prd"):
+            names = ["prd"]
+        else:
+            continue
+        contents = {name: get_artifact(seed_id, name) for name in names}
+        if any(content is None for content in contents.values()):
+            continue  # expired or regenerated since the snapshot
+        for name, content in contents.items():
+            set_artifact(run_id, name, content)
+        set_run_meta(
+            run_id,
+            {
+                "seed_run_id": seed_id,
+                "seed_similarity": f"{score:.3f}",
+                "seed_artifacts": ",".join(names),
+            },
+        )
+        now = int(time.time())
+        seeded = {
+            "type": "run_seeded",
+            "seed_run_id": seed_id,
+            "similarity": round(score, 3),
+            "artifacts": names,
+            "timestamp": now,
+        }
+        if not reuse_all:
+            # Checkpoint the seeded PRD so a resumed run does not regenerate it.
+            write_checkpoint(run_id, PIPELINE.by_name["pm"], {"idea": idea}, contents)
+            transition_run(run_id, steps={"pm": "completed"}, events=[seeded])
+            return "tech"
+        transition_run(
+            run_id,
+            run_status="running",
+            steps=seed["steps"],
+            events=[seeded, {"type": "run_started", "timestamp": now}],
+        )
+        transition_run(
+            run_id,
+            run_status="completed",
+            events=[{"type": "run_completed", "timestamp": now}],
+        )
+        return None
+    return "pm"
 
-def _steps_from(start_step: str) -> List[str]:
-    idx = STEP_SEQUENCE.index(start_step)
-    return STEP_SEQUENCE[idx:]
+
+def _options_meta(payload: RunCreateRequest, idea: str) -> Dict[str, str]:
+    meta = {}
+    max_chars = payload.max_chars or _extract_max_chars(idea)
+    if payload.fast_mode:
+        if max_chars is None or max_chars > 5000:
+            max_chars = 5000
+        meta["fast_mode"] = "true"
+    if max_chars:
+        meta["max_chars"] = str(max_chars)
+    if not payload.use_cache:
+        meta["use_cache"] = "false"
+    return meta
 
 
 @router.post("/runs", response_model=RunCreateResponse)
@@ -225,33 +305,95 @@ def create_run(payload: RunCreateRequest) -> RunCreateResponse:
     idea = payload.idea.strip()
     if not idea:
         raise HTTPException(status_code=400, detail="Idea must not be empty")
+    lane = "fast" if payload.fast_mode else "full"
+    decision = admission.check(lane)
+    if not decision.admit and not decision.wait:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many runs in progress ({decision.reason})",
+            headers={"Retry-After": str(decision.retry_after)},
+        )
     run_id = f"run_{uuid.uuid4().hex}"
     init_run(run_id, idea)
-    max_chars = payload.max_chars or _extract_max_chars(idea)
-    if payload.fast_mode:
-        if max_chars is None or max_chars > 5000:
-            max_chars = 5000
-        set_run_meta(run_id, {"fast_mode": "true"})
-    if max_chars:
-        set_run_meta(run_id, {"max_chars": str(max_chars)})
+    set_run_meta(run_id, _options_meta(payload, idea))
     if not REVIEW_ENABLED:
         set_step_status(run_id, "review", "skipped")
-    _build_chain(run_id).apply_async()
+    start_step = "pm"
+    if TEAMFLOW_REUSE_SIMILAR != "off":
+        matches = index_and_match(run_id, idea, lookup=payload.reuse_similar)
+        start_step = _seed_from_similar(run_id, idea, matches) if matches else "pm"
+    if start_step is None:
+        return RunCreateResponse(id=run_id, status="completed")
+    if decision.wait:
+        parked = park_run(run_id, start_step, lane=lane)
+        return RunCreateResponse(id=run_id, status="waiting", **parked)
+    enqueue_run(run_id, start_step, lane=lane)
     return RunCreateResponse(id=run_id, status="queued")
 
 
+@router.post("/runs/batch", response_model=RunBatchCreateResponse)
+def create_run_batch(payload: RunBatchCreateRequest) -> RunBatchCreateResponse:
+    """Create and enqueue many runs at once on the batch lane.
+
+    Runs are initialized in one storage batch and enqueued as one Celery group. They
+    skip admission control (the batch lane is sized by its own workers) and the
+    near-duplicate lookup.
+    """
+    ideas = {}
+    meta = {}
+    batch_id = f"batch_{uuid.uuid4().hex}"
+    for index, request in enumerate(payload.runs):
+        idea = request.idea.strip()
+        if not idea:
+            raise HTTPException(status_code=400, detail=f"Idea {index} must not be empty")
+        run_id = f"run_{uuid.uuid4().hex}"
+        ideas[run_id] = idea
+        meta[run_id] = {**_options_meta(request, idea), "batch_id": batch_id}
+    signature, queue_meta = batch_group(list(ideas))
+    init_runs(
+        ideas,
+        {run_id: {**meta[run_id], **queue_meta[run_id]} for run_id in ideas},
+        steps=None if REVIEW_ENABLED else {"review": "skipped"},
+    )
+    create_batch(batch_id, list(ideas))
+    signature.apply_async()
+    return RunBatchCreateResponse(id=batch_id, status="queued", run_ids=list(ideas))
+
+
+@router.get("/batches/{batch_id}", response_model=BatchStatusResponse)
+def get_batch_status(batch_id: str) -> BatchStatusResponse:
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    runs = {run_id: status or "expired" for run_id, status in batch["runs"].items()}
+    counts: Dict[str, int] = {}
+    for status in runs.values():
+        counts[status] = counts.get(status, 0) + 1
+    if all(status in _TERMINAL_STATUSES for status in runs.values()):
+        status = "completed"
+    elif set(counts) <= {"queued", "waiting"}:
+        status = "queued"
+    else:
+        status = "running"
+    return BatchStatusResponse(
+        id=batch_id, status=status, total=len(runs), counts=counts, runs=runs
+    )
+
+
 @router.get("/runs/{run_id}", response_model=RunStatusResponse)
 def get_run(run_id: str) -> RunStatusResponse:
-    if not run_exists(run_id):
+    snapshot = get_run_snapshot(run_id)
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Run not found")
-    status = get_run_status(run_id) or "unknown"
-    step_statuses = get_step_statuses(run_id)
+    status = snapshot["meta"].get("status") or "unknown"
+    step_statuses = snapshot["steps"]
     steps = [
         StepStatus(name=step, status=step_statuses.get(step, "unknown"))
         for step in STEP_ORDER
     ]
-    artifacts = list_artifacts(run_id)
-    return RunStatusResponse(id=run_id, status=status, steps=steps, artifacts=artifacts)
+    return RunStatusResponse(
+        id=run_id, status=status, steps=steps, artifacts=snapshot["artifacts"]
+    )
 
 
 @router.post("/runs/{run_id}/steps/{step}/regenerate")
@@ -263,26 +405,31 @@ def regenerate_step(run_id: str, step: str) -> dict:
     if step == "review" and not REVIEW_ENABLED:
         raise HTTPException(status_code=409, detail="Review step not enabled")
 
-    steps_to_clear = _steps_from(step)
-    artifacts_to_clear: List[str] = ["final"]
-    for step_name in steps_to_clear:
-        artifacts_to_clear.extend(ARTIFACTS_BY_STEP[step_name])
-        if step_name == "review" and not REVIEW_ENABLED:
-            set_step_status(run_id, step_name, "skipped")
-        else:
-            set_step_status(run_id, step_name, "pending")
+    affected = PIPELINE.affected(step)
+    # Incrementally, downstream artifacts stay until their step reruns or is found
+    # unchanged; only the regenerated step starts from scratch.
+    rerun = affected[:1] if TEAMFLOW_INCREMENTAL_REGENERATE else affected
+    artifacts_to_clear: List[str] = ["final", *PIPELINE.artifacts_to_clear(rerun)]
+    step_updates = {node.step: "pending" for node in affected}
+    if not REVIEW_ENABLED:
+        step_updates["review"] = "skipped"
 
-    clear_artifacts(run_id, artifacts_to_clear)
-    set_run_status(run_id, "queued")
-    append_event(
+    if not transition_run(
         run_id,
-        {
-            "type": "step_regenerate",
-            "step": step,
-            "timestamp": int(time.time()),
-        },
-    )
-    _build_chain(run_id, start_step=step).apply_async()
+        run_status="queued",
+        steps=step_updates,
+        events=[
+            {
+                "type": "step_regenerate",
+                "step": step,
+                "timestamp": int(time.time()),
+            }
+        ],
+    ):
+        raise HTTPException(status_code=409, detail="Run is still in progress")
+    clear_artifacts(run_id, artifacts_to_clear)
+    clear_checkpoints(run_id, rerun)
+    enqueue_run(run_id, step, lane="regenerate")
     return {"id": run_id, "status": "queued", "step": step}
 
 
@@ -294,46 +441,67 @@ def cancel_run(run_id: str) -> dict:
     if status in {"completed", "failed", "cancelled"}:
         return {"id": run_id, "status": status}
 
-    set_run_status(run_id, "cancelled")
     step_statuses = get_step_statuses(run_id)
-    for step in STEP_ORDER:
-        current = step_statuses.get(step)
-        if current in {None, "pending", "queued", "running", "unknown"}:
-            set_step_status(run_id, step, "cancelled")
-
-    append_event(
+    step_updates = {
+        step: "cancelled"
+        for step in STEP_ORDER
+        if step_statuses.get(step) in {None, "pending", "queued", "running", "unknown"}
+    }
+    if not transition_run(
         run_id,
-        {"type": "run_cancelled", "timestamp": int(time.time())},
-    )
-    return {"id": run_id, "status": "cancelled"}
+        run_status="cancelled",
+        steps=step_updates,
+        events=[{"type": "run_cancelled", "timestamp": int(time.time())}],
+    ):
+        # Finished (or already cancelled) between the status read and the transition.
+        return {"id": run_id, "status": get_run_status(run_id) or "unknown"}
+    set_run_meta(run_id, {"cancelled_at_ms": int(time.time() * 1000)})
+    revoked = revoke_run_tasks(run_id)
+    return {"id": run_id, "status": "cancelled", "revoked_tasks": len(revoked)}
+
+
+async def _resume_after(run_id: str, start: int, last_event_id: Optional[str]) -> str:
+    """Map ?start=<index> / Last-Event-ID onto the stream ID to read after."""
+    if last_event_id:
+        if is_event_id(last_event_id):
+            return last_event_id
+        # Pre-stream clients sent a numeric event index.
+        try:
+            start = max(start, int(last_event_id) + 1)
+        except ValueError:
+            pass
+    return await event_id_at_index_async(run_id, max(0, int(start)))
 
 
 @router.get("/runs/{run_id}/events")
-def stream_events(run_id: str, request: Request, start: int = 0) -> StreamingResponse:
-    if not run_exists(run_id):
+async def stream_events(
+    run_id: str,
+    request: Request,
+    start: int = 0,
+    last_event_id: Optional[str] = None,
+) -> StreamingResponse:
+    if not await run_exists_async(run_id):
         raise HTTPException(status_code=404, detail="Run not found")
 
-    def event_stream() -> Generator[str, None, None]:
-        from .storage import get_events
-
-        start_time = time.time()
-        index = max(0, int(start))
-        last_event_id = request.headers.get("last-event-id")
-        if last_event_id:
-            try:
-                index = max(index, int(last_event_id) + 1)
-            except ValueError:
-                pass
-        while time.time() - start_time < STREAM_TIMEOUT_SECONDS:
-            items = get_events(run_id, index)
-            if items:
-                for raw in items:
-                    yield f"id: {index}\n"
-                    yield f"data: {raw}\n\n"
-                    index += 1
-            else:
-                yield ": keep-alive\n\n"
-            time.sleep(POLL_INTERVAL_SECONDS)
+    # EventSource cannot set headers on a fresh connection, so the id may also
+    # arrive as ?last_event_id=.
+    after_id = await _resume_after(
+        run_id, start, request.headers.get("last-event-id") or last_event_id
+    )
+
+    async def event_stream() -> AsyncGenerator[str, None]:
+        deadline = time.monotonic() + STREAM_TIMEOUT_SECONDS
+        async with event_hub.subscribe(run_id, after_id) as subscription:
+            while not await request.is_disconnected():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                items = await subscription.next_batch(min(remaining, KEEPALIVE_SECONDS))
+                if items:
+                    for event_id, raw in items:
+                        yield f"id: {event_id}\ndata: {raw}\n\n"
+                else:
+                    yield ": keep-alive\n\n"
 
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
@@ -350,7 +518,7 @@ def export_run(run_id: str, format: str = "md") -> Response:
     if format not in {"ide", "cursor"}:
         raise HTTPException(status_code=400, detail="Only md, ide, or cursor is supported in MVP")
 
-    prompt = _load_prompt("ide_agent_prompt").strip()
+    prompt = prompt_templates.get("ide_agent_prompt").source.strip()
     if format == "cursor":
         cursor_doc = _strip_api_design(final_doc)
         cursor_doc = _minimize_newlines(cursor_doc)
@@ -364,3 +532,13 @@ def export_run(run_id: str, format: str = "md") -> Response:
     combined = "\n\n---\n\n".join(parts)
     headers = {"Content-Disposition": 'attachment; filename="teamflow_ide_prompt.md"'}
     return Response(content=combined, media_type="text/markdown; charset=utf-8", headers=headers)
+
+
+@router.get("/metrics")
+def metrics() -> dict:
+    return {**get_metrics(), **rate_limit_metrics()}
+
+
+@router.get("/queue")
+def queue() -> dict:
+    return admission.queue_stats()
@@ -1,14 +1,50 @@
+import os
+
 from celery import Celery
 from dotenv import load_dotenv
+from kombu import Queue
 
 load_dotenv()
 
-from .storage import REDIS_URL
+from .storage_redis import (
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_SOCKET_KEEPALIVE,
+    REDIS_URL,
+)
+
+# Kombu cannot use Redis Cluster as a broker; in cluster mode point these at a
+# standalone Redis.
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+# Run tasks inline in the calling process (no broker or worker). Combined with
+# TEAMFLOW_STORAGE_BACKEND=memory this runs the API and orchestrator in one process.
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+TEAMFLOW_RECOVERY_INTERVAL_SECONDS = max(
+    5.0, float(os.getenv("TEAMFLOW_RECOVERY_INTERVAL_SECONDS", "60"))
+)
+
+# Runs are routed by class so interactive work never queues behind bulk work. A worker
+# started without -Q consumes every lane; scripts/run_lane_workers.py gives each lane
+# its own weighted share of worker slots.
+LANES = ("fast", "regenerate", "full", "batch")
+DEFAULT_LANE = "full"
+
+
+def lane_queue(lane: str) -> str:
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane: {lane}")
+    return f"teamflow.{lane}"
+
 
 celery_app = Celery(
     "teamflow_fastapi",
-    broker=REDIS_URL,
-    backend=REDIS_URL,
+    broker=CELERY_BROKER_URL,
+    backend=CELERY_RESULT_BACKEND,
     include=["teamflow_fastapi.tasks"],
 )
 
@@ -18,4 +54,33 @@ celery_app.conf.update(
     accept_content=["json"],
     timezone="UTC",
     enable_utc=True,
+    task_always_eager=CELERY_TASK_ALWAYS_EAGER,
+    task_queues=[Queue(lane_queue(lane)) for lane in LANES],
+    task_default_queue=lane_queue(DEFAULT_LANE),
+    # Runs are long; a worker must not hold queued runs it cannot start yet, or a free
+    # worker on the same lane sits idle while they wait.
+    worker_prefetch_multiplier=1,
+    # Run `celery -A teamflow_fastapi.celery_app beat` (or a worker with -B) so runs
+    # orphaned by a dead worker are resumed from their last checkpoint.
+    beat_schedule={
+        "recover-stale-runs": {
+            "task": "teamflow_fastapi.tasks.recover_stale_runs",
+            "schedule": TEAMFLOW_RECOVERY_INTERVAL_SECONDS,
+        },
+        # Finishing runs admit waiting ones; this catches runs that stopped otherwise.
+        "admit-waiting-runs": {
+            "task": "teamflow_fastapi.tasks.admit_waiting_runs",
+            "schedule": 5.0,
+        },
+    },
+    # Keep the broker/result-backend connections pooled with the same limits as storage.
+    broker_pool_limit=REDIS_MAX_CONNECTIONS,
+    broker_transport_options={
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "socket_keepalive": REDIS_SOCKET_KEEPALIVE,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+    },
+    redis_max_connections=REDIS_MAX_CONNECTIONS,
+    redis_socket_keepalive=REDIS_SOCKET_KEEPALIVE,
+    redis_backend_health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
 )
@@ -0,0 +1,90 @@
+"""Per-node checkpoints, used to resume a run after its worker died and to skip
+unchanged work when a step is regenerated.
+
+When a node finishes, the run meta gets ckpt:<node> holding digests of the inputs it
+read and the outputs it wrote. On resume, a node is skipped when its own checkpoint
+chains onto the checkpoints of the nodes it depends on, and the artifacts it left
+behind are still the ones in storage. Everything else reruns. On regeneration, a
+downstream node is skipped when its inputs and outputs match its checkpoint (unchanged).
+"""
+import hashlib
+import json
+import time
+from typing import Callable, Dict, Optional, Set
+
+from .pipeline import Node, Pipeline
+from .storage import get_run_meta, set_run_meta
+
+_PREFIX = "ckpt:"
+
+
+def digest(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()[:16]
+
+
+def write_checkpoint(
+    run_id: str, node: Node, inputs: Dict[str, str], outputs: Dict[str, str]
+) -> None:
+    record = {
+        "in": {name: digest(value) for name, value in inputs.items()},
+        "out": {name: digest(value) for name, value in outputs.items()},
+        "at": int(time.time()),
+    }
+    set_run_meta(run_id, {f"{_PREFIX}{node.name}": json.dumps(record)})
+
+
+def unchanged(record: Optional[Dict], inputs: Dict[str, str], outputs: Dict[str, str]) -> bool:
+    """Whether record was written for exactly these inputs and these outputs."""
+    if not record:
+        return False
+    return record.get("in") == {name: digest(value) for name, value in inputs.items()} and (
+        record.get("out") == {name: digest(value) for name, value in outputs.items()}
+    )
+
+
+def clear_checkpoints(run_id: str, nodes) -> None:
+    """Invalidate the checkpoints of nodes that are about to rerun."""
+    set_run_meta(run_id, {f"{_PREFIX}{node.name}": "" for node in nodes})
+
+
+def load_checkpoints(run_id: str) -> Dict[str, Dict]:
+    checkpoints = {}
+    for key, raw in get_run_meta(run_id).items():
+        if key.startswith(_PREFIX) and raw:
+            try:
+                checkpoints[key[len(_PREFIX) :]] = json.loads(raw)
+            except ValueError:
+                continue
+    return checkpoints
+
+
+def completed_nodes(
+    pipeline: Pipeline, checkpoints: Dict[str, Dict], read: Callable[[str], str]
+) -> Set[str]:
+    """Nodes whose checkpointed work is still valid for the artifacts read() returns."""
+    checkpoints = dict(checkpoints)
+    while True:
+        done: Set[str] = set()
+        expected: Dict[str, str] = {}
+        producer: Dict[str, str] = {}
+        for node in pipeline.nodes:
+            record = checkpoints.get(node.name)
+            if record is None or not pipeline.deps[node.name] <= done:
+                continue
+            wanted = {
+                name: expected[name] if name in expected else digest(read(name))
+                for name in node.inputs
+            }
+            if record.get("in") != wanted:
+                continue
+            done.add(node.name)
+            for name, value in record.get("out", {}).items():
+                expected[name] = value
+                producer[name] = node.name
+        # A crash between writing an output and the next checkpoint leaves storage
+        # ahead of (or behind) the checkpoints; redo the node that wrote it.
+        stale = {producer[name] for name, value in expected.items() if digest(read(name)) != value}
+        if not stale:
+            return done
+        for name in stale:
+            del checkpoints[name]
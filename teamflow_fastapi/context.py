@@ -0,0 +1,96 @@
+"""Fit downstream prompts into an input token budget.
+
+Tokens are estimated locally (~4 characters per token). When a rendered prompt would
+exceed TEAMFLOW_PROMPT_TOKEN_BUDGET, its inputs are compressed structurally (headings
+kept, bullets per section and line length capped) starting with the least important
+input for that template, one compression level at a time, until the prompt fits.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from .templates import Template
+
+# 0 disables packing: every input is passed verbatim.
+TEAMFLOW_PROMPT_TOKEN_BUDGET = max(0, int(os.getenv("TEAMFLOW_PROMPT_TOKEN_BUDGET", "0")))
+CHARS_PER_TOKEN = 4
+
+# Inputs each template may have compressed, least important first. The artifact a step
+# works on directly (e.g. the architecture for QA) goes last.
+PACK_ORDER: Dict[str, tuple] = {
+    "qa": ("prd", "api", "arch"),
+    "principal_engineer": ("prd", "api", "arch"),
+    "tech_revision": ("prd", "pe_feedback", "qa_feedback", "api", "arch"),
+    "reviewer": ("stack", "risk", "test", "prd", "api", "arch"),
+}
+
+# (max bullets per section, max characters per line), mildest first.
+_LEVELS = [(12, 240), (8, 200), (6, 160), (4, 120), (2, 90), (1, 70)]
+
+
+def count_tokens(text: str) -> int:
+    return -(-len(text or "") // CHARS_PER_TOKEN)
+
+
+def compress_markdown(md: str, *, max_bullets: int, max_chars: int) -> str:
+    if not md:
+        return ""
+    lines = md.replace("\r\n", "\n").split("\n")
+    output = []
+    bullets_seen = 0
+    in_section = False
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            output.append(line)
+            bullets_seen = 0
+            in_section = True
+            continue
+        if line.startswith(("-", "*")):
+            if bullets_seen < max_bullets:
+                output.append(line[:max_chars].rstrip())
+            elif bullets_seen == max_bullets:
+                output.append("- (more in full document)")
+            bullets_seen += 1
+            continue
+        if in_section and bullets_seen == 0:
+            output.append(line[:max_chars].rstrip())
+    return "\n".join(output).strip()
+
+
+@dataclass
+class PackResult:
+    values: Dict[str, str]
+    tokens_before: int
+    tokens_after: int
+    compressed: List[str] = field(default_factory=list)
+
+
+def pack(
+    template: Template, values: Dict[str, str], budget: int = TEAMFLOW_PROMPT_TOKEN_BUDGET
+) -> PackResult:
+    """Compress values until template renders within budget tokens, if it can."""
+    overhead = count_tokens(template.render(**{name: "" for name in template.placeholders}))
+    sizes = {name: count_tokens(value) for name, value in values.items()}
+    before = overhead + sum(sizes.values())
+    order = [name for name in PACK_ORDER.get(template.name, ()) if values.get(name)]
+    if not budget or before <= budget or not order:
+        return PackResult(values, before, before)
+    packed = dict(values)
+    compressed: List[str] = []
+    total = before
+    for name in order:
+        for max_bullets, max_chars in _LEVELS:
+            candidate = compress_markdown(values[name], max_bullets=max_bullets, max_chars=max_chars)
+            size = count_tokens(candidate)
+            if size >= sizes[name]:
+                continue
+            total -= sizes[name] - size
+            packed[name], sizes[name] = candidate, size
+            if name not in compressed:
+                compressed.append(name)
+            if total <= budget:
+                return PackResult(packed, before, total, compressed)
+    return PackResult(packed, before, total, compressed)
@@ -0,0 +1,139 @@
+"""In-process fan-out of run events to SSE subscribers.
+
+Every viewer of a run shares one upstream read loop per API process, so storage load
+grows with the number of active runs rather than the number of open browser tabs.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from .storage import latest_event_id_async, read_events_async
+from .storage_base import event_id_key
+
+SSE_SUBSCRIBER_QUEUE_SIZE = max(1, int(os.getenv("SSE_SUBSCRIBER_QUEUE_SIZE", "256")))
+SSE_HUB_BLOCK_MS = max(100, int(os.getenv("SSE_HUB_BLOCK_MS", "5000")))
+SSE_REPLAY_BATCH = 500
+
+logger = logging.getLogger("teamflow.events_hub")
+
+Event = Tuple[str, str]
+
+
+async def _replay(run_id: str, after_id: str) -> List[Event]:
+    items: List[Event] = []
+    while True:
+        batch = await read_events_async(run_id, after_id, count=SSE_REPLAY_BATCH)
+        if not batch:
+            return items
+        items.extend(batch)
+        after_id = batch[-1][0]
+
+
+class Subscription:
+    """One SSE client's view of a run: replay from storage, then live events from the hub."""
+
+    def __init__(self, run_id: str, after_id: str) -> None:
+        self.run_id = run_id
+        self.last_id = after_id
+        self.lagged = False
+        self._queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=SSE_SUBSCRIBER_QUEUE_SIZE)
+        self._needs_replay = True
+
+    def offer(self, item: Event) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Slow consumer: stop queueing and let it catch up from the stream itself.
+            self.lagged = True
+
+    async def next_batch(self, timeout: float) -> List[Event]:
+        """Events after last_id; [] when nothing arrived within timeout."""
+        if self._needs_replay or self.lagged:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._needs_replay = False
+            self.lagged = False
+            items = await _replay(self.run_id, self.last_id)
+            if items:
+                self.last_id = items[-1][0]
+                return items
+        try:
+            first = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        pending = [first]
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        cursor = event_id_key(self.last_id)
+        items = [item for item in pending if event_id_key(item[0]) > cursor]
+        if items:
+            self.last_id = items[-1][0]
+        return items
+
+
+class _Channel:
+    def __init__(self, run_id: str, start_id: str) -> None:
+        self.run_id = run_id
+        self.last_id = start_id
+        self.subscribers: Set[Subscription] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    async def pump(self) -> None:
+        while True:
+            try:
+                items = await read_events_async(
+                    self.run_id, self.last_id, count=SSE_REPLAY_BATCH, block_ms=SSE_HUB_BLOCK_MS
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Upstream read failed for run_id=%s", self.run_id)
+                await asyncio.sleep(1.0)
+                continue
+            for item in items:
+                for subscriber in list(self.subscribers):
+                    subscriber.offer(item)
+            if items:
+                self.last_id = items[-1][0]
+
+
+class EventHub:
+    def __init__(self) -> None:
+        self._channels: Dict[str, _Channel] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            # Channels and their pump tasks belong to one event loop.
+            self._channels = {}
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, run_id: str, after_id: str) -> AsyncIterator[Subscription]:
+        subscription = Subscription(run_id, after_id)
+        async with self._get_lock():
+            channel = self._channels.get(run_id)
+            if channel is None:
+                # Start upstream at the current tail; the subscriber's own replay covers
+                # everything up to the moment it registered.
+                channel = _Channel(run_id, await latest_event_id_async(run_id))
+                channel.task = asyncio.create_task(channel.pump())
+                self._channels[run_id] = channel
+            channel.subscribers.add(subscription)
+        try:
+            yield subscription
+        finally:
+            # No awaits here: this also runs when the SSE task is being cancelled.
+            channel.subscribers.discard(subscription)
+            if not channel.subscribers and self._channels.get(run_id) is channel:
+                del self._channels[run_id]
+                channel.task.cancel()
+
+
+event_hub = EventHub()
@@ -0,0 +1,224 @@
+"""Content-addressed cache of agent outputs.
+
+Keys are a SHA-256 over the agent role, model, temperature and the exact rendered
+prompt, so any change to a template, an input artifact or the model settings misses.
+Stores (TEAMFLOW_LLM_CACHE): off (default) | memory | redis | disk. Every store keeps at
+most TEAMFLOW_LLM_CACHE_MAX_ENTRIES entries (least recently used go first) and drops
+entries older than TEAMFLOW_LLM_CACHE_TTL_SECONDS.
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+TEAMFLOW_LLM_CACHE = os.getenv("TEAMFLOW_LLM_CACHE", "off").lower()
+TEAMFLOW_LLM_CACHE_TTL_SECONDS = max(1, int(os.getenv("TEAMFLOW_LLM_CACHE_TTL_SECONDS", "604800")))
+TEAMFLOW_LLM_CACHE_MAX_ENTRIES = max(1, int(os.getenv("TEAMFLOW_LLM_CACHE_MAX_ENTRIES", "1000")))
+TEAMFLOW_LLM_CACHE_DIR = os.getenv("TEAMFLOW_LLM_CACHE_DIR", ".cache/llm")
+
+logger = logging.getLogger("teamflow.llm_cache")
+
+
+def cache_key(*, role: str, model: str, temperature: float, prompt: str, input_text: str) -> str:
+    payload = json.dumps(
+        {
+            "v": 1,
+            "role": role,
+            "model": model,
+            "temperature": temperature,
+            "prompt": prompt,
+            "input": input_text,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int, ttl_seconds: int) -> None:
+        self._entries: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, value = entry
+            if time.time() - created > self._ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCache:
+    """One string key per entry (TTL'd by Redis) plus a sorted set of last-access times."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return f"teamflow:llm_cache:{key}"
+
+    _LRU_KEY = "teamflow:llm_cache:lru"
+
+    def _redis(self):
+        from .storage_redis import get_redis
+
+        return get_redis()
+
+    def get(self, key: str) -> Optional[str]:
+        pipe = self._redis().pipeline(transaction=False)
+        pipe.get(self._key(key))
+        pipe.zadd(self._LRU_KEY, {key: time.time()}, xx=True)
+        value, _ = pipe.execute()
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        r = self._redis()
+        pipe = r.pipeline(transaction=False)
+        pipe.set(self._key(key), value, ex=self._ttl)
+        pipe.zadd(self._LRU_KEY, {key: time.time()})
+        pipe.zcard(self._LRU_KEY)
+        _, _, size = pipe.execute()
+        if size <= self._max_entries:
+            return
+        evicted = r.zpopmin(self._LRU_KEY, size - self._max_entries)
+        pipe = r.pipeline(transaction=False)
+        for old_key, _ in evicted:
+            # One DEL per key: entries may live on different cluster slots.
+            pipe.delete(self._key(old_key))
+        pipe.execute()
+
+
+class DiskCache:
+    """One JSON file per entry; file mtime is the last access time.
+
+    Writes keep a running entry count and only scan the directory once it passes
+    max_entries; each scan evicts down to 90% of the limit, so scans are amortized over
+    many writes. Other processes sharing the directory make the count drift; every scan
+    resets it.
+    """
+
+    def __init__(self, directory: str, max_entries: int, ttl_seconds: int) -> None:
+        self._dir = Path(directory)
+        self._max_entries = max_entries
+        self._low_water = max_entries - max_entries // 10
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._count: Optional[int] = None  # unknown until the first scan
+
+    def _path(self, key: str) -> Path:
+        return self._dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("created", 0) > self._ttl:
+            path.unlink(missing_ok=True)
+            with self._lock:
+                if self._count:
+                    self._count -= 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("value")
+
+    def set(self, key: str, value: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        added = not path.exists()
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"created": time.time(), "value": value}), encoding="utf-8")
+        os.replace(tmp, path)
+        with self._lock:
+            if self._count is not None:
+                self._count += added
+            if self._count is None or self._count > self._max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self._dir.glob("*/*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        self._count = len(entries)
+        if len(entries) <= self._max_entries:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self._low_water]:
+            path.unlink(missing_ok=True)
+        self._count = self._low_water
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The configured store, or None when caching is off."""
+    global _cache
+    if TEAMFLOW_LLM_CACHE in {"", "off", "false", "0"}:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if TEAMFLOW_LLM_CACHE == "redis":
+                    _cache = RedisCache(TEAMFLOW_LLM_CACHE_MAX_ENTRIES, TEAMFLOW_LLM_CACHE_TTL_SECONDS)
+                elif TEAMFLOW_LLM_CACHE == "disk":
+                    _cache = DiskCache(
+                        TEAMFLOW_LLM_CACHE_DIR,
+                        TEAMFLOW_LLM_CACHE_MAX_ENTRIES,
+                        TEAMFLOW_LLM_CACHE_TTL_SECONDS,
+                    )
+                elif TEAMFLOW_LLM_CACHE == "memory":
+                    _cache = MemoryCache(TEAMFLOW_LLM_CACHE_MAX_ENTRIES, TEAMFLOW_LLM_CACHE_TTL_SECONDS)
+                else:
+                    raise ValueError(f"Unknown TEAMFLOW_LLM_CACHE: {TEAMFLOW_LLM_CACHE}")
+    return _cache
+
+
+def cache_get(key: str) -> Optional[str]:
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.get(key)
+    except Exception:
+        # A broken cache must never fail a run; fall through to the model.
+        logger.exception("LLM cache read failed")
+        return None
+
+
+def cache_set(key: str, value: str) -> None:
+    cache = get_cache()
+    if cache is None or not value:
+        return
+    try:
+        cache.set(key, value)
+    except Exception:
+        logger.exception("LLM cache write failed")
@@ -0,0 +1,160 @@
+"""Model backends for agent calls: the OpenAI Agents SDK, or a local stub.
+
+TEAMFLOW_MODEL_BACKEND=stub replaces every model call with deterministic Markdown
+carrying the headings each step's parser expects, after a sampled latency, so the
+orchestrator, storage and SSE paths can be load-tested without network or API key.
+The same role + prompt always yields the same text (as the LLM cache would); latency
+and failures come from one seeded random stream per process.
+
+TEAMFLOW_STUB_LATENCY_MS picks the latency distribution: "fixed:<ms>",
+"uniform:<min>:<max>" or "lognormal:<median>:<sigma>".
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+MODEL_BACKENDS = ("openai", "stub")
+TEAMFLOW_MODEL_BACKEND = os.getenv("TEAMFLOW_MODEL_BACKEND", "openai").lower()
+if TEAMFLOW_MODEL_BACKEND not in MODEL_BACKENDS:
+    raise ValueError(f"Unknown TEAMFLOW_MODEL_BACKEND: {TEAMFLOW_MODEL_BACKEND}")
+TEAMFLOW_STUB_LATENCY_MS = os.getenv("TEAMFLOW_STUB_LATENCY_MS", "lognormal:1500:0.5")
+TEAMFLOW_STUB_FAILURE_RATE = min(
+    1.0, max(0.0, float(os.getenv("TEAMFLOW_STUB_FAILURE_RATE", "0")))
+)
+# Characters per generated section (each ±25%); Tech Lead and QA replies have two.
+TEAMFLOW_STUB_OUTPUT_CHARS = max(200, int(os.getenv("TEAMFLOW_STUB_OUTPUT_CHARS", "3000")))
+TEAMFLOW_STUB_SEED = int(os.getenv("TEAMFLOW_STUB_SEED", "0"))
+# Streamed stub output is released in this many chunks spread over the latency.
+STUB_STREAM_CHUNKS = 20
+
+logger = logging.getLogger("teamflow.model_backends")
+
+STUB_SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "Product Manager": ("Product Requirements (PRD)",),
+    "Tech Lead": ("System Architecture", "API Design"),
+    "QA Engineer": ("Test Plan", "Risk Analysis"),
+    "Principal Engineer": ("Tech Stack Recommendation",),
+    "Reviewer": ("Review Notes",),
+}
+_SUBHEADINGS = ("Overview", "Components", "Constraints", "Open Questions", "Next Steps")
+_WORDS = (
+    "service queue cache request latency user account workflow storage event retry "
+    "timeout schema endpoint token budget worker deploy metric alert index replica "
+    "session export review draft artifact lease batch lane priority quota"
+).split()
+
+
+class StubModelError(RuntimeError):
+    """Failure injected by TEAMFLOW_STUB_FAILURE_RATE."""
+
+
+def _parse_latency(spec: str) -> Callable[[random.Random], float]:
+    kind, _, rest = spec.partition(":")
+    args = [float(value) for value in rest.split(":") if value]
+    if kind == "fixed" and len(args) == 1:
+        return lambda rng: args[0]
+    if kind == "uniform" and len(args) == 2:
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "lognormal" and len(args) == 2:
+        return lambda rng: rng.lognormvariate(math.log(max(args[0], 1.0)), args[1])
+    raise ValueError(f"Invalid TEAMFLOW_STUB_LATENCY_MS: {spec!r}")
+
+
+class StubModel:
+    def __init__(
+        self,
+        latency_ms: str = TEAMFLOW_STUB_LATENCY_MS,
+        failure_rate: float = TEAMFLOW_STUB_FAILURE_RATE,
+        output_chars: int = TEAMFLOW_STUB_OUTPUT_CHARS,
+        seed: int = TEAMFLOW_STUB_SEED,
+    ) -> None:
+        self._latency = _parse_latency(latency_ms)
+        self._failure_rate = failure_rate
+        self._output_chars = output_chars
+        self._seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._lock:
+            latency = max(0.0, self._latency(self._rng)) / 1000
+            return latency, self._rng.random() < self._failure_rate
+
+    def render(self, role: str, prompt: str) -> str:
+        digest = hashlib.sha256(f"{self._seed}\0{role}\0{prompt}".encode("utf-8")).digest()
+        rng = random.Random(digest)
+        sections = STUB_SECTIONS.get(role, (role,))
+        return "\n\n".join(self._section(rng, title) for title in sections)
+
+    def _section(self, rng: random.Random, title: str) -> str:
+        target = int(self._output_chars * rng.uniform(0.75, 1.25))
+        lines = [f"# {title}"]
+        size = len(lines[0])
+        while size < target:
+            heading = f"## {rng.choice(_SUBHEADINGS)}"
+            lines += ["", heading]
+            size += len(heading) + 2
+            for _ in range(rng.randint(3, 6)):
+                words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 18)))
+                bullet = f"- {words.capitalize()}."
+                lines.append(bullet)
+                size += len(bullet) + 2
+                if size >= target:
+                    break
+        return "\n".join(lines)
+
+    def run_sync(self, role: str, prompt: str) -> str:
+        latency, fail = self._draw()
+        time.sleep(latency)
+        if fail:
+            raise StubModelError(f"Injected failure for {role}")
+        return self.render(role, prompt)
+
+    async def run(
+        self,
+        role: str,
+        prompt: str,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> str:
+        """Sleep for the sampled latency (cancellable), streaming the reply if asked."""
+        latency, fail = self._draw()
+        text = self.render(role, prompt)
+        if on_delta is None:
+            await asyncio.sleep(latency)
+        else:
+            step = -(-len(text) // STUB_STREAM_CHUNKS)
+            chunks: List[str] = [text[i : i + step] for i in range(0, len(text), step)]
+            for chunk in chunks:
+                await asyncio.sleep(latency / len(chunks))
+                if not fail:
+                    await on_delta(chunk)
+        if fail:
+            raise StubModelError(f"Injected failure for {role}")
+        return text
+
+
+_stub: Optional[StubModel] = None
+_stub_lock = threading.Lock()
+
+
+def get_stub_model() -> Optional[StubModel]:
+    """The process-wide stub when TEAMFLOW_MODEL_BACKEND=stub, else None."""
+    global _stub
+    if TEAMFLOW_MODEL_BACKEND != "stub":
+        return None
+    if _stub is None:
+        with _stub_lock:
+            if _stub is None:
+                _stub = StubModel()
+                logger.warning(
+                    "Model calls go to the stub backend (latency=%s, failure_rate=%s)",
+                    TEAMFLOW_STUB_LATENCY_MS,
+                    TEAMFLOW_STUB_FAILURE_RATE,
+                )
+    return _stub
@@ -7,11 +7,35 @@ class RunCreateRequest(BaseModel):
     idea: str = Field(..., max_length=1000)
     fast_mode: bool = Field(default=False)
     max_chars: Optional[int] = Field(default=None, ge=500, le=20000)
+    use_cache: bool = Field(default=True)
+    reuse_similar: bool = Field(default=True)
 
 
 class RunCreateResponse(BaseModel):
     id: str
     status: str
+    # Set when admission control put the run on the waiting list.
+    position: Optional[int] = None
+    estimated_start_at: Optional[int] = None
+
+
+class RunBatchCreateRequest(BaseModel):
+    runs: List[RunCreateRequest] = Field(..., min_length=1, max_length=1000)
+
+
+class RunBatchCreateResponse(BaseModel):
+    id: str
+    status: str
+    run_ids: List[str]
+
+
+class BatchStatusResponse(BaseModel):
+    id: str
+    status: str
+    total: int
+    # Runs per status, e.g. {"completed": 40, "running": 8, "queued": 52}.
+    counts: Dict[str, int]
+    runs: Dict[str, str]
 
 
 class StepStatus(BaseModel):
@@ -0,0 +1,156 @@
+"""Orchestration graph: each node declares the artifacts it reads and writes.
+
+Dependencies are derived from those declarations (read-after-write, write-after-read
+and write-after-write on the same artifact), and run_nodes() starts every node whose
+dependencies are done, so independent steps (QA and the Principal Engineer) overlap.
+Regeneration reruns a node plus everything downstream of it in the same graph.
+"""
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+TEAMFLOW_MAX_PARALLEL_STEPS = max(1, int(os.getenv("TEAMFLOW_MAX_PARALLEL_STEPS", "4")))
+
+logger = logging.getLogger("teamflow.pipeline")
+
+
+@dataclass(frozen=True)
+class Node:
+    name: str
+    kind: str
+    step: str
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    iteration: int = 0
+
+
+class Pipeline:
+    def __init__(self, nodes: List[Node]) -> None:
+        self.nodes = nodes
+        self.by_name = {node.name: node for node in nodes}
+        self.deps: Dict[str, Set[str]] = {}
+        last_writer: Dict[str, str] = {}
+        readers: Dict[str, Set[str]] = {}
+        for node in nodes:
+            deps = {last_writer[name] for name in node.inputs if name in last_writer}
+            for name in node.outputs:
+                if name in last_writer:
+                    deps.add(last_writer[name])
+                deps |= readers.get(name, set())
+            deps.discard(node.name)
+            self.deps[node.name] = deps
+            for name in node.inputs:
+                readers.setdefault(name, set()).add(node.name)
+            for name in node.outputs:
+                last_writer[name] = node.name
+                readers[name] = set()
+
+    def dependents(self, name: str) -> Set[str]:
+        """Every node that (transitively) depends on name."""
+        found: Set[str] = set()
+        frontier = [name]
+        while frontier:
+            current = frontier.pop()
+            for node in self.nodes:
+                if current in self.deps[node.name] and node.name not in found:
+                    found.add(node.name)
+                    frontier.append(node.name)
+        return found
+
+    def affected(self, step: str) -> List[Node]:
+        """Nodes to rerun when step is regenerated, in graph order."""
+        names = {step} | self.dependents(step)
+        return [node for node in self.nodes if node.name in names]
+
+    def artifacts_to_clear(self, affected: List[Node]) -> List[str]:
+        """Artifacts rewritten from scratch by a rerun.
+
+        An artifact whose first affected toucher reads it (e.g. a revision revising the
+        architecture) must survive until that node runs.
+        """
+        seen: Set[str] = set()
+        cleared: List[str] = []
+        for node in affected:
+            for name in node.inputs:
+                seen.add(name)
+            for name in node.outputs:
+                if name not in seen:
+                    cleared.append(name)
+                seen.add(name)
+        return cleared
+
+    def run_nodes(
+        self,
+        nodes: List[Node],
+        execute: Callable[[Node], bool],
+        *,
+        max_workers: int = TEAMFLOW_MAX_PARALLEL_STEPS,
+    ) -> bool:
+        """Run nodes as their dependencies complete; False once any node asks to stop.
+
+        Dependencies outside nodes count as satisfied. The first exception is re-raised
+        after in-flight nodes finish; nothing new starts once a node fails or stops.
+        """
+        selected = {node.name for node in nodes}
+        pending = {node.name: self.deps[node.name] & selected for node in nodes}
+        done: Set[str] = set()
+        running: Dict[Future, Node] = {}
+        stopped = False
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="teamflow-step") as pool:
+            while pending or running:
+                if not stopped and error is None:
+                    for node in nodes:
+                        if node.name in pending and pending[node.name] <= done:
+                            del pending[node.name]
+                            running[pool.submit(execute, node)] = node
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node = running.pop(future)
+                    exc = future.exception()
+                    if exc is not None:
+                        logger.warning("Node %s failed: %s", node.name, exc)
+                        error = error or exc
+                    elif future.result():
+                        done.add(node.name)
+                    else:
+                        stopped = True
+        if error is not None:
+            raise error
+        return not stopped and not pending
+
+
+def build_pipeline(revision_cycles: int, review_enabled: bool) -> Pipeline:
+    nodes = [
+        Node("pm", "pm", "pm", ("idea",), ("prd",)),
+        Node("tech", "tech", "tech", ("prd",), ("arch", "api")),
+        Node("qa", "qa", "qa", ("prd", "arch", "api"), ("test", "risk")),
+        Node("principal", "principal", "principal", ("prd", "arch", "api"), ("stack",)),
+    ]
+    for iteration in range(1, revision_cycles + 1):
+        nodes.append(
+            Node(
+                f"revise_{iteration}",
+                "revise",
+                "tech",
+                ("prd", "arch", "api", "test", "risk", "stack"),
+                ("arch", "api"),
+                iteration,
+            )
+        )
+    if review_enabled:
+        nodes.append(
+            Node(
+                "review",
+                "review",
+                "review",
+                ("prd", "arch", "api", "test", "risk", "stack"),
+                ("review",),
+                revision_cycles,
+            )
+        )
+    return Pipeline(nodes)
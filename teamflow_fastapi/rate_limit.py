@@ -0,0 +1,285 @@
+"""Token-bucket limiter on model requests and tokens per minute, shared by all workers.
+
+Each model has two buckets (requests, tokens) that refill continuously up to one
+minute's budget. Callers queue per model in arrival order and only the head of the
+queue may take capacity, so a burst from one run cannot starve another. With the Redis
+storage backend the buckets and the queue live in Redis (one Lua call per attempt) and
+are shared across the fleet; otherwise they are per process.
+
+Budgets: TEAMFLOW_RATE_LIMIT_RPM / TEAMFLOW_RATE_LIMIT_TPM apply to every model (0 =
+unlimited), TEAMFLOW_RATE_LIMITS overrides them per model ("gpt-5.2=500:200000,...").
+"""
+import collections
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Tuple
+
+from .context import count_tokens
+from .storage import TEAMFLOW_STORAGE_BACKEND
+
+TEAMFLOW_RATE_LIMIT_RPM = max(0, int(os.getenv("TEAMFLOW_RATE_LIMIT_RPM", "0")))
+TEAMFLOW_RATE_LIMIT_TPM = max(0, int(os.getenv("TEAMFLOW_RATE_LIMIT_TPM", "0")))
+TEAMFLOW_RATE_LIMITS = os.getenv("TEAMFLOW_RATE_LIMITS", "")
+# Tokens reserved per call on top of the prompt estimate (the reply is not known upfront).
+TEAMFLOW_RATE_LIMIT_OUTPUT_TOKENS = max(
+    0, int(os.getenv("TEAMFLOW_RATE_LIMIT_OUTPUT_TOKENS", "2000"))
+)
+# A queued caller that has not polled for this long (its worker died) loses its place.
+RATE_LIMIT_STALE_MS = 5000
+RATE_LIMIT_POLL_MS = 100
+
+logger = logging.getLogger("teamflow.rate_limit")
+
+
+def _parse_budgets(spec: str) -> Dict[str, Tuple[int, int]]:
+    budgets = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            model, limits = item.rsplit("=", 1)
+            rpm, _, tpm = limits.partition(":")
+            budgets[model.strip()] = (max(0, int(rpm or 0)), max(0, int(tpm or 0)))
+        except ValueError:
+            logger.warning("Ignoring malformed TEAMFLOW_RATE_LIMITS entry: %s", item)
+    return budgets
+
+
+_BUDGETS = _parse_budgets(TEAMFLOW_RATE_LIMITS)
+
+
+def budget_for(model: str) -> Tuple[int, int]:
+    """(requests per minute, tokens per minute) for model; 0 means unlimited."""
+    return _BUDGETS.get(model, (TEAMFLOW_RATE_LIMIT_RPM, TEAMFLOW_RATE_LIMIT_TPM))
+
+
+def estimate_tokens(*texts: str) -> int:
+    # The reply is not known upfront, so reserve a fixed amount for it.
+    return sum(count_tokens(text) for text in texts) + TEAMFLOW_RATE_LIMIT_OUTPUT_TOKENS
+
+
+def _refill(level: float, capacity: int, elapsed_ms: float) -> float:
+    return min(float(capacity), level + elapsed_ms * capacity / 60000.0)
+
+
+def _wait_ms(level: float, need: float, capacity: int) -> float:
+    return max(0.0, (need - level) * 60000.0 / capacity) if capacity else 0.0
+
+
+class RateLimitWaitCancelled(Exception):
+    """The caller's should_cancel() returned True while it waited; it left the queue."""
+
+
+class MemoryLimiter:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}
+        self._queues: Dict[str, "collections.OrderedDict[str, float]"] = {}
+        self._metrics: Dict[str, int] = collections.Counter()
+
+    def try_acquire(
+        self, model: str, ticket: str, rpm: int, tpm: int, tokens: int
+    ) -> Tuple[bool, float]:
+        now = time.monotonic() * 1000
+        with self._lock:
+            queue = self._queues.setdefault(model, collections.OrderedDict())
+            queue[ticket] = now
+            for head, seen in list(queue.items()):
+                if head == ticket or now - seen < RATE_LIMIT_STALE_MS:
+                    break
+                del queue[head]
+            ahead = list(queue).index(ticket)
+            req, tok, last = self._buckets.setdefault(model, [float(rpm), float(tpm), now])
+            req, tok = _refill(req, rpm, now - last), _refill(tok, tpm, now - last)
+            need = min(tokens, tpm)
+            if not ahead and (not rpm or req >= 1) and (not tpm or tok >= need):
+                req, tok = req - (1 if rpm else 0), tok - (need if tpm else 0)
+                del queue[ticket]
+                granted, wait = True, 0.0
+            else:
+                # The callers ahead are served first; assume each needs what this one does.
+                granted = False
+                calls = ahead + 1
+                wait = max(_wait_ms(req, calls, rpm), _wait_ms(tok, calls * need, tpm))
+                if ahead:
+                    wait = max(wait, float(RATE_LIMIT_POLL_MS))
+            self._buckets[model] = [req, tok, now]
+            return granted, wait
+
+    def leave(self, model: str, ticket: str) -> None:
+        with self._lock:
+            self._queues.get(model, {}).pop(ticket, None)
+
+    def record(self, waited_ms: int) -> None:
+        with self._lock:
+            self._metrics["rate_limit_acquired"] += 1
+            if waited_ms:
+                self._metrics["rate_limit_waited"] += 1
+                self._metrics["rate_limit_wait_ms_total"] += waited_ms
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._metrics)
+
+
+# KEYS: bucket hash, queue zset (arrival order), last-poll hash.
+# ARGV: rpm, tpm, tokens, ticket, stale_ms, poll_ms. The clock is Redis TIME, so
+# workers with skewed clocks share one refill clock.
+# Returns {granted (0/1), estimated wait in ms}: the refill time for this call and every
+# caller queued ahead of it (assumed to need as many tokens), at least poll_ms when queued.
+_ACQUIRE_LUA = """
+local bucket_key, queue_key, seen_key = KEYS[1], KEYS[2], KEYS[3]
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local rpm, tpm, tokens = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local ticket, stale, poll = ARGV[4], tonumber(ARGV[5]), tonumber(ARGV[6])
+redis.call('ZADD', queue_key, 'NX', now, ticket)
+redis.call('HSET', seen_key, ticket, now)
+redis.call('PEXPIRE', queue_key, 120000)
+redis.call('PEXPIRE', seen_key, 120000)
+local ahead = 0
+while true do
+  local head = redis.call('ZRANGE', queue_key, 0, 0)[1]
+  if head == ticket then break end
+  local seen = tonumber(redis.call('HGET', seen_key, head) or '0')
+  if now - seen < stale then
+    ahead = redis.call('ZRANK', queue_key, ticket)
+    break
+  end
+  redis.call('ZREM', queue_key, head)
+  redis.call('HDEL', seen_key, head)
+end
+local state = redis.call('HMGET', bucket_key, 'req', 'tok', 'ts')
+local req = tonumber(state[1] or rpm)
+local tok = tonumber(state[2] or tpm)
+local elapsed = math.max(0, now - tonumber(state[3] or now))
+req = math.min(rpm, req + elapsed * rpm / 60000)
+tok = math.min(tpm, tok + elapsed * tpm / 60000)
+local need = math.min(tokens, tpm)
+local granted, wait = 0, 0
+if ahead == 0 and (rpm == 0 or req >= 1) and (tpm == 0 or tok >= need) then
+  if rpm > 0 then req = req - 1 end
+  if tpm > 0 then tok = tok - need end
+  redis.call('ZREM', queue_key, ticket)
+  redis.call('HDEL', seen_key, ticket)
+  granted = 1
+else
+  local calls = ahead + 1
+  if rpm > 0 then wait = math.max(wait, (calls - req) * 60000 / rpm) end
+  if tpm > 0 then wait = math.max(wait, (calls * need - tok) * 60000 / tpm) end
+  if ahead > 0 then wait = math.max(wait, poll) end
+end
+redis.call('HSET', bucket_key, 'req', tostring(req), 'tok', tostring(tok), 'ts', now)
+redis.call('PEXPIRE', bucket_key, 120000)
+return {granted, math.ceil(wait)}
+"""
+
+
+class RedisLimiter:
+    """Buckets and queue per model in Redis; the {model} hash tag keeps them on one shard."""
+
+    _METRICS_KEY = "teamflow:ratelimit:metrics"
+
+    def __init__(self) -> None:
+        self._script = None
+
+    def _redis(self):
+        from .storage_redis import get_redis
+
+        return get_redis()
+
+    @staticmethod
+    def _keys(model: str) -> list:
+        base = f"teamflow:ratelimit:{{{model}}}"
+        return [base, f"{base}:queue", f"{base}:seen"]
+
+    def try_acquire(
+        self, model: str, ticket: str, rpm: int, tpm: int, tokens: int
+    ) -> Tuple[bool, float]:
+        if self._script is None:
+            self._script = self._redis().register_script(_ACQUIRE_LUA)
+        granted, wait = self._script(
+            keys=self._keys(model),
+            args=[rpm, tpm, tokens, ticket, RATE_LIMIT_STALE_MS, RATE_LIMIT_POLL_MS],
+        )
+        return bool(int(granted)), float(wait)
+
+    def leave(self, model: str, ticket: str) -> None:
+        _, queue_key, seen_key = self._keys(model)
+        pipe = self._redis().pipeline(transaction=False)
+        pipe.zrem(queue_key, ticket)
+        pipe.hdel(seen_key, ticket)
+        pipe.execute()
+
+    def record(self, waited_ms: int) -> None:
+        pipe = self._redis().pipeline(transaction=False)
+        pipe.hincrby(self._METRICS_KEY, "rate_limit_acquired", 1)
+        if waited_ms:
+            pipe.hincrby(self._METRICS_KEY, "rate_limit_waited", 1)
+            pipe.hincrby(self._METRICS_KEY, "rate_limit_wait_ms_total", waited_ms)
+        pipe.execute()
+
+    def metrics(self) -> Dict[str, int]:
+        raw = self._redis().hgetall(self._METRICS_KEY) or {}
+        return {key: int(value) for key, value in raw.items()}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+_tickets = itertools.count()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RedisLimiter() if TEAMFLOW_STORAGE_BACKEND == "redis" else MemoryLimiter()
+    return _limiter
+
+
+def acquire(model: str, tokens: int, *, on_wait=None, should_cancel=None) -> int:
+    """Block until model has capacity for one request of tokens; return the ms waited.
+
+    on_wait(estimated_wait_ms) is called once, the first time the caller has to wait.
+    should_cancel() is checked between polls; once it returns True the caller leaves
+    the queue and RateLimitWaitCancelled is raised.
+    """
+    rpm, tpm = budget_for(model)
+    if not rpm and not tpm:
+        return 0
+    limiter = get_limiter()
+    ticket = f"{uuid.uuid4().hex[:12]}-{next(_tickets)}"
+    started = time.monotonic()
+    notified = False
+    try:
+        while True:
+            granted, wait_ms = limiter.try_acquire(model, ticket, rpm, tpm, tokens)
+            if granted:
+                break
+            if not notified:
+                notified = True
+                if on_wait is not None:
+                    on_wait(int(wait_ms))
+            if should_cancel is not None and should_cancel():
+                raise RateLimitWaitCancelled(model)
+            # Poll at least every RATE_LIMIT_POLL_MS so the queue slot stays live.
+            time.sleep(max(10, min(wait_ms, RATE_LIMIT_POLL_MS)) / 1000)
+    except BaseException:
+        limiter.leave(model, ticket)
+        raise
+    # Granted on the first attempt means no wait, however slow the round trip was.
+    waited_ms = int((time.monotonic() - started) * 1000) if notified else 0
+    try:
+        limiter.record(waited_ms)
+    except Exception as exc:
+        logger.warning("Rate limit metrics update failed: %s", exc)
+    return waited_ms
+
+
+def rate_limit_metrics() -> Dict[str, int]:
+    if not TEAMFLOW_RATE_LIMIT_RPM and not TEAMFLOW_RATE_LIMIT_TPM and not _BUDGETS:
+        return {}
+    return get_limiter().metrics()
@@ -0,0 +1,202 @@
+"""Near-duplicate idea detection with MinHash signatures and LSH banding.
+
+Ideas are normalized (case, punctuation, whitespace) and shingled into character
+5-grams. Runs whose signatures share at least one LSH band become candidates, and a
+candidate matches when its estimated Jaccard similarity reaches
+TEAMFLOW_SIMILARITY_THRESHOLD. The index lives in Redis when that is the storage
+backend (entries expire with the runs), otherwise in process memory.
+"""
+import collections
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+
+from .storage import TEAMFLOW_STORAGE_BACKEND
+
+# off | prd (seed the PRD, rerun everything after it) | all (reuse a completed run)
+TEAMFLOW_REUSE_SIMILAR = os.getenv("TEAMFLOW_REUSE_SIMILAR", "off").lower()
+TEAMFLOW_SIMILARITY_THRESHOLD = float(os.getenv("TEAMFLOW_SIMILARITY_THRESHOLD", "0.85"))
+TEAMFLOW_SIMILARITY_MAX_RUNS = max(1, int(os.getenv("TEAMFLOW_SIMILARITY_MAX_RUNS", "5000")))
+# Most recent runs kept per LSH bucket in Redis; a common bucket (boilerplate ideas)
+# would otherwise grow with every run and make each lookup scan all of them.
+TEAMFLOW_SIMILARITY_MAX_BUCKET = max(
+    1, int(os.getenv("TEAMFLOW_SIMILARITY_MAX_BUCKET", "200"))
+)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+_PRIME = (1 << 61) - 1
+
+
+def _perm_params() -> List[Tuple[int, int]]:
+    params = []
+    for i in range(NUM_PERM):
+        digest = hashlib.blake2b(f"teamflow-minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % (_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "big") % _PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMS = _perm_params()
+
+
+def normalize(idea: str) -> str:
+    text = re.sub(r"[^\w\s]", " ", idea.lower())
+    return " ".join(text.split())
+
+
+def _shingles(text: str) -> Set[int]:
+    if len(text) <= SHINGLE_SIZE:
+        grams = {text}
+    else:
+        grams = {text[i : i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    return {
+        int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "big") for g in grams
+    }
+
+
+def signature(idea: str) -> List[int]:
+    shingles = _shingles(normalize(idea))
+    return [min((a * s + b) % _PRIME for s in shingles) for a, b in _PERMS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of the two ideas' shingle sets."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _bands(sig: List[int]) -> List[str]:
+    return [
+        hashlib.blake2b(
+            ",".join(map(str, sig[i * ROWS : (i + 1) * ROWS])).encode(), digest_size=8
+        ).hexdigest()
+        for i in range(BANDS)
+    ]
+
+
+class MemoryIndex:
+    """Most recent TEAMFLOW_SIMILARITY_MAX_RUNS runs of this process."""
+
+    def __init__(self, max_runs: int = TEAMFLOW_SIMILARITY_MAX_RUNS) -> None:
+        self._max_runs = max_runs
+        self._sigs: "collections.OrderedDict[str, List[int]]" = collections.OrderedDict()
+        self._buckets: Dict[Tuple[int, str], Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, run_id: str, sig: List[int]) -> None:
+        with self._lock:
+            self._sigs[run_id] = sig
+            for i, band in enumerate(_bands(sig)):
+                self._buckets.setdefault((i, band), set()).add(run_id)
+            while len(self._sigs) > self._max_runs:
+                old_id, old_sig = self._sigs.popitem(last=False)
+                for i, band in enumerate(_bands(old_sig)):
+                    bucket = self._buckets.get((i, band))
+                    if bucket is not None:
+                        bucket.discard(old_id)
+                        if not bucket:
+                            del self._buckets[(i, band)]
+
+    def candidates(self, sig: List[int]) -> Dict[str, List[int]]:
+        with self._lock:
+            found: Set[str] = set()
+            for i, band in enumerate(_bands(sig)):
+                found |= self._buckets.get((i, band), set())
+            return {run_id: self._sigs[run_id] for run_id in found if run_id in self._sigs}
+
+
+class RedisIndex:
+    """LSH buckets as Redis sorted sets of run ids scored by the time they were added.
+
+    Every add trims its buckets to runs younger than REDIS_TTL_SECONDS (older ones point
+    at expired runs) and to the newest TEAMFLOW_SIMILARITY_MAX_BUCKET members.
+    """
+
+    def _redis(self):
+        from .storage_redis import get_redis
+
+        return get_redis()
+
+    @staticmethod
+    def _bucket_key(i: int, band: str) -> str:
+        return f"teamflow:simidx:{i}:{band}"
+
+    @staticmethod
+    def _sig_key(run_id: str) -> str:
+        return f"teamflow:simidx:sig:{run_id}"
+
+    def add(self, run_id: str, sig: List[int]) -> None:
+        from .storage_redis import REDIS_TTL_SECONDS
+
+        now = time.time()
+        pipe = self._redis().pipeline(transaction=False)
+        pipe.set(self._sig_key(run_id), ",".join(map(str, sig)), ex=REDIS_TTL_SECONDS)
+        for i, band in enumerate(_bands(sig)):
+            key = self._bucket_key(i, band)
+            pipe.zadd(key, {run_id: now})
+            pipe.zremrangebyscore(key, "-inf", now - REDIS_TTL_SECONDS)
+            pipe.zremrangebyrank(key, 0, -TEAMFLOW_SIMILARITY_MAX_BUCKET - 1)
+            pipe.expire(key, REDIS_TTL_SECONDS)
+        pipe.execute()
+
+    def candidates(self, sig: List[int]) -> Dict[str, List[int]]:
+        from .storage_redis import REDIS_TTL_SECONDS
+
+        r = self._redis()
+        since = time.time() - REDIS_TTL_SECONDS
+        pipe = r.pipeline(transaction=False)
+        for i, band in enumerate(_bands(sig)):
+            pipe.zrangebyscore(self._bucket_key(i, band), since, "+inf")
+        found = sorted(set().union(*pipe.execute()))
+        if not found:
+            return {}
+        pipe = r.pipeline(transaction=False)
+        for run_id in found:
+            pipe.get(self._sig_key(run_id))
+        return {
+            run_id: [int(x) for x in raw.split(",")]
+            for run_id, raw in zip(found, pipe.execute())
+            if raw
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RedisIndex() if TEAMFLOW_STORAGE_BACKEND == "redis" else MemoryIndex()
+    return _index
+
+
+def index_and_match(
+    run_id: str, idea: str, *, lookup: bool = True
+) -> List[Tuple[str, float]]:
+    """Index run_id's idea; with lookup, return earlier runs at or above the threshold.
+
+    Matches are sorted by similarity, best first.
+    """
+    sig = signature(idea)
+    index = get_index()
+    matches: List[Tuple[str, float]] = []
+    if lookup:
+        for other_id, other_sig in index.candidates(sig).items():
+            if other_id == run_id:
+                continue
+            score = similarity(sig, other_sig)
+            if score >= TEAMFLOW_SIMILARITY_THRESHOLD:
+                matches.append((other_id, score))
+        matches.sort(key=lambda item: item[1], reverse=True)
+    index.add(run_id, sig)
+    return matches
@@ -1,140 +1,250 @@
-import json
+"""Run storage used by the API and the Celery tasks.
+
+The functions below delegate to one StorageBackend picked by TEAMFLOW_STORAGE_BACKEND:
+redis (default, storage_redis), memory (storage_memory) or sqlite (storage_sqlite).
+"""
 import os
-import time
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, List, Optional, Tuple
 
-import redis
+from .storage_base import (  # noqa: F401  (re-exported)
+    ARTIFACT_NAMES,
+    RUN_TRANSITIONS,
+    STEP_ORDER,
+    StorageBackend,
+    is_event_id,
+)
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-REDIS_TTL_SECONDS = int(os.getenv("REDIS_TTL_SECONDS", "21600"))
+TEAMFLOW_STORAGE_BACKEND = os.getenv("TEAMFLOW_STORAGE_BACKEND", "redis").lower()
 
-STEP_ORDER = ["pm", "tech", "qa", "principal", "review"]
-ARTIFACT_NAMES = ["prd", "arch", "api", "test", "risk", "stack", "review", "final"]
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
 
 
-def get_redis() -> redis.Redis:
-    return redis.Redis.from_url(REDIS_URL, decode_responses=True)
+def _create_backend(name: str) -> StorageBackend:
+    if name == "memory":
+        from .storage_memory import MemoryBackend
 
+        return MemoryBackend()
+    if name == "sqlite":
+        from .storage_sqlite import SQLiteBackend
 
-def _meta_key(run_id: str) -> str:
-    return f"run:{run_id}:meta"
+        return SQLiteBackend()
+    if name != "redis":
+        raise ValueError(f"Unknown TEAMFLOW_STORAGE_BACKEND: {name}")
+    from .storage_redis import RedisBackend
 
+    return RedisBackend()
 
-def _idea_key(run_id: str) -> str:
-    return f"run:{run_id}:idea"
 
+def get_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend(TEAMFLOW_STORAGE_BACKEND)
+    return _backend
 
-def _step_key(run_id: str) -> str:
-    return f"run:{run_id}:steps"
 
+def set_backend(backend: StorageBackend) -> None:
+    """Swap the process-wide backend (tests and benchmarks)."""
+    global _backend
+    _backend = backend
 
-def _artifact_key(run_id: str, name: str) -> str:
-    return f"run:{run_id}:artifact:{name}"
 
+def init_run(run_id: str, idea: str) -> None:
+    get_backend().init_run(run_id, idea)
 
-def _events_key(run_id: str) -> str:
-    return f"run:{run_id}:events"
 
+def init_runs(
+    ideas: Dict[str, str],
+    meta: Dict[str, Dict[str, str]],
+    steps: Optional[Dict[str, str]] = None,
+) -> None:
+    get_backend().init_runs(ideas, meta, steps)
 
-def init_run(run_id: str, idea: str) -> None:
-    r = get_redis()
-    now = int(time.time())
-    r.hset(_meta_key(run_id), mapping={"status": "queued", "created_at": now})
-    r.set(_idea_key(run_id), idea)
-    for step in STEP_ORDER:
-        r.hset(_step_key(run_id), step, "pending")
-    for key in (_meta_key(run_id), _idea_key(run_id), _step_key(run_id)):
-        r.expire(key, REDIS_TTL_SECONDS)
+
+def create_batch(batch_id: str, run_ids: List[str]) -> None:
+    get_backend().create_batch(batch_id, run_ids)
+
+
+def get_batch(batch_id: str) -> Optional[Dict]:
+    return get_backend().get_batch(batch_id)
 
 
 def set_run_meta(run_id: str, values: Dict[str, str]) -> None:
-    if not values:
-        return
-    r = get_redis()
-    r.hset(_meta_key(run_id), mapping=values)
-    r.expire(_meta_key(run_id), REDIS_TTL_SECONDS)
+    get_backend().set_run_meta(run_id, values)
 
 
 def get_run_meta(run_id: str) -> Dict[str, str]:
-    r = get_redis()
-    return r.hgetall(_meta_key(run_id)) or {}
+    return get_backend().get_run_meta(run_id)
 
 
 def get_run_meta_value(run_id: str, key: str) -> Optional[str]:
-    r = get_redis()
-    return r.hget(_meta_key(run_id), key)
+    return get_backend().get_run_meta_value(run_id, key)
 
 
 def run_exists(run_id: str) -> bool:
-    r = get_redis()
-    return r.exists(_meta_key(run_id)) == 1
+    return get_backend().run_exists(run_id)
 
 
 def get_idea(run_id: str) -> Optional[str]:
-    r = get_redis()
-    return r.get(_idea_key(run_id))
+    return get_backend().get_idea(run_id)
 
 
 def set_run_status(run_id: str, status: str) -> None:
-    r = get_redis()
-    r.hset(_meta_key(run_id), mapping={"status": status, "updated_at": int(time.time())})
-    r.expire(_meta_key(run_id), REDIS_TTL_SECONDS)
+    get_backend().set_run_status(run_id, status)
 
 
 def get_run_status(run_id: str) -> Optional[str]:
-    r = get_redis()
-    data = r.hget(_meta_key(run_id), "status")
-    return data
+    return get_backend().get_run_status(run_id)
 
 
 def is_run_cancelled(run_id: str) -> bool:
     return get_run_status(run_id) == "cancelled"
 
 
+def transition_run(
+    run_id: str,
+    *,
+    run_status: Optional[str] = None,
+    steps: Optional[Dict[str, str]] = None,
+    events: Optional[List[Dict]] = None,
+    require_status: Optional[set] = None,
+) -> bool:
+    """Atomically apply a run status change, step statuses and events.
+
+    Returns False (and writes nothing) when the current status may not move to
+    run_status per RUN_TRANSITIONS, or is not in require_status.
+    """
+    return get_backend().transition_run(
+        run_id,
+        run_status=run_status,
+        steps=steps,
+        events=events,
+        require_status=require_status,
+    )
+
+
 def set_step_status(run_id: str, step: str, status: str) -> None:
-    r = get_redis()
-    r.hset(_step_key(run_id), step, status)
-    r.expire(_step_key(run_id), REDIS_TTL_SECONDS)
+    get_backend().set_step_status(run_id, step, status)
 
 
 def get_step_statuses(run_id: str) -> Dict[str, str]:
-    r = get_redis()
-    raw = r.hgetall(_step_key(run_id))
-    return raw or {}
+    return get_backend().get_step_statuses(run_id)
 
 
 def set_artifact(run_id: str, name: str, content: str) -> None:
-    r = get_redis()
-    r.set(_artifact_key(run_id, name), content, ex=REDIS_TTL_SECONDS)
+    get_backend().set_artifact(run_id, name, content)
 
 
 def get_artifact(run_id: str, name: str) -> Optional[str]:
-    r = get_redis()
-    return r.get(_artifact_key(run_id, name))
+    return get_backend().get_artifact(run_id, name)
+
+
+def get_metrics() -> Dict[str, int]:
+    return get_backend().get_metrics()
 
 
 def list_artifacts(run_id: str) -> Dict[str, bool]:
-    r = get_redis()
-    present: Dict[str, bool] = {}
-    for name in ARTIFACT_NAMES:
-        present[name] = r.exists(_artifact_key(run_id, name)) == 1
-    return present
+    return get_backend().list_artifacts(run_id)
+
+
+def get_run_snapshot(run_id: str) -> Optional[Dict[str, Dict]]:
+    """Meta, step statuses and artifact presence for a run; None when it does not exist."""
+    return get_backend().get_run_snapshot(run_id)
 
 
 def clear_artifacts(run_id: str, names: List[str]) -> None:
-    if not names:
-        return
-    r = get_redis()
-    keys = [_artifact_key(run_id, name) for name in names]
-    r.delete(*keys)
+    get_backend().clear_artifacts(run_id, names)
+
+
+def append_draft(run_id: str, name: str, delta: str) -> None:
+    get_backend().append_draft(run_id, name, delta)
+
+
+def get_draft(run_id: str, name: str) -> Optional[str]:
+    return get_backend().get_draft(run_id, name)
+
+
+def clear_draft(run_id: str, name: str) -> None:
+    get_backend().clear_draft(run_id, name)
+
+
+def touch_active_run(run_id: str, lease_seconds: int) -> None:
+    get_backend().touch_active_run(run_id, lease_seconds)
+
+
+def release_active_run(run_id: str) -> None:
+    get_backend().release_active_run(run_id)
+
 
+def claim_stale_runs(limit: int = 100) -> List[str]:
+    return get_backend().claim_stale_runs(limit)
 
-def append_event(run_id: str, event: Dict[str, str]) -> None:
-    r = get_redis()
-    r.rpush(_events_key(run_id), json.dumps(event))
-    r.expire(_events_key(run_id), REDIS_TTL_SECONDS)
+
+def count_active_runs() -> int:
+    return get_backend().count_active_runs()
+
+
+def push_waiting_run(run_id: str) -> int:
+    return get_backend().push_waiting_run(run_id)
+
+
+def pop_waiting_runs(limit: int) -> List[str]:
+    return get_backend().pop_waiting_runs(limit)
+
+
+def count_waiting_runs() -> int:
+    return get_backend().count_waiting_runs()
+
+
+def append_event(run_id: str, event: Dict[str, str]) -> str:
+    """Append an event to the run's log and return its event ID."""
+    return get_backend().append_event(run_id, event)
 
 
 def get_events(run_id: str, start: int = 0) -> List[str]:
-    r = get_redis()
-    return r.lrange(_events_key(run_id), start, -1)
+    return get_backend().get_events(run_id, start)
+
+
+def event_id_at_index(run_id: str, index: int) -> str:
+    return get_backend().event_id_at_index(run_id, index)
+
+
+def latest_event_id(run_id: str) -> str:
+    return get_backend().latest_event_id(run_id)
+
+
+def read_events(
+    run_id: str,
+    after_id: str = "0-0",
+    *,
+    count: int = 100,
+    block_ms: Optional[int] = None,
+) -> List[Tuple[str, str]]:
+    return get_backend().read_events(run_id, after_id, count=count, block_ms=block_ms)
+
+
+async def run_exists_async(run_id: str) -> bool:
+    return await get_backend().run_exists_async(run_id)
+
+
+async def event_id_at_index_async(run_id: str, index: int) -> str:
+    return await get_backend().event_id_at_index_async(run_id, index)
+
+
+async def latest_event_id_async(run_id: str) -> str:
+    return await get_backend().latest_event_id_async(run_id)
+
+
+async def read_events_async(
+    run_id: str,
+    after_id: str = "0-0",
+    *,
+    count: int = 100,
+    block_ms: Optional[int] = None,
+) -> List[Tuple[str, str]]:
+    return await get_backend().read_events_async(
+        run_id, after_id, count=count, block_ms=block_ms
+    )
@@ -0,0 +1,230 @@
+"""Storage backend interface shared by the Redis, in-memory and SQLite implementations."""
+import asyncio
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+STEP_ORDER = ["pm", "tech", "qa", "principal", "review"]
+ARTIFACT_NAMES = ["prd", "arch", "api", "test", "risk", "stack", "review", "final"]
+
+# Allowed run status changes. Terminal runs only move back to "queued" (regenerate);
+# nothing can bring a cancelled run straight back to "running". A run refused by
+# admission control waits in "waiting" until it is queued.
+RUN_TRANSITIONS: Dict[str, set] = {
+    "queued": {"waiting", "running", "failed", "cancelled"},
+    "waiting": {"queued", "cancelled"},
+    "running": {"running", "completed", "failed", "cancelled"},
+    "completed": {"queued"},
+    "failed": {"queued"},
+    "cancelled": {"queued"},
+}
+
+# Event ids use the Redis Streams "<ms>-<seq>" format in every backend.
+_EVENT_ID_RE = re.compile(r"^\d+-\d+$")
+
+
+def is_event_id(value: str) -> bool:
+    return bool(value) and _EVENT_ID_RE.match(value) is not None
+
+
+def event_id_key(event_id: str) -> Tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def allowed_statuses(
+    run_status: Optional[str], require_status: Optional[Set[str]]
+) -> Optional[Set[str]]:
+    """Current statuses from which a transition may apply; None means any."""
+    allowed = None
+    if run_status:
+        allowed = {s for s, targets in RUN_TRANSITIONS.items() if run_status in targets}
+    if require_status is not None:
+        allowed = set(require_status) if allowed is None else allowed & set(require_status)
+    return allowed
+
+
+class StorageBackend:
+    """Run state, artifacts and the per-run event log.
+
+    Event ids are "<ms>-<seq>" strings ordered like Redis Stream ids. The async
+    variants default to running the sync method in a worker thread; backends with a
+    native asyncio client override them.
+    """
+
+    def init_run(self, run_id: str, idea: str) -> None:
+        raise NotImplementedError
+
+    def init_runs(
+        self,
+        ideas: Dict[str, str],
+        meta: Dict[str, Dict[str, str]],
+        steps: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """init_run for many runs (run_id -> idea) at once, plus extra meta per run and
+        step statuses other than "pending" shared by all of them."""
+        for run_id, idea in ideas.items():
+            self.init_run(run_id, idea)
+            self.set_run_meta(run_id, meta.get(run_id, {}))
+            for step, status in (steps or {}).items():
+                self.set_step_status(run_id, step, status)
+
+    def create_batch(self, batch_id: str, run_ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        """{"created_at", "runs": {run_id: status}} for a batch, or None when unknown.
+
+        A run that expired has status None.
+        """
+        raise NotImplementedError
+
+    def set_run_meta(self, run_id: str, values: Dict[str, str]) -> None:
+        raise NotImplementedError
+
+    def get_run_meta(self, run_id: str) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def get_run_meta_value(self, run_id: str, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def run_exists(self, run_id: str) -> bool:
+        raise NotImplementedError
+
+    def get_idea(self, run_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set_run_status(self, run_id: str, status: str) -> None:
+        raise NotImplementedError
+
+    def get_run_status(self, run_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def transition_run(
+        self,
+        run_id: str,
+        *,
+        run_status: Optional[str] = None,
+        steps: Optional[Dict[str, str]] = None,
+        events: Optional[List[Dict]] = None,
+        require_status: Optional[set] = None,
+    ) -> bool:
+        """Atomically apply a run status change, step statuses and events.
+
+        The change is refused (returns False, nothing written) when the run's current
+        status may not move to run_status per RUN_TRANSITIONS, or is not in
+        require_status.
+        """
+        raise NotImplementedError
+
+    def set_step_status(self, run_id: str, step: str, status: str) -> None:
+        raise NotImplementedError
+
+    def get_step_statuses(self, run_id: str) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def set_artifact(self, run_id: str, name: str, content: str) -> None:
+        raise NotImplementedError
+
+    def get_artifact(self, run_id: str, name: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def list_artifacts(self, run_id: str) -> Dict[str, bool]:
+        raise NotImplementedError
+
+    def get_run_snapshot(self, run_id: str) -> Optional[Dict[str, Dict]]:
+        """{"meta", "steps", "artifacts"} for a run, or None when it does not exist."""
+        raise NotImplementedError
+
+    def clear_artifacts(self, run_id: str, names: List[str]) -> None:
+        raise NotImplementedError
+
+    def append_draft(self, run_id: str, name: str, delta: str) -> None:
+        """Append streamed text to a draft artifact.
+
+        Drafts are transient: stored as written (no compression) and left out of the
+        artifact metrics, so a flush costs the size of its delta, not of the draft.
+        """
+        raise NotImplementedError
+
+    def get_draft(self, run_id: str, name: str) -> Optional[str]:
+        return self.get_artifact(run_id, name)
+
+    def clear_draft(self, run_id: str, name: str) -> None:
+        self.clear_artifacts(run_id, [name])
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {}
+
+    def touch_active_run(self, run_id: str, lease_seconds: int) -> None:
+        """Record that a worker owns run_id for the next lease_seconds."""
+        raise NotImplementedError
+
+    def release_active_run(self, run_id: str) -> None:
+        raise NotImplementedError
+
+    def claim_stale_runs(self, limit: int = 100) -> List[str]:
+        """Remove and return runs whose lease expired; each id goes to one caller only."""
+        raise NotImplementedError
+
+    def count_active_runs(self) -> int:
+        """Runs whose lease has not expired, i.e. in flight on some worker."""
+        raise NotImplementedError
+
+    def push_waiting_run(self, run_id: str) -> int:
+        """Append run_id to the admission waiting list; return its 1-based position."""
+        raise NotImplementedError
+
+    def pop_waiting_runs(self, limit: int) -> List[str]:
+        """Remove and return up to limit runs from the head of the waiting list."""
+        raise NotImplementedError
+
+    def count_waiting_runs(self) -> int:
+        raise NotImplementedError
+
+    def append_event(self, run_id: str, event: Dict[str, str]) -> str:
+        raise NotImplementedError
+
+    def get_events(self, run_id: str, start: int = 0) -> List[str]:
+        raise NotImplementedError
+
+    def event_id_at_index(self, run_id: str, index: int) -> str:
+        """Event id to resume after so that reading starts at the index-th event."""
+        raise NotImplementedError
+
+    def latest_event_id(self, run_id: str) -> str:
+        raise NotImplementedError
+
+    def read_events(
+        self,
+        run_id: str,
+        after_id: str = "0-0",
+        *,
+        count: int = 100,
+        block_ms: Optional[int] = None,
+    ) -> List[Tuple[str, str]]:
+        """Events strictly after after_id as (event_id, json) pairs.
+
+        With block_ms, waits up to that long for a first event instead of returning [].
+        """
+        raise NotImplementedError
+
+    async def run_exists_async(self, run_id: str) -> bool:
+        return await asyncio.to_thread(self.run_exists, run_id)
+
+    async def event_id_at_index_async(self, run_id: str, index: int) -> str:
+        return await asyncio.to_thread(self.event_id_at_index, run_id, index)
+
+    async def latest_event_id_async(self, run_id: str) -> str:
+        return await asyncio.to_thread(self.latest_event_id, run_id)
+
+    async def read_events_async(
+        self,
+        run_id: str,
+        after_id: str = "0-0",
+        *,
+        count: int = 100,
+        block_ms: Optional[int] = None,
+    ) -> List[Tuple[str, str]]:
+        return await asyncio.to_thread(
+            self.read_events, run_id, after_id, count=count, block_ms=block_ms
+        )
@@ -0,0 +1,367 @@
+"""In-process storage backend: thread-safe dicts with TTL eviction.
+
+Nothing leaves the process, so the API and an eager Celery worker must share it (see
+TEAMFLOW_STORAGE_BACKEND in the README). Intended for tests and for benchmarking the
+framework without a storage server in the way.
+"""
+import asyncio
+import collections
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .storage_base import (
+    ARTIFACT_NAMES,
+    STEP_ORDER,
+    StorageBackend,
+    allowed_statuses,
+    event_id_key,
+)
+
+MEMORY_TTL_SECONDS = int(
+    os.getenv("MEMORY_TTL_SECONDS", os.getenv("REDIS_TTL_SECONDS", "21600"))
+)
+MEMORY_SWEEP_INTERVAL_SECONDS = max(1.0, float(os.getenv("MEMORY_SWEEP_INTERVAL_SECONDS", "60")))
+MEMORY_EVENTS_MAXLEN = max(100, int(os.getenv("REDIS_EVENTS_MAXLEN", "10000")))
+
+
+class _Run:
+    __slots__ = ("meta", "idea", "steps", "artifacts", "events", "last_id", "expires_at")
+
+    def __init__(self) -> None:
+        self.meta: Dict[str, str] = {}
+        self.idea: Optional[str] = None
+        self.steps: Dict[str, str] = {}
+        self.artifacts: Dict[str, str] = {}
+        self.events: List[Tuple[str, str]] = []
+        self.last_id = (0, 0)
+        self.expires_at = 0.0
+
+
+class MemoryBackend(StorageBackend):
+    """Run state and events in process memory.
+
+    One lock guards everything; blocking readers wait on a condition (threads) or on a
+    future resolved from the writer's thread (asyncio), so neither polls.
+    """
+
+    def __init__(self, ttl_seconds: int = MEMORY_TTL_SECONDS) -> None:
+        self._ttl = ttl_seconds
+        self._runs: Dict[str, _Run] = {}
+        self._lock = threading.RLock()
+        self._appended = threading.Condition(self._lock)
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._active: Dict[str, float] = {}
+        self._waiting: "collections.OrderedDict[str, None]" = collections.OrderedDict()
+        self._batches: Dict[str, Tuple[float, int, List[str]]] = {}
+        self._next_sweep = time.monotonic() + MEMORY_SWEEP_INTERVAL_SECONDS
+
+    # Callers hold self._lock for all helpers below.
+
+    def _sweep(self, now: float) -> None:
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + MEMORY_SWEEP_INTERVAL_SECONDS
+        for run_id in [k for k, run in self._runs.items() if run.expires_at <= now]:
+            del self._runs[run_id]
+        for batch_id in [k for k, batch in self._batches.items() if batch[0] <= now]:
+            del self._batches[batch_id]
+
+    def _get(self, run_id: str) -> Optional[_Run]:
+        now = time.monotonic()
+        self._sweep(now)
+        run = self._runs.get(run_id)
+        if run is not None and run.expires_at <= now:
+            del self._runs[run_id]
+            return None
+        return run
+
+    def _touch(self, run_id: str) -> _Run:
+        run = self._get(run_id)
+        if run is None:
+            run = self._runs[run_id] = _Run()
+        run.expires_at = time.monotonic() + self._ttl
+        return run
+
+    def _append(self, run_id: str, run: _Run, data: str) -> str:
+        ms = int(time.time() * 1000)
+        last_ms, last_seq = run.last_id
+        run.last_id = (ms, 0) if ms > last_ms else (last_ms, last_seq + 1)
+        event_id = f"{run.last_id[0]}-{run.last_id[1]}"
+        run.events.append((event_id, data))
+        if len(run.events) > MEMORY_EVENTS_MAXLEN:
+            del run.events[: len(run.events) - MEMORY_EVENTS_MAXLEN]
+        self._appended.notify_all()
+        for loop, future in self._waiters.pop(run_id, []):
+            loop.call_soon_threadsafe(_resolve, future)
+        return event_id
+
+    def _after(self, run_id: str, after_id: str, count: int) -> List[Tuple[str, str]]:
+        run = self._get(run_id)
+        if run is None:
+            return []
+        cursor = event_id_key(after_id)
+        return [item for item in run.events if event_id_key(item[0]) > cursor][:count]
+
+    def init_run(self, run_id: str, idea: str) -> None:
+        with self._lock:
+            run = self._touch(run_id)
+            run.meta.update({"status": "queued", "created_at": str(int(time.time()))})
+            run.idea = idea
+            run.steps.update({step: "pending" for step in STEP_ORDER})
+
+    def init_runs(
+        self,
+        ideas: Dict[str, str],
+        meta: Dict[str, Dict[str, str]],
+        steps: Optional[Dict[str, str]] = None,
+    ) -> None:
+        with self._lock:
+            for run_id, idea in ideas.items():
+                self.init_run(run_id, idea)
+                run = self._touch(run_id)
+                run.meta.update({k: str(v) for k, v in meta.get(run_id, {}).items()})
+                run.steps.update(steps or {})
+
+    def create_batch(self, batch_id: str, run_ids: List[str]) -> None:
+        with self._lock:
+            self._batches[batch_id] = (
+                time.monotonic() + self._ttl,
+                int(time.time()),
+                list(run_ids),
+            )
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is None or batch[0] <= time.monotonic():
+                self._batches.pop(batch_id, None)
+                return None
+            _, created_at, run_ids = batch
+            runs = {}
+            for run_id in run_ids:
+                run = self._get(run_id)
+                runs[run_id] = run.meta.get("status") if run else None
+            return {"created_at": created_at, "runs": runs}
+
+    def set_run_meta(self, run_id: str, values: Dict[str, str]) -> None:
+        if not values:
+            return
+        with self._lock:
+            self._touch(run_id).meta.update({k: str(v) for k, v in values.items()})
+
+    def get_run_meta(self, run_id: str) -> Dict[str, str]:
+        with self._lock:
+            run = self._get(run_id)
+            return dict(run.meta) if run else {}
+
+    def get_run_meta_value(self, run_id: str, key: str) -> Optional[str]:
+        with self._lock:
+            run = self._get(run_id)
+            return run.meta.get(key) if run else None
+
+    def run_exists(self, run_id: str) -> bool:
+        with self._lock:
+            run = self._get(run_id)
+            return bool(run and run.meta)
+
+    def get_idea(self, run_id: str) -> Optional[str]:
+        with self._lock:
+            run = self._get(run_id)
+            return run.idea if run else None
+
+    def set_run_status(self, run_id: str, status: str) -> None:
+        self.set_run_meta(run_id, {"status": status, "updated_at": int(time.time())})
+
+    def get_run_status(self, run_id: str) -> Optional[str]:
+        return self.get_run_meta_value(run_id, "status")
+
+    def transition_run(
+        self,
+        run_id: str,
+        *,
+        run_status: Optional[str] = None,
+        steps: Optional[Dict[str, str]] = None,
+        events: Optional[List[Dict]] = None,
+        require_status: Optional[set] = None,
+    ) -> bool:
+        allowed = allowed_statuses(run_status, require_status)
+        with self._lock:
+            current = self.get_run_meta_value(run_id, "status") or ""
+            if allowed is not None and current not in allowed:
+                return False
+            run = self._touch(run_id)
+            if run_status:
+                run.meta.update({"status": run_status, "updated_at": str(int(time.time()))})
+            run.steps.update(steps or {})
+            for event in events or []:
+                self._append(run_id, run, json.dumps(event))
+            return True
+
+    def set_step_status(self, run_id: str, step: str, status: str) -> None:
+        with self._lock:
+            self._touch(run_id).steps[step] = status
+
+    def get_step_statuses(self, run_id: str) -> Dict[str, str]:
+        with self._lock:
+            run = self._get(run_id)
+            return dict(run.steps) if run else {}
+
+    def set_artifact(self, run_id: str, name: str, content: str) -> None:
+        with self._lock:
+            self._touch(run_id).artifacts[name] = content
+
+    def get_artifact(self, run_id: str, name: str) -> Optional[str]:
+        with self._lock:
+            run = self._get(run_id)
+            return run.artifacts.get(name) if run else None
+
+    def list_artifacts(self, run_id: str) -> Dict[str, bool]:
+        with self._lock:
+            run = self._get(run_id)
+            present = run.artifacts if run else {}
+            return {name: name in present for name in ARTIFACT_NAMES}
+
+    def get_run_snapshot(self, run_id: str) -> Optional[Dict[str, Dict]]:
+        with self._lock:
+            run = self._get(run_id)
+            if run is None or not run.meta:
+                return None
+            return {
+                "meta": dict(run.meta),
+                "steps": dict(run.steps),
+                "artifacts": {name: name in run.artifacts for name in ARTIFACT_NAMES},
+            }
+
+    def clear_artifacts(self, run_id: str, names: List[str]) -> None:
+        with self._lock:
+            run = self._get(run_id)
+            for name in names if run else []:
+                run.artifacts.pop(name, None)
+
+    def append_draft(self, run_id: str, name: str, delta: str) -> None:
+        with self._lock:
+            artifacts = self._touch(run_id).artifacts
+            artifacts[name] = artifacts.get(name, "") + delta
+
+    def touch_active_run(self, run_id: str, lease_seconds: int) -> None:
+        with self._lock:
+            self._active[run_id] = time.time() + lease_seconds
+
+    def release_active_run(self, run_id: str) -> None:
+        with self._lock:
+            self._active.pop(run_id, None)
+
+    def claim_stale_runs(self, limit: int = 100) -> List[str]:
+        now = time.time()
+        with self._lock:
+            stale = sorted(
+                (expires, run_id) for run_id, expires in self._active.items() if expires <= now
+            )[:limit]
+            for _, run_id in stale:
+                del self._active[run_id]
+            return [run_id for _, run_id in stale]
+
+    def count_active_runs(self) -> int:
+        now = time.time()
+        with self._lock:
+            return sum(1 for expires in self._active.values() if expires > now)
+
+    def push_waiting_run(self, run_id: str) -> int:
+        with self._lock:
+            # Re-pushing a queued run keeps its place (and reports it).
+            self._waiting.setdefault(run_id, None)
+            return list(self._waiting).index(run_id) + 1
+
+    def pop_waiting_runs(self, limit: int) -> List[str]:
+        with self._lock:
+            return [self._waiting.popitem(last=False)[0] for _ in range(min(limit, len(self._waiting)))]
+
+    def count_waiting_runs(self) -> int:
+        with self._lock:
+            return len(self._waiting)
+
+    def append_event(self, run_id: str, event: Dict[str, str]) -> str:
+        with self._lock:
+            return self._append(run_id, self._touch(run_id), json.dumps(event))
+
+    def get_events(self, run_id: str, start: int = 0) -> List[str]:
+        with self._lock:
+            run = self._get(run_id)
+            return [data for _, data in run.events[max(0, start) :]] if run else []
+
+    def event_id_at_index(self, run_id: str, index: int) -> str:
+        if index <= 0:
+            return "0-0"
+        with self._lock:
+            run = self._get(run_id)
+            events = run.events[:index] if run else []
+            return events[-1][0] if events else "0-0"
+
+    def latest_event_id(self, run_id: str) -> str:
+        with self._lock:
+            run = self._get(run_id)
+            return run.events[-1][0] if run and run.events else "0-0"
+
+    def read_events(
+        self,
+        run_id: str,
+        after_id: str = "0-0",
+        *,
+        count: int = 100,
+        block_ms: Optional[int] = None,
+    ) -> List[Tuple[str, str]]:
+        deadline = time.monotonic() + (block_ms or 0) / 1000
+        with self._lock:
+            while True:
+                items = self._after(run_id, after_id, count)
+                remaining = deadline - time.monotonic()
+                if items or not block_ms or remaining <= 0:
+                    return items
+                self._appended.wait(remaining)
+
+    async def run_exists_async(self, run_id: str) -> bool:
+        return self.run_exists(run_id)
+
+    async def event_id_at_index_async(self, run_id: str, index: int) -> str:
+        return self.event_id_at_index(run_id, index)
+
+    async def latest_event_id_async(self, run_id: str) -> str:
+        return self.latest_event_id(run_id)
+
+    async def read_events_async(
+        self,
+        run_id: str,
+        after_id: str = "0-0",
+        *,
+        count: int = 100,
+        block_ms: Optional[int] = None,
+    ) -> List[Tuple[str, str]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (block_ms or 0) / 1000
+        while True:
+            future = loop.create_future()
+            with self._lock:
+                items = self._after(run_id, after_id, count)
+                remaining = deadline - loop.time()
+                if items or not block_ms or remaining <= 0:
+                    return items
+                self._waiters.setdefault(run_id, []).append((loop, future))
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    waiters = self._waiters.get(run_id, [])
+                    if (loop, future) in waiters:
+                        waiters.remove((loop, future))
+                        if not waiters:
+                            del self._waiters[run_id]
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
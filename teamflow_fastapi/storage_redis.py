@@ -0,0 +1,790 @@
+"""Redis storage backend: connection pools, key layout and RedisBackend."""
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster as AsyncRedisCluster
+from redis.cluster import RedisCluster
+
+from .storage_base import ARTIFACT_NAMES, STEP_ORDER, StorageBackend, allowed_statuses
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is used when zstandard is not installed
+    zstandard = None
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_TTL_SECONDS = int(os.getenv("REDIS_TTL_SECONDS", "21600"))
+REDIS_MAX_CONNECTIONS = max(1, int(os.getenv("REDIS_MAX_CONNECTIONS", "50")))
+REDIS_POOL_TIMEOUT_SECONDS = float(os.getenv("REDIS_POOL_TIMEOUT_SECONDS", "5"))
+REDIS_SOCKET_KEEPALIVE = os.getenv("REDIS_SOCKET_KEEPALIVE", "true").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+REDIS_HEALTH_CHECK_INTERVAL = max(0, int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")))
+# Async pool (SSE endpoints). Each open stream holds a connection while it waits on XREAD.
+REDIS_ASYNC_MAX_CONNECTIONS = max(
+    1, int(os.getenv("REDIS_ASYNC_MAX_CONNECTIONS", "1000"))
+)
+# Redis Cluster: every key of a run carries a {run_id} hash tag so per-run pipelines,
+# multi-key commands and scripts stay on one shard.
+REDIS_CLUSTER_MODE = os.getenv("REDIS_CLUSTER_MODE", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+REDIS_KEY_HASH_TAGS = os.getenv(
+    "REDIS_KEY_HASH_TAGS", "true" if REDIS_CLUSTER_MODE else "false"
+).lower() in {"1", "true", "yes"}
+REDIS_EVENTS_MAXLEN = max(100, int(os.getenv("REDIS_EVENTS_MAXLEN", "10000")))
+# auto (zstd if installed, else zlib) | zstd | zlib | off
+ARTIFACT_COMPRESSION = os.getenv("ARTIFACT_COMPRESSION", "auto").lower()
+ARTIFACT_COMPRESSION_MIN_BYTES = max(
+    0, int(os.getenv("ARTIFACT_COMPRESSION_MIN_BYTES", "1024"))
+)
+ARTIFACT_COMPRESSION_LEVEL = int(os.getenv("ARTIFACT_COMPRESSION_LEVEL", "6"))
+# split: one key per meta/idea/steps/artifact (original layout)
+# compact: meta, idea, step statuses and artifacts share one hash per run
+REDIS_STORAGE_LAYOUT = os.getenv("REDIS_STORAGE_LAYOUT", "split").lower()
+COMPACT_LAYOUT = REDIS_STORAGE_LAYOUT == "compact"
+
+
+_pool_lock = threading.Lock()
+_pool_pid: Optional[int] = None
+_clients: Dict[bool, redis.Redis] = {}
+
+
+def _build_pool(decode_responses: bool) -> redis.BlockingConnectionPool:
+    # Blocking pool: threads wait for a free connection instead of failing with
+    # "Too many connections" once REDIS_MAX_CONNECTIONS is reached.
+    return redis.BlockingConnectionPool.from_url(
+        REDIS_URL,
+        decode_responses=decode_responses,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT_SECONDS,
+        socket_keepalive=REDIS_SOCKET_KEEPALIVE,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+    )
+
+
+def _build_client(decode_responses: bool) -> redis.Redis:
+    if REDIS_CLUSTER_MODE:
+        # RedisCluster keeps one pool per node; max_connections applies per node.
+        return RedisCluster.from_url(
+            REDIS_URL,
+            decode_responses=decode_responses,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_keepalive=REDIS_SOCKET_KEEPALIVE,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        )
+    return redis.Redis(connection_pool=_build_pool(decode_responses))
+
+
+def _get_client(decode_responses: bool) -> redis.Redis:
+    global _pool_pid
+    client = _clients.get(decode_responses)
+    if client is not None and _pool_pid == os.getpid():
+        return client
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _clients.clear()
+            _pool_pid = os.getpid()
+        if decode_responses not in _clients:
+            _clients[decode_responses] = _build_client(decode_responses)
+        return _clients[decode_responses]
+
+
+def get_redis() -> redis.Redis:
+    """Return the process-wide Redis client (one shared connection pool per process)."""
+    return _get_client(True)
+
+
+def get_binary_redis() -> redis.Redis:
+    """Process-wide client that returns raw bytes (compressed artifact values)."""
+    return _get_client(False)
+
+
+def reset_redis_pool() -> None:
+    """Forget the shared pools so the next get_redis() builds fresh ones.
+
+    Runs automatically in forked children (Celery prefork, uvicorn/gunicorn workers):
+    sockets inherited from the parent must never be reused by the child.
+    """
+    global _pool_pid, _pool_lock
+    _pool_lock = threading.Lock()
+    _clients.clear()
+    _pool_pid = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_redis_pool)
+
+
+# asyncio connections are bound to the loop that opened them, so keep one client per loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Return the asyncio Redis client for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None and REDIS_CLUSTER_MODE:
+        client = AsyncRedisCluster.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            max_connections=REDIS_ASYNC_MAX_CONNECTIONS,
+            socket_keepalive=REDIS_SOCKET_KEEPALIVE,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        _async_clients[loop] = client
+    elif client is None:
+        pool = aioredis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            decode_responses=True,
+            max_connections=REDIS_ASYNC_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT_SECONDS,
+            socket_keepalive=REDIS_SOCKET_KEEPALIVE,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        client = aioredis.Redis(connection_pool=pool)
+        _async_clients[loop] = client
+    return client
+
+
+def _run_prefix(run_id: str) -> str:
+    if REDIS_KEY_HASH_TAGS:
+        return f"run:{{{run_id}}}"
+    return f"run:{run_id}"
+
+
+def _run_id_from_key(key: str, suffix: str) -> str:
+    run_id = key[len("run:") : len(key) - len(suffix)]
+    return run_id[1:-1] if REDIS_KEY_HASH_TAGS else run_id
+
+
+def _meta_key(run_id: str) -> str:
+    return f"{_run_prefix(run_id)}:meta"
+
+
+def _idea_key(run_id: str) -> str:
+    return f"{_run_prefix(run_id)}:idea"
+
+
+def _step_key(run_id: str) -> str:
+    return f"{_run_prefix(run_id)}:steps"
+
+
+def _artifact_key(run_id: str, name: str) -> str:
+    return f"{_run_prefix(run_id)}:artifact:{name}"
+
+
+def _draft_key(run_id: str, name: str) -> str:
+    # A plain string in both layouts, so streamed text can be APPENDed.
+    return f"{_run_prefix(run_id)}:draft:{name}"
+
+
+def _run_key(run_id: str) -> str:
+    # Compact layout: fields are "m:<meta>", "s:<step>", "a:<artifact>" and "idea".
+    return _run_prefix(run_id)
+
+
+def _metrics_key() -> str:
+    return "teamflow:metrics"
+
+
+def _active_runs_key() -> str:
+    return "teamflow:runs:active"
+
+
+def _waiting_runs_key() -> str:
+    return "teamflow:runs:waiting"
+
+
+def _batch_key(batch_id: str) -> str:
+    return f"teamflow:batch:{batch_id}"
+
+
+def _events_key(run_id: str) -> str:
+    # Stream key; the pre-stream list lived at run:{id}:events.
+    return f"{_run_prefix(run_id)}:event_stream"
+
+
+_META = "m:"
+_STEP = "s:"
+_ARTIFACT = "a:"
+_IDEA = "idea"
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _prefixed(raw: Dict, prefix: str) -> Dict[str, str]:
+    size = len(prefix)
+    decoded = {_text(k): v for k, v in raw.items()}
+    return {k[size:]: _text(v) for k, v in decoded.items() if k.startswith(prefix)}
+
+
+def _write_run(
+    run_id: str,
+    *,
+    meta: Optional[Dict[str, str]] = None,
+    steps: Optional[Dict[str, str]] = None,
+    idea: Optional[str] = None,
+    artifacts: Optional[Dict[str, bytes]] = None,
+    pipe=None,
+) -> None:
+    """Apply one batch of run-state writes and refresh the TTL once per touched key.
+
+    Pass an existing pipeline to fold the writes into a larger batch.
+    """
+    own_pipe = pipe is None
+    if own_pipe:
+        pipe = get_binary_redis().pipeline(transaction=False)
+    if COMPACT_LAYOUT:
+        mapping: Dict[str, object] = {}
+        for key, value in (meta or {}).items():
+            mapping[_META + key] = value
+        for key, value in (steps or {}).items():
+            mapping[_STEP + key] = value
+        for key, value in (artifacts or {}).items():
+            mapping[_ARTIFACT + key] = value
+        if idea is not None:
+            mapping[_IDEA] = idea
+        if mapping:
+            pipe.hset(_run_key(run_id), mapping=mapping)
+            pipe.expire(_run_key(run_id), REDIS_TTL_SECONDS)
+    else:
+        if meta:
+            pipe.hset(_meta_key(run_id), mapping=meta)
+            pipe.expire(_meta_key(run_id), REDIS_TTL_SECONDS)
+        if steps:
+            pipe.hset(_step_key(run_id), mapping=steps)
+            pipe.expire(_step_key(run_id), REDIS_TTL_SECONDS)
+        if idea is not None:
+            pipe.set(_idea_key(run_id), idea, ex=REDIS_TTL_SECONDS)
+        for name, value in (artifacts or {}).items():
+            pipe.set(_artifact_key(run_id, name), value, ex=REDIS_TTL_SECONDS)
+    if own_pipe:
+        pipe.execute()
+
+
+def migrate_run_layout(run_id: str) -> bool:
+    """Copy a split-layout run into its compact hash and drop the old keys.
+
+    Returns False when there is no split-layout run with this id.
+    """
+    r = get_binary_redis()
+    pipe = r.pipeline(transaction=False)
+    pipe.hgetall(_meta_key(run_id))
+    pipe.get(_idea_key(run_id))
+    pipe.hgetall(_step_key(run_id))
+    pipe.ttl(_meta_key(run_id))
+    for name in ARTIFACT_NAMES:
+        pipe.get(_artifact_key(run_id, name))
+    meta, idea, steps, ttl, *artifacts = pipe.execute()
+    if not meta:
+        return False
+    mapping: Dict[bytes, bytes] = {}
+    mapping.update({_META.encode() + k: v for k, v in meta.items()})
+    mapping.update({_STEP.encode() + k: v for k, v in (steps or {}).items()})
+    for name, value in zip(ARTIFACT_NAMES, artifacts):
+        if value is not None:
+            mapping[(_ARTIFACT + name).encode()] = value
+    if idea is not None:
+        mapping[_IDEA.encode()] = idea
+    pipe = r.pipeline(transaction=False)
+    pipe.hset(_run_key(run_id), mapping=mapping)
+    pipe.expire(_run_key(run_id), ttl if ttl and ttl > 0 else REDIS_TTL_SECONDS)
+    pipe.delete(
+        _meta_key(run_id),
+        _idea_key(run_id),
+        _step_key(run_id),
+        *[_artifact_key(run_id, name) for name in ARTIFACT_NAMES],
+    )
+    pipe.execute()
+    return True
+
+
+def migrate_all_runs() -> int:
+    """Migrate every split-layout run to the compact layout; returns the count."""
+    migrated = 0
+    for key in get_redis().scan_iter(match="run:*:meta", count=500):
+        if migrate_run_layout(_run_id_from_key(key, ":meta")):
+            migrated += 1
+    return migrated
+
+
+# KEYS: meta hash, steps hash, events stream (meta and steps are the same hash in the
+# compact layout, told apart by field prefix).
+# ARGV: ttl, events maxlen, allowed current statuses (csv, "" = any), new run status
+# ("" = keep), updated_at, meta field prefix, step field prefix, step count,
+# step/status pairs..., event payloads...
+# Returns {applied (0/1), current status, last event id}.
+_TRANSITION_LUA = """
+local meta_key, steps_key, events_key = KEYS[1], KEYS[2], KEYS[3]
+local ttl, maxlen = tonumber(ARGV[1]), ARGV[2]
+local allowed, new_status, now = ARGV[3], ARGV[4], ARGV[5]
+local meta_prefix, step_prefix = ARGV[6], ARGV[7]
+local step_count = tonumber(ARGV[8])
+local current = redis.call('HGET', meta_key, meta_prefix .. 'status') or ''
+if allowed ~= '' and not string.find(',' .. allowed .. ',', ',' .. current .. ',', 1, true) then
+  return {0, current, ''}
+end
+if new_status ~= '' then
+  redis.call('HSET', meta_key, meta_prefix .. 'status', new_status, meta_prefix .. 'updated_at', now)
+end
+local idx = 9
+for _ = 1, step_count do
+  redis.call('HSET', steps_key, step_prefix .. ARGV[idx], ARGV[idx + 1])
+  idx = idx + 2
+end
+local event_id = ''
+while idx <= #ARGV do
+  event_id = redis.call('XADD', events_key, 'MAXLEN', '~', maxlen, '*', 'data', ARGV[idx])
+  idx = idx + 1
+end
+redis.call('EXPIRE', meta_key, ttl)
+if steps_key ~= meta_key then
+  redis.call('EXPIRE', steps_key, ttl)
+end
+if event_id ~= '' then
+  redis.call('EXPIRE', events_key, ttl)
+end
+return {1, current, event_id}
+"""
+_transition_script = None
+
+
+# Compressed artifact values start with a NUL byte, which Markdown text never does, so
+# values written before compression was enabled still read back as plain UTF-8.
+_CODEC_ZLIB = b"\x00TFz"
+_CODEC_ZSTD = b"\x00TFs"
+
+
+def _artifact_codec() -> Optional[bytes]:
+    if ARTIFACT_COMPRESSION == "off":
+        return None
+    if ARTIFACT_COMPRESSION in {"auto", "zstd"} and zstandard is not None:
+        return _CODEC_ZSTD
+    return _CODEC_ZLIB
+
+
+def _encode_artifact(content: str) -> bytes:
+    raw = content.encode("utf-8")
+    codec = _artifact_codec()
+    if codec is None or len(raw) < ARTIFACT_COMPRESSION_MIN_BYTES:
+        return raw
+    if codec == _CODEC_ZSTD:
+        packed = zstandard.ZstdCompressor(level=ARTIFACT_COMPRESSION_LEVEL).compress(raw)
+    else:
+        packed = zlib.compress(raw, ARTIFACT_COMPRESSION_LEVEL)
+    if len(packed) + len(codec) >= len(raw):
+        return raw
+    return codec + packed
+
+
+def _decode_artifact(value: Optional[bytes]) -> Optional[str]:
+    if value is None:
+        return None
+    header = value[:4]
+    if header == _CODEC_ZLIB:
+        return zlib.decompress(value[4:]).decode("utf-8")
+    if header == _CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Artifact is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(value[4:]).decode("utf-8")
+    return value.decode("utf-8")
+
+
+def _queue_artifact_exists(pipe, run_id: str) -> None:
+    for name in ARTIFACT_NAMES:
+        if COMPACT_LAYOUT:
+            pipe.hexists(_run_key(run_id), _ARTIFACT + name)
+        else:
+            pipe.exists(_artifact_key(run_id, name))
+
+
+def _stream_items(response) -> List[Tuple[str, str]]:
+    # RESP2 shape is [[key, entries]]; RESP3 (redis-py's default from 8.x on some paths)
+    # is {key: entries}, or {key: [entries]} on older clients.
+    if isinstance(response, dict):
+        streams = list(response.values())
+    else:
+        streams = [entries for _, entries in response or []]
+    items: List[Tuple[str, str]] = []
+    for entries in streams:
+        if entries and isinstance(entries[0], list):
+            entries = entries[0]
+        for entry_id, fields in entries:
+            items.append((entry_id, fields.get("data", "")))
+    return items
+
+
+class RedisBackend(StorageBackend):
+    """Run state in Redis (split or compact layout), events in Redis Streams."""
+
+    def init_run(self, run_id: str, idea: str) -> None:
+        _write_run(
+            run_id,
+            meta={"status": "queued", "created_at": int(time.time())},
+            idea=idea,
+            steps={step: "pending" for step in STEP_ORDER},
+        )
+
+    def set_run_meta(self, run_id: str, values: Dict[str, str]) -> None:
+        if not values:
+            return
+        _write_run(run_id, meta=values)
+
+    def init_runs(
+        self,
+        ideas: Dict[str, str],
+        meta: Dict[str, Dict[str, str]],
+        steps: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """All runs in one pipeline instead of a round trip per run."""
+        pipe = get_binary_redis().pipeline(transaction=False)
+        created_at = int(time.time())
+        for run_id, idea in ideas.items():
+            _write_run(
+                run_id,
+                meta={"status": "queued", "created_at": created_at, **meta.get(run_id, {})},
+                idea=idea,
+                steps={**{step: "pending" for step in STEP_ORDER}, **(steps or {})},
+                pipe=pipe,
+            )
+        pipe.execute()
+
+    def create_batch(self, batch_id: str, run_ids: List[str]) -> None:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(
+            _batch_key(batch_id),
+            mapping={"created_at": int(time.time()), "run_ids": ",".join(run_ids)},
+        )
+        pipe.expire(_batch_key(batch_id), REDIS_TTL_SECONDS)
+        pipe.execute()
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        """The batch record, then every run's status in one pipelined round trip."""
+        batch = get_redis().hgetall(_batch_key(batch_id))
+        if not batch:
+            return None
+        run_ids = [run_id for run_id in batch.get("run_ids", "").split(",") if run_id]
+        pipe = get_binary_redis().pipeline(transaction=False)
+        for run_id in run_ids:
+            if COMPACT_LAYOUT:
+                pipe.hget(_run_key(run_id), _META + "status")
+            else:
+                pipe.hget(_meta_key(run_id), "status")
+        statuses = pipe.execute() if run_ids else []
+        return {
+            "created_at": int(batch.get("created_at") or 0),
+            "runs": {run_id: _text(status) for run_id, status in zip(run_ids, statuses)},
+        }
+
+    def get_run_meta(self, run_id: str) -> Dict[str, str]:
+        if COMPACT_LAYOUT:
+            r = get_binary_redis()
+            raw = dict(r.hscan_iter(_run_key(run_id), match=_META + "*", count=1000))
+            return _prefixed(raw, _META)
+        r = get_redis()
+        return r.hgetall(_meta_key(run_id)) or {}
+
+    def get_run_meta_value(self, run_id: str, key: str) -> Optional[str]:
+        if COMPACT_LAYOUT:
+            return _text(get_binary_redis().hget(_run_key(run_id), _META + key))
+        r = get_redis()
+        return r.hget(_meta_key(run_id), key)
+
+    def run_exists(self, run_id: str) -> bool:
+        r = get_redis()
+        if COMPACT_LAYOUT:
+            # Compatibility reader: a split-layout run is migrated on first touch.
+            if r.exists(_run_key(run_id)):
+                return True
+            return migrate_run_layout(run_id)
+        return r.exists(_meta_key(run_id)) == 1
+
+    def get_idea(self, run_id: str) -> Optional[str]:
+        if COMPACT_LAYOUT:
+            return _text(get_binary_redis().hget(_run_key(run_id), _IDEA))
+        r = get_redis()
+        return r.get(_idea_key(run_id))
+
+    def set_run_status(self, run_id: str, status: str) -> None:
+        _write_run(run_id, meta={"status": status, "updated_at": int(time.time())})
+
+    def get_run_status(self, run_id: str) -> Optional[str]:
+        if COMPACT_LAYOUT:
+            status = self.get_run_meta_value(run_id, "status")
+            if status is None and migrate_run_layout(run_id):
+                status = self.get_run_meta_value(run_id, "status")
+            return status
+        r = get_redis()
+        data = r.hget(_meta_key(run_id), "status")
+        return data
+
+    def transition_run(
+        self,
+        run_id: str,
+        *,
+        run_status: Optional[str] = None,
+        steps: Optional[Dict[str, str]] = None,
+        events: Optional[List[Dict]] = None,
+        require_status: Optional[set] = None,
+    ) -> bool:
+        global _transition_script
+        if _transition_script is None:
+            # register_script runs via EVALSHA and reloads the body only on NOSCRIPT.
+            _transition_script = get_redis().register_script(_TRANSITION_LUA)
+        allowed = allowed_statuses(run_status, require_status)
+        if allowed is not None and not allowed:
+            return False
+        if COMPACT_LAYOUT:
+            keys = [_run_key(run_id), _run_key(run_id), _events_key(run_id)]
+            prefixes = [_META, _STEP]
+        else:
+            keys = [_meta_key(run_id), _step_key(run_id), _events_key(run_id)]
+            prefixes = ["", ""]
+        args: List = [
+            REDIS_TTL_SECONDS,
+            REDIS_EVENTS_MAXLEN,
+            ",".join(sorted(allowed)) if allowed is not None else "",
+            run_status or "",
+            int(time.time()),
+            *prefixes,
+            len(steps or {}),
+        ]
+        for step, status in (steps or {}).items():
+            args.extend([step, status])
+        args.extend(json.dumps(event) for event in events or [])
+        applied, _, _ = _transition_script(keys=keys, args=args, client=get_redis())
+        return bool(applied)
+
+    def set_step_status(self, run_id: str, step: str, status: str) -> None:
+        _write_run(run_id, steps={step: status})
+
+    def get_step_statuses(self, run_id: str) -> Dict[str, str]:
+        if COMPACT_LAYOUT:
+            values = get_binary_redis().hmget(
+                _run_key(run_id), [_STEP + step for step in STEP_ORDER]
+            )
+            return {
+                step: _text(value) for step, value in zip(STEP_ORDER, values) if value is not None
+            }
+        r = get_redis()
+        raw = r.hgetall(_step_key(run_id))
+        return raw or {}
+
+    def set_artifact(self, run_id: str, name: str, content: str) -> None:
+        encoded = _encode_artifact(content)
+        pipe = get_binary_redis().pipeline(transaction=False)
+        _write_run(run_id, artifacts={name: encoded}, pipe=pipe)
+        pipe.hincrby(_metrics_key(), "artifact_bytes_raw", len(content.encode("utf-8")))
+        pipe.hincrby(_metrics_key(), "artifact_bytes_stored", len(encoded))
+        pipe.execute()
+
+    def get_artifact(self, run_id: str, name: str) -> Optional[str]:
+        r = get_binary_redis()
+        if COMPACT_LAYOUT:
+            return _decode_artifact(r.hget(_run_key(run_id), _ARTIFACT + name))
+        return _decode_artifact(r.get(_artifact_key(run_id, name)))
+
+    def get_metrics(self) -> Dict[str, int]:
+        raw = get_redis().hgetall(_metrics_key()) or {}
+        metrics = {key: int(value) for key, value in raw.items()}
+        metrics["artifact_bytes_saved"] = metrics.get("artifact_bytes_raw", 0) - metrics.get(
+            "artifact_bytes_stored", 0
+        )
+        return metrics
+
+    def append_draft(self, run_id: str, name: str, delta: str) -> None:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.append(_draft_key(run_id, name), delta)
+        pipe.expire(_draft_key(run_id, name), REDIS_TTL_SECONDS)
+        pipe.execute()
+
+    def get_draft(self, run_id: str, name: str) -> Optional[str]:
+        return get_redis().get(_draft_key(run_id, name))
+
+    def clear_draft(self, run_id: str, name: str) -> None:
+        get_redis().delete(_draft_key(run_id, name))
+
+    def touch_active_run(self, run_id: str, lease_seconds: int) -> None:
+        get_redis().zadd(_active_runs_key(), {run_id: time.time() + lease_seconds})
+
+    def release_active_run(self, run_id: str) -> None:
+        get_redis().zrem(_active_runs_key(), run_id)
+
+    def claim_stale_runs(self, limit: int = 100) -> List[str]:
+        r = get_redis()
+        stale = r.zrangebyscore(_active_runs_key(), "-inf", time.time(), start=0, num=limit)
+        if not stale:
+            return []
+        pipe = r.pipeline(transaction=False)
+        for run_id in stale:
+            pipe.zrem(_active_runs_key(), run_id)
+        # ZREM returns 1 only to the caller that actually removed the member.
+        return [run_id for run_id, removed in zip(stale, pipe.execute()) if removed]
+
+    def count_active_runs(self) -> int:
+        return get_redis().zcount(_active_runs_key(), f"({time.time()}", "+inf")
+
+    def push_waiting_run(self, run_id: str) -> int:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.zadd(_waiting_runs_key(), {run_id: time.time()}, nx=True)
+        pipe.zrank(_waiting_runs_key(), run_id)
+        _, rank = pipe.execute()
+        return int(rank) + 1
+
+    def pop_waiting_runs(self, limit: int) -> List[str]:
+        return [run_id for run_id, _ in get_redis().zpopmin(_waiting_runs_key(), limit)]
+
+    def count_waiting_runs(self) -> int:
+        return get_redis().zcard(_waiting_runs_key())
+
+    def list_artifacts(self, run_id: str) -> Dict[str, bool]:
+        pipe = get_redis().pipeline(transaction=False)
+        _queue_artifact_exists(pipe, run_id)
+        return {name: bool(exists) for name, exists in zip(ARTIFACT_NAMES, pipe.execute())}
+
+    def get_run_snapshot(self, run_id: str) -> Optional[Dict[str, Dict]]:
+        """Meta, step statuses and artifact presence for a run in a single round trip.
+
+        Returns None when the run does not exist.
+        """
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        if COMPACT_LAYOUT:
+            # Small hashes come back from HSCAN in one page, so this stays a single batch.
+            pipe.hscan(_run_key(run_id), 0, match=_META + "*", count=1000)
+            pipe.hmget(_run_key(run_id), [_STEP + step for step in STEP_ORDER])
+        else:
+            pipe.hgetall(_meta_key(run_id))
+            pipe.hgetall(_step_key(run_id))
+        _queue_artifact_exists(pipe, run_id)
+        results = pipe.execute()
+        if COMPACT_LAYOUT:
+            cursor, raw_meta = results[0]
+            meta = _prefixed(raw_meta, _META)
+            if cursor:
+                meta = self.get_run_meta(run_id)
+            if not meta:
+                return self.get_run_snapshot(run_id) if migrate_run_layout(run_id) else None
+            steps = {
+                step: value for step, value in zip(STEP_ORDER, results[1]) if value is not None
+            }
+        else:
+            meta = results[0] or {}
+            if not meta:
+                return None
+            steps = results[1] or {}
+        return {
+            "meta": meta,
+            "steps": steps,
+            "artifacts": {
+                name: bool(exists) for name, exists in zip(ARTIFACT_NAMES, results[2:])
+            },
+        }
+
+    def clear_artifacts(self, run_id: str, names: List[str]) -> None:
+        if not names:
+            return
+        r = get_redis()
+        if COMPACT_LAYOUT:
+            r.hdel(_run_key(run_id), *[_ARTIFACT + name for name in names])
+            return
+        keys = [_artifact_key(run_id, name) for name in names]
+        r.delete(*keys)
+
+    def append_event(self, run_id: str, event: Dict[str, str]) -> str:
+        """Append an event to the run's stream and return its stream ID."""
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.xadd(
+            _events_key(run_id),
+            {"data": json.dumps(event)},
+            maxlen=REDIS_EVENTS_MAXLEN,
+            approximate=True,
+        )
+        pipe.expire(_events_key(run_id), REDIS_TTL_SECONDS)
+        event_id, _ = pipe.execute()
+        return event_id
+
+    def get_events(self, run_id: str, start: int = 0) -> List[str]:
+        r = get_redis()
+        entries = r.xrange(_events_key(run_id))
+        return [fields.get("data", "") for _, fields in entries[max(0, start) :]]
+
+    def event_id_at_index(self, run_id: str, index: int) -> str:
+        """Stream ID to resume after so that reading starts at the index-th event."""
+        if index <= 0:
+            return "0-0"
+        r = get_redis()
+        entries = r.xrange(_events_key(run_id), count=index)
+        return entries[-1][0] if entries else "0-0"
+
+    def latest_event_id(self, run_id: str) -> str:
+        entries = get_redis().xrevrange(_events_key(run_id), count=1)
+        return entries[0][0] if entries else "0-0"
+
+    def read_events(
+        self,
+        run_id: str,
+        after_id: str = "0-0",
+        *,
+        count: int = 100,
+        block_ms: Optional[int] = None,
+    ) -> List[Tuple[str, str]]:
+        """Events strictly after after_id as (stream_id, json) pairs.
+
+        With block_ms, waits server-side (XREAD BLOCK) until an event arrives or the
+        timeout passes, so idle runs cost no polling.
+        """
+        r = get_redis()
+        return _stream_items(
+            r.xread({_events_key(run_id): after_id}, count=count, block=block_ms)
+        )
+
+    async def run_exists_async(self, run_id: str) -> bool:
+        r = get_async_redis()
+        # Either layout counts; the sync readers migrate split-layout runs on first touch.
+        return await r.exists(_run_key(run_id), _meta_key(run_id)) > 0
+
+    async def event_id_at_index_async(self, run_id: str, index: int) -> str:
+        if index <= 0:
+            return "0-0"
+        r = get_async_redis()
+        entries = await r.xrange(_events_key(run_id), count=index)
+        return entries[-1][0] if entries else "0-0"
+
+    async def latest_event_id_async(self, run_id: str) -> str:
+        r = get_async_redis()
+        entries = await r.xrevrange(_events_key(run_id), count=1)
+        return entries[0][0] if entries else "0-0"
+
+    async def read_events_async(
+        self,
+        run_id: str,
+        after_id: str = "0-0",
+        *,
+        count: int = 100,
+        block_ms: Optional[int] = None,
+    ) -> List[Tuple[str, str]]:
+        """asyncio variant of read_events(); waits on the event loop, not a thread."""
+        r = get_async_redis()
+        return _stream_items(
+            await r.xread({_events_key(run_id): after_id}, count=count, block=block_ms)
+        )
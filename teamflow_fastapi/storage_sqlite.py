@@ -0,0 +1,412 @@
+"""SQLite storage backend: durable single-host runs without a Redis server.
+
+Every process that opens the same SQLITE_PATH sees the same runs, so an API and a
+Celery worker on one machine can share it. Blocking event reads poll.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .storage_base import (
+    ARTIFACT_NAMES,
+    STEP_ORDER,
+    StorageBackend,
+    allowed_statuses,
+    event_id_key,
+)
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", "teamflow.sqlite3")
+SQLITE_TTL_SECONDS = int(
+    os.getenv("SQLITE_TTL_SECONDS", os.getenv("REDIS_TTL_SECONDS", "21600"))
+)
+SQLITE_POLL_INTERVAL_SECONDS = max(0.01, float(os.getenv("SQLITE_POLL_INTERVAL_SECONDS", "0.1")))
+SQLITE_SWEEP_INTERVAL_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    meta TEXT NOT NULL DEFAULT '{}',
+    steps TEXT NOT NULL DEFAULT '{}',
+    idea TEXT,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS active_runs (
+    run_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    run_ids TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waiting_runs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS events (
+    run_id TEXT NOT NULL,
+    ms INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (run_id, ms, seq)
+);
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    """Run state, artifacts and events in one SQLite file (WAL mode)."""
+
+    def __init__(self, path: str = SQLITE_PATH, ttl_seconds: int = SQLITE_TTL_SECONDS) -> None:
+        self._path = path
+        self._ttl = ttl_seconds
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # One connection per thread; sqlite3 connections are not shareable.
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        return _Transaction(conn)
+
+    def _sweep(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + SQLITE_SWEEP_INTERVAL_SECONDS
+        expired = "SELECT run_id FROM runs WHERE expires_at <= ?"
+        conn.execute(f"DELETE FROM artifacts WHERE run_id IN ({expired})", (now,))
+        conn.execute(f"DELETE FROM events WHERE run_id IN ({expired})", (now,))
+        conn.execute("DELETE FROM runs WHERE expires_at <= ?", (now,))
+        conn.execute("DELETE FROM batches WHERE expires_at <= ?", (now,))
+
+    def _row(self, run_id: str) -> Optional[Tuple[Dict, Dict, Optional[str]]]:
+        row = self._conn().execute(
+            "SELECT meta, steps, idea FROM runs WHERE run_id = ? AND expires_at > ?",
+            (run_id, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1]), row[2]
+
+    def _update(
+        self,
+        conn: sqlite3.Connection,
+        run_id: str,
+        *,
+        meta: Optional[Dict] = None,
+        steps: Optional[Dict] = None,
+        idea: Optional[str] = None,
+    ) -> None:
+        self._sweep(conn)
+        current = self._row(run_id) or ({}, {}, None)
+        new_meta = {**current[0], **{k: str(v) for k, v in (meta or {}).items()}}
+        new_steps = {**current[1], **(steps or {})}
+        conn.execute(
+            "INSERT INTO runs (run_id, meta, steps, idea, expires_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(run_id) DO UPDATE SET meta = excluded.meta, steps = excluded.steps, "
+            "idea = excluded.idea, expires_at = excluded.expires_at",
+            (
+                run_id,
+                json.dumps(new_meta),
+                json.dumps(new_steps),
+                idea if idea is not None else current[2],
+                time.time() + self._ttl,
+            ),
+        )
+
+    def _append(self, conn: sqlite3.Connection, run_id: str, data: str) -> str:
+        ms = int(time.time() * 1000)
+        last = conn.execute(
+            "SELECT ms, seq FROM events WHERE run_id = ? ORDER BY ms DESC, seq DESC LIMIT 1",
+            (run_id,),
+        ).fetchone()
+        if last and last[0] >= ms:
+            ms, seq = last[0], last[1] + 1
+        else:
+            seq = 0
+        conn.execute(
+            "INSERT INTO events (run_id, ms, seq, data) VALUES (?, ?, ?, ?)",
+            (run_id, ms, seq, data),
+        )
+        return f"{ms}-{seq}"
+
+    def init_run(self, run_id: str, idea: str) -> None:
+        with self._write() as conn:
+            self._update(
+                conn,
+                run_id,
+                meta={"status": "queued", "created_at": int(time.time())},
+                steps={step: "pending" for step in STEP_ORDER},
+                idea=idea,
+            )
+
+    def init_runs(
+        self,
+        ideas: Dict[str, str],
+        meta: Dict[str, Dict[str, str]],
+        steps: Optional[Dict[str, str]] = None,
+    ) -> None:
+        with self._write() as conn:
+            for run_id, idea in ideas.items():
+                self._update(
+                    conn,
+                    run_id,
+                    meta={
+                        "status": "queued",
+                        "created_at": int(time.time()),
+                        **meta.get(run_id, {}),
+                    },
+                    steps={**{step: "pending" for step in STEP_ORDER}, **(steps or {})},
+                    idea=idea,
+                )
+
+    def create_batch(self, batch_id: str, run_ids: List[str]) -> None:
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO batches (batch_id, run_ids, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?)",
+                (batch_id, json.dumps(run_ids), int(time.time()), time.time() + self._ttl),
+            )
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        now = time.time()
+        rows = self._conn().execute(
+            "SELECT b.created_at, j.value, json_extract(r.meta, '$.status') "
+            "FROM batches b, json_each(b.run_ids) j "
+            "LEFT JOIN runs r ON r.run_id = j.value AND r.expires_at > ? "
+            "WHERE b.batch_id = ? AND b.expires_at > ? ORDER BY j.key",
+            (now, batch_id, now),
+        ).fetchall()
+        if not rows:
+            return None
+        return {"created_at": rows[0][0], "runs": {run_id: status for _, run_id, status in rows}}
+
+    def set_run_meta(self, run_id: str, values: Dict[str, str]) -> None:
+        if not values:
+            return
+        with self._write() as conn:
+            self._update(conn, run_id, meta=values)
+
+    def get_run_meta(self, run_id: str) -> Dict[str, str]:
+        row = self._row(run_id)
+        return row[0] if row else {}
+
+    def get_run_meta_value(self, run_id: str, key: str) -> Optional[str]:
+        return self.get_run_meta(run_id).get(key)
+
+    def run_exists(self, run_id: str) -> bool:
+        return bool(self.get_run_meta(run_id))
+
+    def get_idea(self, run_id: str) -> Optional[str]:
+        row = self._row(run_id)
+        return row[2] if row else None
+
+    def set_run_status(self, run_id: str, status: str) -> None:
+        self.set_run_meta(run_id, {"status": status, "updated_at": int(time.time())})
+
+    def get_run_status(self, run_id: str) -> Optional[str]:
+        return self.get_run_meta_value(run_id, "status")
+
+    def transition_run(
+        self,
+        run_id: str,
+        *,
+        run_status: Optional[str] = None,
+        steps: Optional[Dict[str, str]] = None,
+        events: Optional[List[Dict]] = None,
+        require_status: Optional[set] = None,
+    ) -> bool:
+        allowed = allowed_statuses(run_status, require_status)
+        if allowed is not None and not allowed:
+            return False
+        with self._write() as conn:
+            if allowed is not None and (self.get_run_status(run_id) or "") not in allowed:
+                return False
+            meta = {"status": run_status, "updated_at": int(time.time())} if run_status else None
+            self._update(conn, run_id, meta=meta, steps=steps)
+            for event in events or []:
+                self._append(conn, run_id, json.dumps(event))
+            return True
+
+    def set_step_status(self, run_id: str, step: str, status: str) -> None:
+        with self._write() as conn:
+            self._update(conn, run_id, steps={step: status})
+
+    def get_step_statuses(self, run_id: str) -> Dict[str, str]:
+        row = self._row(run_id)
+        return row[1] if row else {}
+
+    def set_artifact(self, run_id: str, name: str, content: str) -> None:
+        with self._write() as conn:
+            self._update(conn, run_id)
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (run_id, name, content) VALUES (?, ?, ?)",
+                (run_id, name, content),
+            )
+
+    def get_artifact(self, run_id: str, name: str) -> Optional[str]:
+        if self._row(run_id) is None:
+            return None
+        row = self._conn().execute(
+            "SELECT content FROM artifacts WHERE run_id = ? AND name = ?", (run_id, name)
+        ).fetchone()
+        return row[0] if row else None
+
+    def list_artifacts(self, run_id: str) -> Dict[str, bool]:
+        present = set()
+        if self._row(run_id) is not None:
+            present = {
+                name
+                for (name,) in self._conn().execute(
+                    "SELECT name FROM artifacts WHERE run_id = ?", (run_id,)
+                )
+            }
+        return {name: name in present for name in ARTIFACT_NAMES}
+
+    def get_run_snapshot(self, run_id: str) -> Optional[Dict[str, Dict]]:
+        row = self._row(run_id)
+        if row is None or not row[0]:
+            return None
+        return {"meta": row[0], "steps": row[1], "artifacts": self.list_artifacts(run_id)}
+
+    def clear_artifacts(self, run_id: str, names: List[str]) -> None:
+        if not names:
+            return
+        with self._write() as conn:
+            conn.executemany(
+                "DELETE FROM artifacts WHERE run_id = ? AND name = ?",
+                [(run_id, name) for name in names],
+            )
+
+    def append_draft(self, run_id: str, name: str, delta: str) -> None:
+        # Appends in place; the run row (and its TTL) is left to the regular writes.
+        with self._write() as conn:
+            conn.execute(
+                "INSERT INTO artifacts (run_id, name, content) VALUES (?, ?, ?) "
+                "ON CONFLICT(run_id, name) DO UPDATE SET content = content || excluded.content",
+                (run_id, name, delta),
+            )
+
+    def touch_active_run(self, run_id: str, lease_seconds: int) -> None:
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO active_runs (run_id, expires_at) VALUES (?, ?)",
+                (run_id, time.time() + lease_seconds),
+            )
+
+    def release_active_run(self, run_id: str) -> None:
+        with self._write() as conn:
+            conn.execute("DELETE FROM active_runs WHERE run_id = ?", (run_id,))
+
+    def claim_stale_runs(self, limit: int = 100) -> List[str]:
+        with self._write() as conn:
+            stale = [
+                run_id
+                for (run_id,) in conn.execute(
+                    "SELECT run_id FROM active_runs WHERE expires_at <= ? "
+                    "ORDER BY expires_at LIMIT ?",
+                    (time.time(), limit),
+                )
+            ]
+            conn.executemany("DELETE FROM active_runs WHERE run_id = ?", [(r,) for r in stale])
+            return stale
+
+    def count_active_runs(self) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM active_runs WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+
+    def push_waiting_run(self, run_id: str) -> int:
+        with self._write() as conn:
+            conn.execute("INSERT OR IGNORE INTO waiting_runs (run_id) VALUES (?)", (run_id,))
+            row = conn.execute(
+                "SELECT COUNT(*) FROM waiting_runs WHERE seq <= "
+                "(SELECT seq FROM waiting_runs WHERE run_id = ?)",
+                (run_id,),
+            ).fetchone()
+            return row[0]
+
+    def pop_waiting_runs(self, limit: int) -> List[str]:
+        with self._write() as conn:
+            rows = conn.execute(
+                "SELECT seq, run_id FROM waiting_runs ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+            conn.executemany("DELETE FROM waiting_runs WHERE seq = ?", [(seq,) for seq, _ in rows])
+            return [run_id for _, run_id in rows]
+
+    def count_waiting_runs(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM waiting_runs").fetchone()[0]
+
+    def append_event(self, run_id: str, event: Dict[str, str]) -> str:
+        with self._write() as conn:
+            self._update(conn, run_id)
+            return self._append(conn, run_id, json.dumps(event))
+
+    def get_events(self, run_id: str, start: int = 0) -> List[str]:
+        return [data for _, data in self.read_events(run_id, count=-1)][max(0, start) :]
+
+    def event_id_at_index(self, run_id: str, index: int) -> str:
+        if index <= 0:
+            return "0-0"
+        items = self.read_events(run_id, count=index)
+        return items[-1][0] if items else "0-0"
+
+    def latest_event_id(self, run_id: str) -> str:
+        row = self._conn().execute(
+            "SELECT ms, seq FROM events WHERE run_id = ? ORDER BY ms DESC, seq DESC LIMIT 1",
+            (run_id,),
+        ).fetchone()
+        return f"{row[0]}-{row[1]}" if row else "0-0"
+
+    def read_events(
+        self,
+        run_id: str,
+        after_id: str = "0-0",
+        *,
+        count: int = 100,
+        block_ms: Optional[int] = None,
+    ) -> List[Tuple[str, str]]:
+        ms, seq = event_id_key(after_id)
+        deadline = time.monotonic() + (block_ms or 0) / 1000
+        while True:
+            rows = self._conn().execute(
+                "SELECT ms, seq, data FROM events WHERE run_id = ? AND (ms > ? OR (ms = ? AND seq > ?)) "
+                "ORDER BY ms, seq LIMIT ?",
+                (run_id, ms, ms, seq, count),
+            ).fetchall()
+            if rows or not block_ms or time.monotonic() >= deadline:
+                return [(f"{m}-{s}", data) for m, s, data in rows]
+            time.sleep(SQLITE_POLL_INTERVAL_SECONDS)
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
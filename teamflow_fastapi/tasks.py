@@ -1,31 +1,55 @@
+import asyncio
 import dataclasses
 import logging
 import os
 import re
+import threading
 import time
-from pathlib import Path
-from typing import Optional, Tuple
+import uuid
+from typing import Dict, List, Optional, Tuple
 
 from agents import Agent, ModelSettings, Runner, enable_verbose_stdout_logging, trace
 from agents.models.default_models import get_default_model_settings
+from celery import chain, group
 from dotenv import load_dotenv
+from openai.types.responses import ResponseTextDeltaEvent
 
 # Load environment variables from .env file
 load_dotenv()
 
-from .celery_app import celery_app
+from . import admission
+from .agent_loop import ASYNC_AGENTS, AgentCallCancelled, run_on_agent_loop
+from .celery_app import DEFAULT_LANE, celery_app, lane_queue
+from .checkpoints import completed_nodes, load_checkpoints, unchanged, write_checkpoint
+from .context import compress_markdown, pack
+from .llm_cache import cache_get, cache_key, cache_set, get_cache
+from .model_backends import get_stub_model
+from .pipeline import Node, build_pipeline
+from .rate_limit import RateLimitWaitCancelled, acquire, estimate_tokens
 from .storage import (
+    STEP_ORDER,
+    append_draft,
     append_event,
+    claim_stale_runs,
+    count_active_runs,
+    clear_draft,
     get_run_status,
     get_artifact,
     get_idea,
     get_run_meta,
+    get_run_meta_value,
+    is_run_cancelled,
+    pop_waiting_runs,
+    push_waiting_run,
+    release_active_run,
     set_artifact,
-    set_run_status,
+    set_run_meta,
     set_step_status,
+    touch_active_run,
+    transition_run,
 )
+from .templates import registry as prompt_templates
 
-PROMPT_DIR = Path(__file__).resolve().parent / "prompts"
 REVIEW_ENABLED = os.getenv("REVIEW_ENABLED", "false").lower() in {"1", "true", "yes"}
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5.2")
@@ -56,66 +80,134 @@ TEAMFLOW_SSE_AGENT_EVENTS = os.getenv("TEAMFLOW_SSE_AGENT_EVENTS", "true").lower
 TEAMFLOW_SSE_AGENT_PREVIEW_CHARS = max(
     0, int(os.getenv("TEAMFLOW_SSE_AGENT_PREVIEW_CHARS", "0"))
 )
+# Stream agent output into a draft artifact + artifact_delta events while it is generated.
+TEAMFLOW_AGENT_STREAMING = os.getenv("TEAMFLOW_AGENT_STREAMING", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+TEAMFLOW_STREAM_FLUSH_MS = max(50, int(os.getenv("TEAMFLOW_STREAM_FLUSH_MS", "500")))
+# Abort in-flight agent calls once their run is cancelled. Opt-in: agent calls then go
+# through the shared agent loop, which reads the run status every TEAMFLOW_CANCEL_POLL_MS
+# per call. Otherwise a cancel takes effect when the current step ends.
+TEAMFLOW_CANCEL_INFLIGHT = os.getenv("TEAMFLOW_CANCEL_INFLIGHT", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+TEAMFLOW_CANCEL_POLL_MS = max(50, int(os.getenv("TEAMFLOW_CANCEL_POLL_MS", "500")))
+# On regeneration, skip downstream steps whose inputs come out unchanged (their
+# checkpointed outputs are kept) instead of clearing and rerunning everything after it.
+TEAMFLOW_INCREMENTAL_REGENERATE = os.getenv(
+    "TEAMFLOW_INCREMENTAL_REGENERATE", "true"
+).lower() in {"1", "true", "yes"}
+# A run whose worker has not renewed its lease for this long is resumed elsewhere.
+TEAMFLOW_RUN_LEASE_SECONDS = max(10, int(os.getenv("TEAMFLOW_RUN_LEASE_SECONDS", "120")))
+# Lease held between a finished orchestration and its finalize task, which may queue
+# behind other work on a busy lane. Only a finalize that never arrives waits this long.
+TEAMFLOW_FINALIZE_LEASE_SECONDS = max(
+    TEAMFLOW_RUN_LEASE_SECONDS, int(os.getenv("TEAMFLOW_FINALIZE_LEASE_SECONDS", "3600"))
+)
 
 logger = logging.getLogger("teamflow.agents")
 logger.setLevel(getattr(logging, TEAMFLOW_AGENT_LOG_LEVEL, logging.INFO))
 
+# TEAMFLOW_MODEL_BACKEND=stub: canned replies instead of OpenAI calls. The stub gets its
+# own model name so its replies never land in (or come from) a real model's cache entries.
+_stub_model = get_stub_model()
+MODEL_NAME = "stub" if _stub_model else OPENAI_MODEL
+
 if OPENAI_AGENT_VERBOSE_LOGS:
     enable_verbose_stdout_logging()
 
 
-def _start_step(run_id: str, step: str) -> None:
+def _start_step(run_id: str, step: str) -> bool:
+    """Mark a step running; False when the run may no longer run (e.g. cancelled)."""
+    now = int(time.time())
+    events = []
     if step == "pm":
-        set_run_status(run_id, "running")
-        append_event(run_id, {"type": "run_started", "timestamp": int(time.time())})
-    set_step_status(run_id, step, "running")
-    append_event(
-        run_id,
-        {"type": "step_started", "step": step, "timestamp": int(time.time())},
+        events.append({"type": "run_started", "timestamp": now})
+    events.append({"type": "step_started", "step": step, "timestamp": now})
+    if step == "pm":
+        return transition_run(
+            run_id, run_status="running", steps={step: "running"}, events=events
+        )
+    return transition_run(
+        run_id, steps={step: "running"}, events=events, require_status={"running"}
     )
 
 
-def _finish_step(run_id: str, step: str, status: str) -> None:
-    set_step_status(run_id, step, status)
-    append_event(
+def _finish_step(run_id: str, step: str, status: str) -> bool:
+    return transition_run(
         run_id,
-        {"type": f"step_{status}", "step": step, "timestamp": int(time.time())},
+        steps={step: status},
+        events=[{"type": f"step_{status}", "step": step, "timestamp": int(time.time())}],
+        require_status={"running"},
     )
 
 
 def _fail_step(run_id: str, step: str, exc: Exception) -> None:
-    set_step_status(run_id, step, "failed")
-    set_run_status(run_id, "failed")
-    append_event(
+    transition_run(
         run_id,
-        {
-            "type": "step_failed",
-            "step": step,
-            "error": str(exc),
-            "timestamp": int(time.time()),
-        },
+        run_status="failed",
+        steps={step: "failed"},
+        events=[
+            {
+                "type": "step_failed",
+                "step": step,
+                "error": str(exc),
+                "timestamp": int(time.time()),
+            }
+        ],
     )
 
 
-def _load_prompt(name: str) -> str:
-    path = PROMPT_DIR / f"{name}.md"
-    return path.read_text(encoding="utf-8")
+# Values each node passes to its template; placeholders outside these are reported
+# once, when the templates are loaded.
+_PROMPT_VARIABLES = {
+    "pm": {"idea"},
+    "tech": {"prd"},
+    "qa": {"prd", "arch", "api"},
+    "principal_engineer": {"prd", "arch", "api"},
+    "tech_revision": {"prd", "arch", "api", "qa_feedback", "pe_feedback", "iteration"},
+    "reviewer": {"prd", "arch", "api", "test", "risk", "stack"},
+}
+prompt_templates.preload(_PROMPT_VARIABLES)
 
 
-def _render_prompt(template: str, **kwargs: str) -> str:
-    rendered = template
-    for key, value in kwargs.items():
-        rendered = rendered.replace(f"${key}", value)
-    missing = re.findall(r"\$[A-Za-z_]+", rendered)
-    if missing:
-        logger.warning("Prompt rendering left placeholders unresolved: %s", missing)
-    return rendered
+def _render_prompt(name: str, run_id: str, step: str, **kwargs: str) -> str:
+    template = prompt_templates.get(name)
+    packed = pack(template, kwargs)
+    if packed.compressed:
+        saved = packed.tokens_before - packed.tokens_after
+        logger.info(
+            "Context packed for %s step=%s run_id=%s: ~%s -> ~%s tokens (%s saved; %s)",
+            name,
+            step,
+            run_id,
+            packed.tokens_before,
+            packed.tokens_after,
+            saved,
+            ", ".join(packed.compressed),
+        )
+        append_event(
+            run_id,
+            {
+                "type": "context_packed",
+                "step": step,
+                "tokens_before": packed.tokens_before,
+                "tokens_after": packed.tokens_after,
+                "compressed": packed.compressed,
+                "timestamp": int(time.time()),
+            },
+        )
+    return template.render(**packed.values)
 
 
 def _ensure_heading(content: str, heading: str) -> str:
     if not content:
         return f"# {heading}"
-    pattern = re.compile(rf"(?im)^#{1,6}\s*{re.escape(heading)}\s*$")
+    pattern = re.compile(rf"(?im)^#{{1,6}}\s*{re.escape(heading)}\s*$")
     if pattern.search(content):
         return content.strip()
     return f"# {heading}\n\n{content.strip()}"
@@ -151,7 +243,7 @@ def _split_sections(
 ) -> Tuple[str, str]:
     if not content:
         return "", ""
-    pattern = re.compile(rf"(?im)^#{1,6}\s*{re.escape(secondary_heading)}\s*$")
+    pattern = re.compile(rf"(?im)^#{{1,6}}\s*{re.escape(secondary_heading)}\s*$")
     match = pattern.search(content)
     if not match:
         first = _ensure_heading(content.strip(), primary_heading)
@@ -189,6 +281,213 @@ def _build_model_settings() -> ModelSettings:
     return dataclasses.replace(base, temperature=OPENAI_TEMPERATURE)
 
 
+def _draft_name(step: str) -> str:
+    return f"draft_{step}"
+
+
+class _DraftWriter:
+    """Streamed output of one agent call, published at most every TEAMFLOW_STREAM_FLUSH_MS.
+
+    Each flush appends the text added since the previous flush to the step's draft and
+    emits one artifact_delta event carrying it.
+    """
+
+    def __init__(self, run_id: str, step: str, iteration: int) -> None:
+        self.run_id = run_id
+        self.step = step
+        self.iteration = iteration
+        self.length = 0
+        self._pending: List[str] = []
+        self._last_flush = time.monotonic()
+
+    async def add(self, delta: str) -> None:
+        self._pending.append(delta)
+        if (time.monotonic() - self._last_flush) * 1000 >= TEAMFLOW_STREAM_FLUSH_MS:
+            await self.flush()
+
+    async def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        delta = "".join(self._pending)
+        self._pending = []
+        offset = self.length
+        self.length += len(delta)
+        # Storage calls are blocking; keep them off the shared agent loop.
+        await asyncio.to_thread(self._publish, offset, delta)
+
+    def _publish(self, offset: int, delta: str) -> None:
+        append_draft(self.run_id, _draft_name(self.step), delta)
+        append_event(
+            self.run_id,
+            {
+                "type": "artifact_delta",
+                "step": self.step,
+                "iteration": self.iteration,
+                "offset": offset,
+                "delta": delta,
+                "timestamp": int(time.time()),
+            },
+        )
+
+
+async def _invoke_agent(agent: Agent, input_text: str, *, run_id: str, step: str, iteration: int):
+    if _stub_model is not None:
+        if not TEAMFLOW_AGENT_STREAMING:
+            return await _stub_model.run(agent.name, agent.instructions)
+        draft = _DraftWriter(run_id, step, iteration)
+        output = await _stub_model.run(agent.name, agent.instructions, on_delta=draft.add)
+        await draft.flush()
+        return output
+    if not TEAMFLOW_AGENT_STREAMING:
+        return await Runner.run(agent, input_text, max_turns=OPENAI_AGENT_MAX_TURNS)
+    result = Runner.run_streamed(agent, input_text, max_turns=OPENAI_AGENT_MAX_TURNS)
+    draft = _DraftWriter(run_id, step, iteration)
+    async for event in result.stream_events():
+        if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+            await draft.add(event.data.delta)
+    await draft.flush()
+    return result
+
+
+async def _run_agent_async(
+    agent: Agent, input_text: str, *, role: str, run_id: str, step: str, iteration: int
+):
+    if not OPENAI_AGENT_TRACE:
+        return await _invoke_agent(
+            agent, input_text, run_id=run_id, step=step, iteration=iteration
+        )
+    with trace(
+        f"TeamFlow {role}",
+        metadata={"run_id": run_id, "step": step, "agent": role},
+    ) as agent_trace:
+        logger.info("Trace started for %s: %s", role, agent_trace.trace_id)
+        return await _invoke_agent(
+            agent, input_text, run_id=run_id, step=step, iteration=iteration
+        )
+
+
+class _CallAborted(Exception):
+    def __init__(self, role: str, elapsed: float) -> None:
+        super().__init__(f"{role} call aborted after {elapsed:.1f}s")
+        self.role = role
+        self.elapsed = elapsed
+
+
+class _CallDurations:
+    """Moving average of agent call time per role, to estimate the time aborts save."""
+
+    def __init__(self) -> None:
+        self._avg: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, role: str, seconds: float) -> None:
+        with self._lock:
+            avg = self._avg.get(role)
+            self._avg[role] = seconds if avg is None else 0.8 * avg + 0.2 * seconds
+
+    def remaining(self, role: str, elapsed: float) -> float:
+        with self._lock:
+            return max(0.0, self._avg.get(role, 0.0) - elapsed)
+
+    def typical(self) -> float:
+        with self._lock:
+            return sum(self._avg.values()) / len(self._avg) if self._avg else 0.0
+
+
+_call_durations = _CallDurations()
+
+
+def _call_model(
+    role: str, prompt: str, input_text: str, run_id: str, step: str, iteration: int
+) -> str:
+    if _stub_model is None and not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    agent = Agent(
+        name=role,
+        instructions=prompt,
+        model=OPENAI_MODEL,
+        model_settings=_build_model_settings(),
+    )
+    started = time.monotonic()
+    if ASYNC_AGENTS or TEAMFLOW_AGENT_STREAMING or TEAMFLOW_CANCEL_INFLIGHT:
+        # Streaming is async-only in the SDK, and only a coroutine can be aborted
+        # mid-call, so both go through the agent loop.
+        try:
+            result = run_on_agent_loop(
+                lambda: _run_agent_async(
+                    agent, input_text, role=role, run_id=run_id, step=step, iteration=iteration
+                ),
+                should_cancel=(lambda: is_run_cancelled(run_id))
+                if TEAMFLOW_CANCEL_INFLIGHT
+                else None,
+                poll_seconds=TEAMFLOW_CANCEL_POLL_MS / 1000,
+            )
+        except AgentCallCancelled:
+            raise _CallAborted(role, time.monotonic() - started) from None
+    elif _stub_model is not None:
+        result = _stub_model.run_sync(role, prompt)
+    elif OPENAI_AGENT_TRACE:
+        with trace(
+            f"TeamFlow {role}",
+            metadata={"run_id": run_id, "step": step, "agent": role},
+        ) as agent_trace:
+            logger.info("Trace started for %s: %s", role, agent_trace.trace_id)
+            result = Runner.run_sync(agent, input_text, max_turns=OPENAI_AGENT_MAX_TURNS)
+    else:
+        result = Runner.run_sync(agent, input_text, max_turns=OPENAI_AGENT_MAX_TURNS)
+    _call_durations.record(role, time.monotonic() - started)
+    output = result.final_output if hasattr(result, "final_output") else result
+    return "" if output is None else str(output)
+
+
+def _cache_enabled(run_id: str) -> bool:
+    if get_cache() is None:
+        return False
+    return (get_run_meta_value(run_id, "use_cache") or "true") != "false"
+
+
+def _acquire_model_capacity(
+    run_id: str, step: str, role: str, prompt: str, input_text: str
+) -> None:
+    def waiting(wait_ms: int) -> None:
+        append_event(
+            run_id,
+            {
+                "type": "rate_limit_wait",
+                "step": step,
+                "role": role,
+                "model": MODEL_NAME,
+                "estimated_wait_ms": wait_ms,
+                "timestamp": int(time.time()),
+            },
+        )
+
+    try:
+        waited_ms = acquire(
+            MODEL_NAME,
+            estimate_tokens(prompt, input_text),
+            on_wait=waiting,
+            should_cancel=lambda: is_run_cancelled(run_id),
+        )
+    except RateLimitWaitCancelled:
+        # The call never started; report it like an aborted one.
+        raise _CallAborted(role, 0.0) from None
+    if waited_ms:
+        logger.info("Rate limit held %s for %sms on run_id=%s", role, waited_ms, run_id)
+        append_event(
+            run_id,
+            {
+                "type": "rate_limit_acquired",
+                "step": step,
+                "role": role,
+                "model": MODEL_NAME,
+                "waited_ms": waited_ms,
+                "timestamp": int(time.time()),
+            },
+        )
+
+
 def _run_agent(
     role: str,
     prompt: str,
@@ -198,14 +497,6 @@ def _run_agent(
     iteration: int = 0,
     reason: str = "",
 ) -> str:
-    if not os.getenv("OPENAI_API_KEY"):
-        raise RuntimeError("OPENAI_API_KEY is not set")
-    agent = Agent(
-        name=role,
-        instructions=prompt,
-        model=OPENAI_MODEL,
-        model_settings=_build_model_settings(),
-    )
     logger.info(
         "ORCH iteration=%s from=Orchestrator to=%s step=%s run_id=%s reason=%s",
         iteration,
@@ -229,17 +520,33 @@ def _run_agent(
         )
     _log_payload(f"{role} prompt", prompt)
     input_text = "Generate the requested output."
-    if OPENAI_AGENT_TRACE:
-        with trace(
-            f"TeamFlow {role}",
-            metadata={"run_id": run_id, "step": step, "agent": role},
-        ) as agent_trace:
-            logger.info("Trace started for %s: %s", role, agent_trace.trace_id)
-            result = Runner.run_sync(agent, input_text, max_turns=OPENAI_AGENT_MAX_TURNS)
-    else:
-        result = Runner.run_sync(agent, input_text, max_turns=OPENAI_AGENT_MAX_TURNS)
-    output = result.final_output if hasattr(result, "final_output") else result
-    output_text = "" if output is None else str(output)
+    key = None
+    output_text = None
+    if _cache_enabled(run_id):
+        key = cache_key(
+            role=role,
+            model=MODEL_NAME,
+            temperature=OPENAI_TEMPERATURE,
+            prompt=prompt,
+            input_text=input_text,
+        )
+        output_text = cache_get(key)
+        append_event(
+            run_id,
+            {
+                "type": "llm_cache_hit" if output_text is not None else "llm_cache_miss",
+                "step": step,
+                "role": role,
+                "key": key[:16],
+                "timestamp": int(time.time()),
+            },
+        )
+    cached = output_text is not None
+    if not cached:
+        _acquire_model_capacity(run_id, step, role, prompt, input_text)
+        output_text = _call_model(role, prompt, input_text, run_id, step, iteration)
+        if key:
+            cache_set(key, output_text)
     _log_payload(f"{role} output", output_text)
     if TEAMFLOW_SSE_AGENT_EVENTS:
         event = {
@@ -250,6 +557,8 @@ def _run_agent(
             "iteration": iteration,
             "timestamp": int(time.time()),
         }
+        if cached:
+            event["cached"] = True
         if TEAMFLOW_SSE_AGENT_PREVIEW_CHARS and output_text:
             event["preview"] = output_text.strip()[:TEAMFLOW_SSE_AGENT_PREVIEW_CHARS]
         append_event(run_id, event)
@@ -274,34 +583,6 @@ def _strip_matching_heading(content: str, title: str) -> str:
     return "\n".join(cleaned).strip()
 
 
-def _compress_markdown(md: str, *, max_bullets: int, max_chars: int) -> str:
-    if not md:
-        return ""
-    lines = md.replace("\r\n", "\n").split("\n")
-    output = []
-    bullets_seen = 0
-    in_section = False
-    for raw in lines:
-        line = raw.strip()
-        if not line:
-            continue
-        if line.startswith("#"):
-            output.append(line)
-            bullets_seen = 0
-            in_section = True
-            continue
-        if line.startswith(("-", "*")):
-            if bullets_seen < max_bullets:
-                output.append(line[:max_chars].rstrip())
-            elif bullets_seen == max_bullets:
-                output.append("- (more in full document)")
-            bullets_seen += 1
-            continue
-        if in_section and bullets_seen == 0:
-            output.append(line[:max_chars].rstrip())
-    return "\n".join(output).strip()
-
-
 def _build_short_final_doc(run_id: str, max_chars: int) -> str:
     sections = []
     raw_sections = [
@@ -318,7 +599,7 @@ def _build_short_final_doc(run_id: str, max_chars: int) -> str:
         if not content:
             return
         content = _strip_matching_heading(content, title)
-        compressed = _compress_markdown(
+        compressed = compress_markdown(
             content, max_bullets=max_bullets, max_chars=max_chars_line
         )
         if not compressed.startswith("#"):
@@ -347,403 +628,564 @@ def _build_short_final_doc(run_id: str, max_chars: int) -> str:
     return candidate[:max_chars].rstrip()
 
 
-def _run_started(run_id: str, *, start_step: str) -> None:
-    set_run_status(run_id, "running")
+class _RunArtifacts:
+    """A run's artifacts, read from storage at most once per orchestration."""
+
+    def __init__(self, run_id: str) -> None:
+        self.run_id = run_id
+        self._values: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> str:
+        with self._lock:
+            if name in self._values:
+                return self._values[name]
+        value = (get_idea(self.run_id) if name == "idea" else get_artifact(self.run_id, name)) or ""
+        with self._lock:
+            return self._values.setdefault(name, value)
+
+    def put(self, name: str, content: str) -> None:
+        set_artifact(self.run_id, name, content)
+        with self._lock:
+            self._values[name] = content
+
+
+def _pm_node(run_id: str, node: Node, inputs: Dict[str, str]) -> Dict[str, str]:
+    idea = inputs["idea"]
+    logger.info("PM received idea for run_id=%s", run_id)
+    _log_payload("Idea", idea)
+    prompt = _render_prompt("pm", run_id, node.step, idea=idea)
+    prompt = _apply_length_hint(prompt, run_id)
+    prd = _run_agent(
+        "Product Manager",
+        prompt,
+        run_id,
+        node.step,
+        iteration=node.iteration,
+        reason="Generate initial PRD from user idea",
+    )
+    return {"prd": _ensure_heading(prd, "Product Requirements (PRD)")}
+
+
+def _tech_node(run_id: str, node: Node, inputs: Dict[str, str]) -> Dict[str, str]:
+    logger.info("TECH received PRD for run_id=%s", run_id)
+    _log_payload("PRD input", inputs["prd"])
+    prompt = _render_prompt("tech", run_id, node.step, prd=inputs["prd"])
+    prompt = _apply_length_hint(prompt, run_id)
+    content = _run_agent(
+        "Tech Lead",
+        prompt,
+        run_id,
+        node.step,
+        iteration=node.iteration,
+        reason="Generate initial architecture + API from PRD",
+    )
+    arch, api = _split_sections(content, "System Architecture", "API Design")
+    if not api:
+        api = "# API Design\n\n- Model output did not include an API Design section."
+    return {"arch": arch, "api": api}
+
+
+def _qa_node(run_id: str, node: Node, inputs: Dict[str, str]) -> Dict[str, str]:
+    logger.info("QA received artifacts for run_id=%s", run_id)
+    _log_payload("Architecture input", inputs["arch"])
+    _log_payload("API input", inputs["api"])
+    prompt = _render_prompt("qa", run_id, node.step, **inputs)
+    prompt = _apply_length_hint(prompt, run_id)
+    content = _run_agent(
+        "QA Engineer",
+        prompt,
+        run_id,
+        node.step,
+        iteration=node.iteration,
+        reason="Generate initial test plan + risks from PRD + architecture + API",
+    )
+    test_plan, risks = _split_sections(content, "Test Plan", "Risk Analysis")
+    if not risks:
+        risks = "# Risk Analysis\n\n- Model output did not include a Risk Analysis section."
+    return {"test": test_plan, "risk": risks}
+
+
+def _principal_node(run_id: str, node: Node, inputs: Dict[str, str]) -> Dict[str, str]:
+    prompt = _render_prompt("principal_engineer", run_id, node.step, **inputs)
+    prompt = _apply_length_hint(prompt, run_id)
+    stack = _run_agent(
+        "Principal Engineer",
+        prompt,
+        run_id,
+        node.step,
+        iteration=node.iteration,
+        reason="Recommend tech stack and provide engineering feedback",
+    )
+    return {"stack": _ensure_heading(stack, "Tech Stack Recommendation")}
+
+
+def _revise_node(run_id: str, node: Node, inputs: Dict[str, str]) -> Dict[str, str]:
+    # Fast loop: revise arch/api using QA + PE feedback, without re-running QA/PE.
+    prompt = _render_prompt(
+        "tech_revision",
+        run_id,
+        node.step,
+        prd=inputs["prd"],
+        arch=inputs["arch"],
+        api=inputs["api"],
+        qa_feedback=_join_feedback(inputs["test"], inputs["risk"]),
+        pe_feedback=inputs["stack"],
+        iteration=str(node.iteration),
+    )
+    prompt = _apply_length_hint(prompt, run_id)
+    content = _run_agent(
+        "Tech Lead",
+        prompt,
+        run_id,
+        node.step,
+        iteration=node.iteration,
+        reason="Revise architecture + API based on QA + Principal feedback",
+    )
+    arch, api = _split_sections(content, "System Architecture", "API Design")
+    if not api:
+        api = "# API Design\n\n- Model output did not include an API Design section."
+    return {"arch": arch, "api": api}
+
+
+def _review_node(run_id: str, node: Node, inputs: Dict[str, str]) -> Dict[str, str]:
+    logger.info("REVIEW received artifacts for run_id=%s", run_id)
+    prompt = _render_prompt("reviewer", run_id, node.step, **inputs)
+    prompt = _apply_length_hint(prompt, run_id)
+    review = _run_agent(
+        "Reviewer",
+        prompt,
+        run_id,
+        node.step,
+        iteration=node.iteration,
+        reason="Cross-artifact review for consistency and gaps",
+    )
+    return {"review": _ensure_heading(review, "Review Notes")}
+
+
+_NODE_RUNNERS = {
+    "pm": _pm_node,
+    "tech": _tech_node,
+    "qa": _qa_node,
+    "principal": _principal_node,
+    "revise": _revise_node,
+    "review": _review_node,
+}
+
+PIPELINE = build_pipeline(TEAMFLOW_REVISION_CYCLES, REVIEW_ENABLED)
+
+
+def _revision_event(run_id: str, node: Node, phase: str) -> None:
+    if node.kind != "revise" or not TEAMFLOW_SSE_AGENT_EVENTS:
+        return
     append_event(
         run_id,
         {
-            "type": "run_started",
-            "start_step": start_step,
+            "type": f"revision_{phase}",
+            "step": node.step,
+            "iteration": node.iteration,
             "timestamp": int(time.time()),
         },
     )
 
 
-@celery_app.task
-def orchestrate_run(run_id: str, start_step: str = "pm") -> None:
+class _CancelReport:
+    """What one orchestration started and aborted, reported if the run is cancelled."""
+
+    def __init__(self) -> None:
+        self.started: set = set()
+        self.aborted: List[float] = []
+        self._lock = threading.Lock()
+
+    def start(self, node: Node) -> None:
+        with self._lock:
+            self.started.add(node.name)
+
+    def abort(self, reclaimed: float) -> None:
+        with self._lock:
+            self.aborted.append(reclaimed)
+
+
+def _skip_unchanged(run_id: str, node: Node) -> bool:
+    """Mark node's step completed without running it; False when the run has stopped."""
+    logger.info("Skipping %s for run_id=%s: inputs unchanged", node.name, run_id)
+    return transition_run(
+        run_id,
+        steps={node.step: "completed"},
+        events=[
+            {
+                "type": "step_skipped",
+                "step": node.step,
+                "node": node.name,
+                "reason": "inputs_unchanged",
+                "reused": list(node.outputs),
+                "timestamp": int(time.time()),
+            }
+        ],
+        require_status={"running"},
+    )
+
+
+def _run_node(
+    run_id: str,
+    node: Node,
+    artifacts: _RunArtifacts,
+    report: Optional[_CancelReport] = None,
+    checkpoints: Optional[Dict[str, Dict]] = None,
+) -> bool:
+    """Run one graph node; False when the run may no longer run (e.g. cancelled).
+
+    With checkpoints, a node whose inputs and stored outputs still match its
+    checkpoint is skipped.
     """
-    Hub-and-spoke orchestrator with a bounded revision loop.
+    if checkpoints and node.name in checkpoints:
+        inputs = {name: artifacts.get(name) for name in node.inputs}
+        outputs = {name: artifacts.get(name) for name in node.outputs}
+        if unchanged(checkpoints[node.name], inputs, outputs):
+            return _skip_unchanged(run_id, node)
+    if not _start_step(run_id, node.step):
+        return False
+    if report is not None:
+        report.start(node)
+    try:
+        _revision_event(run_id, node, "started")
+        if TEAMFLOW_AGENT_STREAMING:
+            # Drafts are appended to; drop one left behind by a worker that died.
+            clear_draft(run_id, _draft_name(node.step))
+        inputs = {name: artifacts.get(name) for name in node.inputs}
+        outputs = _NODE_RUNNERS[node.kind](run_id, node, inputs)
+        for name, content in outputs.items():
+            artifacts.put(name, content)
+        write_checkpoint(run_id, node, inputs, outputs)
+        finished = _finish_step(run_id, node.step, "completed")
+        _revision_event(run_id, node, "completed")
+        return finished
+    except _CallAborted as exc:
+        reclaimed = _call_durations.remaining(exc.role, exc.elapsed)
+        if report is not None:
+            report.abort(reclaimed)
+        append_event(
+            run_id,
+            {
+                "type": "agent_call_aborted",
+                "step": node.step,
+                "role": exc.role,
+                "elapsed_ms": int(exc.elapsed * 1000),
+                "estimated_reclaimed_ms": int(reclaimed * 1000),
+                "timestamp": int(time.time()),
+            },
+        )
+        return False
+    except Exception as exc:
+        _fail_step(run_id, node.step, exc)
+        raise
+    finally:
+        if TEAMFLOW_AGENT_STREAMING:
+            clear_draft(run_id, _draft_name(node.step))
+
+
+def _run_started(run_id: str, *, start_step: str) -> bool:
+    return transition_run(
+        run_id,
+        run_status="running",
+        events=[
+            {
+                "type": "run_started",
+                "start_step": start_step,
+                "timestamp": int(time.time()),
+            }
+        ],
+    )
+
+
+def _run_resumed(run_id: str, reused: List[str]) -> bool:
+    return transition_run(
+        run_id,
+        run_status="running",
+        events=[{"type": "run_resumed", "reused": reused, "timestamp": int(time.time())}],
+        require_status={"running"},
+    )
+
+
+def _report_cancel(run_id: str, nodes: List[Node], report: _CancelReport) -> None:
+    skipped = [node.name for node in nodes if node.name not in report.started]
+    reclaimed = sum(report.aborted) + len(skipped) * _call_durations.typical()
+    event = {
+        "type": "run_cancel_reclaimed",
+        "aborted_calls": len(report.aborted),
+        "nodes_skipped": skipped,
+        "estimated_reclaimed_ms": int(reclaimed * 1000),
+        "timestamp": int(time.time()),
+    }
+    cancelled_at_ms = get_run_meta_value(run_id, "cancelled_at_ms")
+    if cancelled_at_ms:
+        event["stop_latency_ms"] = max(0, int(time.time() * 1000) - int(cancelled_at_ms))
+    logger.info(
+        "Run %s cancelled: %s calls aborted, %s steps skipped, ~%.1fs of worker time reclaimed",
+        run_id,
+        len(report.aborted),
+        len(skipped),
+        reclaimed,
+    )
+    append_event(run_id, event)
+
+
+def _run_chain(
+    run_id: str, start_step: str, lane: str, resume: bool = False
+) -> Tuple[chain, Dict[str, str]]:
+    """orchestrate_run + finalize for run_id on lane's queue, and the meta to store first.
 
-    Steps:
-      PM -> Tech -> QA -> Principal Engineer -> (revise Tech N times) -> Reviewer
+    Task ids are assigned upfront and kept so a cancel can revoke them, and the enqueue
+    time so the orchestrator can record how long the run waited for a worker.
     """
-    steps = ["pm", "tech", "qa", "principal", "review"]
-    if start_step not in steps:
+    if start_step not in STEP_ORDER:
         raise ValueError("Unknown step")
+    queue = lane_queue(lane)
+    orchestrate = orchestrate_run.si(run_id, start_step, resume).set(
+        queue=queue, task_id=str(uuid.uuid4())
+    )
+    final = finalize.si(run_id).set(queue=queue, task_id=str(uuid.uuid4()))
+    meta = {
+        "lane": lane,
+        "enqueued_at_ms": str(int(time.time() * 1000)),
+        "task_ids": f"{orchestrate.id},{final.id}",
+    }
+    return chain(orchestrate, final), meta
+
+
+def enqueue_run(
+    run_id: str, start_step: str = "pm", *, lane: str = DEFAULT_LANE, resume: bool = False
+):
+    """Queue orchestrate_run + finalize for run_id on lane's queue."""
+    signature, meta = _run_chain(run_id, start_step, lane, resume)
+    set_run_meta(run_id, meta)
+    return signature.apply_async()
+
+
+def batch_group(
+    run_ids: List[str], lane: str = "batch"
+) -> Tuple[group, Dict[str, Dict[str, str]]]:
+    """One Celery group of run chains on lane, and the meta each run needs beforehand.
+
+    Store the meta (e.g. with init_runs) before calling apply_async() on the group.
+    """
+    chains, meta = [], {}
+    for run_id in run_ids:
+        signature, meta[run_id] = _run_chain(run_id, "pm", lane)
+        chains.append(signature)
+    return group(chains), meta
 
-    if start_step != "pm":
-        _run_started(run_id, start_step=start_step)
 
-    current_step = start_step
+def _record_queue_wait(run_id: str) -> None:
+    meta = get_run_meta(run_id)
+    enqueued_at_ms = meta.get("enqueued_at_ms")
+    if not enqueued_at_ms:
+        return
+    wait_ms = max(0, int(time.time() * 1000) - int(enqueued_at_ms))
+    set_run_meta(run_id, {"queue_wait_ms": str(wait_ms)})
+    logger.info(
+        "Run %s waited %sms on lane %s", run_id, wait_ms, meta.get("lane") or DEFAULT_LANE
+    )
+
+
+def revoke_run_tasks(run_id: str) -> List[str]:
+    """Revoke the run's queued Celery tasks; running ones stop cooperatively."""
+    ids = [i for i in (get_run_meta_value(run_id, "task_ids") or "").split(",") if i]
+    if not ids or celery_app.conf.task_always_eager:
+        return []
     try:
-        if get_run_status(run_id) == "cancelled":
+        celery_app.control.revoke(ids)
+    except Exception as exc:
+        logger.warning("Revoking tasks for run_id=%s failed: %s", run_id, exc)
+        return []
+    return ids
+
+
+class _Lease:
+    """Keeps renewing the run's lease while the orchestrator works on it.
+
+    The lease is not released on exit: orchestrate_run hands it over to finalize
+    (extended to TEAMFLOW_FINALIZE_LEASE_SECONDS), so a run waiting for its finalize
+    task is neither resumed nor dropped from count_active_runs, while one whose
+    finalize never arrives is still picked up by recover_stale_runs.
+    """
+
+    def __init__(self, run_id: str) -> None:
+        self.run_id = run_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._renew, name="teamflow-lease", daemon=True)
+
+    def _renew(self) -> None:
+        while not self._stop.wait(TEAMFLOW_RUN_LEASE_SECONDS / 3):
+            try:
+                touch_active_run(self.run_id, TEAMFLOW_RUN_LEASE_SECONDS)
+            except Exception as exc:
+                logger.warning("Lease renewal failed for run_id=%s: %s", self.run_id, exc)
+
+    def __enter__(self) -> "_Lease":
+        touch_active_run(self.run_id, TEAMFLOW_RUN_LEASE_SECONDS)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+@celery_app.task
+def orchestrate_run(run_id: str, start_step: str = "pm", resume: bool = False) -> None:
+    """
+    Hub-and-spoke orchestrator with a bounded revision loop.
+
+    Runs the PIPELINE graph: PM -> Tech -> (QA || Principal Engineer) -> (revise
+    Tech N times) -> Reviewer. With start_step, only that step and its dependents rerun.
+    With resume, every node whose checkpoint is still valid is skipped instead.
+    """
+    if start_step not in STEP_ORDER:
+        raise ValueError("Unknown step")
+    if start_step not in PIPELINE.by_name:
+        # Review regenerated while REVIEW_ENABLED is off.
+        set_step_status(run_id, "review", "skipped")
+        return
+    _record_queue_wait(run_id)
+    artifacts = _RunArtifacts(run_id)
+    if resume:
+        done = completed_nodes(PIPELINE, load_checkpoints(run_id), artifacts.get)
+        nodes = [node for node in PIPELINE.nodes if node.name not in done]
+        if not _run_resumed(run_id, [node.name for node in PIPELINE.nodes if node.name in done]):
             return
-        # 1) PM (PRD)
-        if steps.index(start_step) <= steps.index("pm"):
-            if get_run_status(run_id) == "cancelled":
-                return
-            step = "pm"
-            current_step = step
-            _start_step(run_id, step)
-            idea = get_idea(run_id) or ""
-            logger.info("PM received idea for run_id=%s", run_id)
-            _log_payload("Idea", idea)
-            template = _load_prompt("pm")
-            prompt = _render_prompt(template, idea=idea)
-            prompt = _apply_length_hint(prompt, run_id)
-            prd = _run_agent(
-                "Product Manager",
-                prompt,
-                run_id,
-                step,
-                iteration=0,
-                reason="Generate initial PRD from user idea",
-            )
-            prd = _ensure_heading(prd, "Product Requirements (PRD)")
-            set_artifact(run_id, "prd", prd)
-            _finish_step(run_id, step, "completed")
-
-        prd = get_artifact(run_id, "prd") or ""
-
-        # 2) Tech (Architecture + API)
-        if steps.index(start_step) <= steps.index("tech"):
-            if get_run_status(run_id) == "cancelled":
-                return
-            step = "tech"
-            current_step = step
-            _start_step(run_id, step)
-            logger.info("TECH received PRD for run_id=%s", run_id)
-            _log_payload("PRD input", prd)
-            template = _load_prompt("tech")
-            prompt = _render_prompt(template, prd=prd)
-            prompt = _apply_length_hint(prompt, run_id)
-            content = _run_agent(
-                "Tech Lead",
-                prompt,
-                run_id,
-                step,
-                iteration=0,
-                reason="Generate initial architecture + API from PRD",
-            )
-            arch, api = _split_sections(content, "System Architecture", "API Design")
-            if not api:
-                api = "# API Design\n\n- Model output did not include an API Design section."
-            set_artifact(run_id, "arch", arch)
-            set_artifact(run_id, "api", api)
-            _finish_step(run_id, step, "completed")
-
-        arch = get_artifact(run_id, "arch") or ""
-        api = get_artifact(run_id, "api") or ""
-
-        # 3) QA (Test + Risks)
-        if steps.index(start_step) <= steps.index("qa"):
-            if get_run_status(run_id) == "cancelled":
-                return
-            step = "qa"
-            current_step = step
-            _start_step(run_id, step)
-            logger.info("QA received artifacts for run_id=%s", run_id)
-            _log_payload("Architecture input", arch)
-            _log_payload("API input", api)
-            template = _load_prompt("qa")
-            prompt = _render_prompt(template, prd=prd, arch=arch, api=api)
-            prompt = _apply_length_hint(prompt, run_id)
-            content = _run_agent(
-                "QA Engineer",
-                prompt,
-                run_id,
-                step,
-                iteration=0,
-                reason="Generate initial test plan + risks from PRD + architecture + API",
-            )
-            test_plan, risks = _split_sections(content, "Test Plan", "Risk Analysis")
-            if not risks:
-                risks = (
-                    "# Risk Analysis\n\n- Model output did not include a Risk Analysis section."
-                )
-            set_artifact(run_id, "test", test_plan)
-            set_artifact(run_id, "risk", risks)
-            _finish_step(run_id, step, "completed")
-
-        test_plan = get_artifact(run_id, "test") or ""
-        risks = get_artifact(run_id, "risk") or ""
-
-        # 4) Principal Engineer (Stack + feedback)
-        if steps.index(start_step) <= steps.index("principal"):
-            if get_run_status(run_id) == "cancelled":
-                return
-            step = "principal"
-            current_step = step
-            _start_step(run_id, step)
-            template = _load_prompt("principal_engineer")
-            prompt = _render_prompt(
-                template, prd=prd, arch=arch, api=api, test=test_plan, risk=risks
-            )
-            prompt = _apply_length_hint(prompt, run_id)
-            stack = _run_agent(
-                "Principal Engineer",
-                prompt,
-                run_id,
-                step,
-                iteration=0,
-                reason="Recommend tech stack and provide engineering feedback",
-            )
-            stack = _ensure_heading(stack, "Tech Stack Recommendation")
-            set_artifact(run_id, "stack", stack)
-            _finish_step(run_id, step, "completed")
-
-        # If we're regenerating only the review step, skip the revision loop.
-        if start_step == "review":
-            if get_run_status(run_id) == "cancelled":
-                return
-            if not REVIEW_ENABLED:
-                set_step_status(run_id, "review", "skipped")
-                return
-            step = "review"
-            current_step = step
-            _start_step(run_id, step)
-            prd = get_artifact(run_id, "prd") or ""
-            arch = get_artifact(run_id, "arch") or ""
-            api = get_artifact(run_id, "api") or ""
-            test_plan = get_artifact(run_id, "test") or ""
-            risks = get_artifact(run_id, "risk") or ""
-            stack = get_artifact(run_id, "stack") or ""
-            template = _load_prompt("reviewer")
-            prompt = _render_prompt(
-                template,
-                prd=prd,
-                arch=arch,
-                api=api,
-                test=test_plan,
-                risk=risks,
-                stack=stack,
-            )
-            prompt = _apply_length_hint(prompt, run_id)
-            review = _run_agent(
-                "Reviewer",
-                prompt,
-                run_id,
-                step,
-                iteration=0,
-                reason="Review artifacts for consistency and gaps (regenerate review only)",
-            )
-            review = _ensure_heading(review, "Review Notes")
-            set_artifact(run_id, "review", review)
-            _finish_step(run_id, step, "completed")
+    else:
+        nodes = PIPELINE.affected(start_step)
+        if start_step != "pm" and not _run_started(run_id, start_step=start_step):
             return
-
-        # 5) Revision loop (bounded)
-        for iteration in range(1, TEAMFLOW_REVISION_CYCLES + 1):
-            if get_run_status(run_id) == "cancelled":
-                return
-            if TEAMFLOW_SSE_AGENT_EVENTS:
-                append_event(
-                    run_id,
-                    {
-                        "type": "revision_started",
-                        "step": "tech",
-                        "iteration": iteration,
-                        "timestamp": int(time.time()),
-                    },
-                )
-            prd = get_artifact(run_id, "prd") or ""
-            arch = get_artifact(run_id, "arch") or ""
-            api = get_artifact(run_id, "api") or ""
-            test_plan = get_artifact(run_id, "test") or ""
-            risks = get_artifact(run_id, "risk") or ""
-            stack = get_artifact(run_id, "stack") or ""
-
-            qa_feedback = _join_feedback(test_plan, risks)
-            pe_feedback = stack
-
-            # Tech revision (fast loop): revise arch/api using QA+PE feedback, without re-running QA/PE.
-            step = "tech"
-            current_step = step
-            _start_step(run_id, step)
-            template = _load_prompt("tech_revision")
-            prompt = _render_prompt(
-                template,
-                prd=prd,
-                arch=arch,
-                api=api,
-                qa_feedback=qa_feedback,
-                pe_feedback=pe_feedback,
-                iteration=str(iteration),
-            )
-            prompt = _apply_length_hint(prompt, run_id)
-            content = _run_agent(
-                "Tech Lead",
-                prompt,
-                run_id,
-                step,
-                iteration=iteration,
-                reason="Revise architecture + API based on QA + Principal feedback",
-            )
-            new_arch, new_api = _split_sections(
-                content, "System Architecture", "API Design"
-            )
-            if not new_api:
-                new_api = "# API Design\n\n- Model output did not include an API Design section."
-            set_artifact(run_id, "arch", new_arch)
-            set_artifact(run_id, "api", new_api)
-            _finish_step(run_id, step, "completed")
-            if TEAMFLOW_SSE_AGENT_EVENTS:
-                append_event(
-                    run_id,
-                    {
-                        "type": "revision_completed",
-                        "step": "tech",
-                        "iteration": iteration,
-                        "timestamp": int(time.time()),
-                    },
-                )
-
-        # 6) Reviewer (final)
-        if REVIEW_ENABLED:
-            if get_run_status(run_id) == "cancelled":
-                return
-            step = "review"
-            current_step = step
-            _start_step(run_id, step)
-            prd = get_artifact(run_id, "prd") or ""
-            arch = get_artifact(run_id, "arch") or ""
-            api = get_artifact(run_id, "api") or ""
-            test_plan = get_artifact(run_id, "test") or ""
-            risks = get_artifact(run_id, "risk") or ""
-            stack = get_artifact(run_id, "stack") or ""
-            template = _load_prompt("reviewer")
-            prompt = _render_prompt(
-                template,
-                prd=prd,
-                arch=arch,
-                api=api,
-                test=test_plan,
-                risk=risks,
-                stack=stack,
+    # The regenerated step's own checkpoint was cleared, so it always reruns.
+    checkpoints = (
+        load_checkpoints(run_id) if TEAMFLOW_INCREMENTAL_REGENERATE and not resume else None
+    )
+    report = _CancelReport()
+    with _Lease(run_id):
+        try:
+            finished = PIPELINE.run_nodes(
+                nodes, lambda node: _run_node(run_id, node, artifacts, report, checkpoints)
             )
-            prompt = _apply_length_hint(prompt, run_id)
-            review = _run_agent(
-                "Reviewer",
-                prompt,
+        except Exception:
+            release_active_run(run_id)
+            raise
+    if not finished:
+        release_active_run(run_id)
+        if is_run_cancelled(run_id):
+            _report_cancel(run_id, nodes, report)
+        return
+    touch_active_run(run_id, TEAMFLOW_FINALIZE_LEASE_SECONDS)
+    if not REVIEW_ENABLED:
+        set_step_status(run_id, "review", "skipped")
+
+
+@celery_app.task
+def recover_stale_runs() -> List[str]:
+    """Resume runs left in running by a worker that stopped renewing its lease."""
+    resumed = []
+    for run_id in claim_stale_runs():
+        if get_run_status(run_id) != "running":
+            continue
+        logger.warning("Resuming run_id=%s after its lease expired", run_id)
+        append_event(run_id, {"type": "run_recovering", "timestamp": int(time.time())})
+        # Lease the run again right away so the next sweep does not claim it twice.
+        touch_active_run(run_id, TEAMFLOW_RUN_LEASE_SECONDS)
+        lane = get_run_meta_value(run_id, "lane") or DEFAULT_LANE
+        enqueue_run(run_id, lane=lane, resume=True)
+        resumed.append(run_id)
+    return resumed
+
+
+def park_run(run_id: str, start_step: str, *, lane: str) -> Dict[str, int]:
+    """Put a run refused by admission control on the waiting list.
+
+    Returns its position and estimated start (epoch seconds).
+    """
+    position = push_waiting_run(run_id)
+    wait_s = admission.estimate_wait_seconds(position, count_active_runs())
+    estimated_start_at = int(time.time()) + wait_s
+    set_run_meta(
+        run_id,
+        {"lane": lane, "start_step": start_step, "estimated_start_at": str(estimated_start_at)},
+    )
+    transition_run(
+        run_id,
+        run_status="waiting",
+        events=[
+            {
+                "type": "run_waiting",
+                "position": position,
+                "estimated_start_at": estimated_start_at,
+                "timestamp": int(time.time()),
+            }
+        ],
+    )
+    return {"position": position, "estimated_start_at": estimated_start_at}
+
+
+@celery_app.task
+def admit_waiting_runs() -> List[str]:
+    """Enqueue waiting runs, oldest first, as far as admission limits allow."""
+    if not admission.ADMISSION_ENABLED:
+        return []
+    admitted = []
+    while True:
+        slots = admission.free_slots(admission.lane_depths(), count_active_runs())
+        run_ids = pop_waiting_runs(min(slots, 100)) if slots else []
+        if not run_ids:
+            return admitted
+        for run_id in run_ids:
+            meta = get_run_meta(run_id)
+            # Cancelled (or expired) while it waited.
+            if not transition_run(
                 run_id,
-                step,
-                iteration=TEAMFLOW_REVISION_CYCLES,
-                reason="Final cross-artifact review after revisions",
+                run_status="queued",
+                events=[{"type": "run_admitted", "timestamp": int(time.time())}],
+                require_status={"waiting"},
+            ):
+                continue
+            enqueue_run(
+                run_id, meta.get("start_step") or "pm", lane=meta.get("lane") or DEFAULT_LANE
             )
-            review = _ensure_heading(review, "Review Notes")
-            set_artifact(run_id, "review", review)
-            _finish_step(run_id, step, "completed")
-        else:
-            set_step_status(run_id, "review", "skipped")
+            admitted.append(run_id)
+
 
+def _admit_waiting_runs() -> None:
+    try:
+        admit_waiting_runs()
     except Exception as exc:
-        # Best effort: mark the current step failed.
-        _fail_step(run_id, current_step, exc)
-        raise
+        logger.warning("Admitting waiting runs failed: %s", exc)
+
+
+# Single-step tasks from before orchestrate_run; review runs here regardless of
+# REVIEW_ENABLED, as it always did.
+_SINGLE_STEP_NODES = build_pipeline(0, True).by_name
+
+
+def _run_single_node(run_id: str, name: str) -> None:
+    _run_node(run_id, _SINGLE_STEP_NODES[name], _RunArtifacts(run_id))
 
 
 @celery_app.task
 def pm_step(run_id: str) -> None:
-    step = "pm"
-    _start_step(run_id, step)
-    try:
-        idea = get_idea(run_id) or ""
-        logger.info("PM received idea for run_id=%s", run_id)
-        _log_payload("Idea", idea)
-        template = _load_prompt("pm")
-        prompt = _render_prompt(template, idea=idea)
-        prompt = _apply_length_hint(prompt, run_id)
-        content = _run_agent("Product Manager", prompt, run_id, step)
-        content = _ensure_heading(content, "Product Requirements (PRD)")
-        set_artifact(run_id, "prd", content)
-        logger.info("PM -> TECH handoff prepared for run_id=%s", run_id)
-        _finish_step(run_id, step, "completed")
-    except Exception as exc:
-        _fail_step(run_id, step, exc)
-        raise
+    _run_single_node(run_id, "pm")
 
 
 @celery_app.task
 def tech_step(run_id: str) -> None:
-    step = "tech"
-    _start_step(run_id, step)
-    try:
-        prd = get_artifact(run_id, "prd") or ""
-        logger.info("TECH received PRD for run_id=%s", run_id)
-        _log_payload("PRD input", prd)
-        template = _load_prompt("tech")
-        prompt = _render_prompt(template, prd=prd)
-        prompt = _apply_length_hint(prompt, run_id)
-        content = _run_agent("Tech Lead", prompt, run_id, step)
-        arch, api = _split_sections(content, "System Architecture", "API Design")
-        if not api:
-            api = "# API Design\n\n- Model output did not include an API Design section."
-        set_artifact(run_id, "arch", arch)
-        set_artifact(run_id, "api", api)
-        logger.info("TECH -> QA handoff prepared for run_id=%s", run_id)
-        _finish_step(run_id, step, "completed")
-    except Exception as exc:
-        _fail_step(run_id, step, exc)
-        raise
+    _run_single_node(run_id, "tech")
 
 
 @celery_app.task
 def qa_step(run_id: str) -> None:
-    step = "qa"
-    _start_step(run_id, step)
-    try:
-        arch = get_artifact(run_id, "arch") or ""
-        prd = get_artifact(run_id, "prd") or ""
-        api = get_artifact(run_id, "api") or ""
-        logger.info("QA received artifacts for run_id=%s", run_id)
-        _log_payload("Architecture input", arch)
-        _log_payload("API input", api)
-        template = _load_prompt("qa")
-        prompt = _render_prompt(template, prd=prd, arch=arch, api=api)
-        prompt = _apply_length_hint(prompt, run_id)
-        content = _run_agent("QA Engineer", prompt, run_id, step)
-        test_plan, risks = _split_sections(content, "Test Plan", "Risk Analysis")
-        if not risks:
-            risks = "# Risk Analysis\n\n- Model output did not include a Risk Analysis section."
-        set_artifact(run_id, "test", test_plan)
-        set_artifact(run_id, "risk", risks)
-        logger.info("QA -> REVIEW handoff prepared for run_id=%s", run_id)
-        _finish_step(run_id, step, "completed")
-    except Exception as exc:
-        _fail_step(run_id, step, exc)
-        raise
+    _run_single_node(run_id, "qa")
 
 
 @celery_app.task
 def review_step(run_id: str) -> None:
-    step = "review"
-    _start_step(run_id, step)
-    try:
-        prd = get_artifact(run_id, "prd") or ""
-        arch = get_artifact(run_id, "arch") or ""
-        api = get_artifact(run_id, "api") or ""
-        test = get_artifact(run_id, "test") or ""
-        risk = get_artifact(run_id, "risk") or ""
-        stack = get_artifact(run_id, "stack") or ""
-        logger.info("REVIEW received artifacts for run_id=%s", run_id)
-        _log_payload("PRD input", prd)
-        _log_payload("Architecture input", arch)
-        _log_payload("API input", api)
-        _log_payload("Test plan input", test)
-        _log_payload("Risk input", risk)
-        _log_payload("Stack input", stack)
-        template = _load_prompt("reviewer")
-        prompt = _render_prompt(
-            template, prd=prd, arch=arch, api=api, test=test, risk=risk, stack=stack
-        )
-        prompt = _apply_length_hint(prompt, run_id)
-        review = _run_agent("Reviewer", prompt, run_id, step)
-        review = _ensure_heading(review, "Review Notes")
-        set_artifact(run_id, "review", review)
-        _finish_step(run_id, step, "completed")
-    except Exception as exc:
-        _fail_step(run_id, step, exc)
-        raise
+    _run_single_node(run_id, "review")
 
 
 @celery_app.task
@@ -751,6 +1193,8 @@ def finalize(run_id: str) -> None:
     step = "finalize"
     try:
         if get_run_status(run_id) == "cancelled":
+            release_active_run(run_id)
+            _admit_waiting_runs()
             return
         parts = []
         for name in ("prd", "arch", "api", "test", "risk", "stack", "review"):
@@ -762,8 +1206,15 @@ def finalize(run_id: str) -> None:
         if max_chars and final_doc and len(final_doc) > max_chars:
             final_doc = _build_short_final_doc(run_id, max_chars)
         set_artifact(run_id, "final", final_doc)
-        set_run_status(run_id, "completed")
-        append_event(run_id, {"type": "run_completed", "timestamp": int(time.time())})
+        transition_run(
+            run_id,
+            run_status="completed",
+            events=[{"type": "run_completed", "timestamp": int(time.time())}],
+        )
+        release_active_run(run_id)
+        _admit_waiting_runs()
     except Exception as exc:
         _fail_step(run_id, step, exc)
+        release_active_run(run_id)
+        _admit_waiting_runs()
         raise
@@ -0,0 +1,101 @@
+"""Prompt templates from prompts/*.md, parsed once and rendered in a single pass.
+
+A template is split into literal chunks and $name placeholders when it is loaded, so
+rendering is one join over the pieces, linear in the output, and substituted values are
+never rescanned for placeholders. Placeholders are checked against the variables each
+caller supplies when the templates are loaded, not on every render.
+With TEAMFLOW_PROMPT_HOT_RELOAD a template is re-read when its file's mtime changes.
+"""
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+PROMPT_DIR = Path(__file__).resolve().parent / "prompts"
+TEAMFLOW_PROMPT_HOT_RELOAD = os.getenv("TEAMFLOW_PROMPT_HOT_RELOAD", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+
+_PLACEHOLDER_RE = re.compile(r"\$([A-Za-z_]+)")
+
+logger = logging.getLogger("teamflow.templates")
+
+
+class Template:
+    def __init__(self, name: str, source: str, mtime: float = 0.0) -> None:
+        self.name = name
+        self.source = source
+        self.mtime = mtime
+        # split() alternates literal text and placeholder names: [lit, name, lit, ...].
+        parts = _PLACEHOLDER_RE.split(source)
+        self._literals: List[str] = parts[0::2]
+        self._fields: List[str] = parts[1::2]
+        self.placeholders: FrozenSet[str] = frozenset(self._fields)
+
+    def render(self, **values: str) -> str:
+        # Placeholders with no value stay as written, as "$name".
+        out = [self._literals[0]]
+        for field, literal in zip(self._fields, self._literals[1:]):
+            value = values.get(field)
+            out.append(f"${field}" if value is None else value)
+            out.append(literal)
+        return "".join(out)
+
+
+class TemplateRegistry:
+    def __init__(self, directory: Path = PROMPT_DIR, hot_reload: bool = TEAMFLOW_PROMPT_HOT_RELOAD) -> None:
+        self._dir = directory
+        self._hot_reload = hot_reload
+        self._templates: Dict[str, Template] = {}
+        self._variables: Dict[str, FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> Path:
+        return self._dir / f"{name}.md"
+
+    def _load(self, name: str) -> Template:
+        path = self._path(name)
+        mtime = path.stat().st_mtime
+        template = Template(name, path.read_text(encoding="utf-8"), mtime)
+        self._validate(template)
+        return template
+
+    def _validate(self, template: Template) -> None:
+        expected = self._variables.get(template.name)
+        if expected is None:
+            return
+        unresolved = sorted(template.placeholders - expected)
+        if unresolved:
+            logger.warning(
+                "Prompt %s has placeholders no caller fills: %s",
+                template.name,
+                ["$" + name for name in unresolved],
+            )
+
+    def preload(self, variables: Optional[Dict[str, Iterable[str]]] = None) -> None:
+        """Load every template in the directory, checking those named in variables
+        against the values their caller passes."""
+        with self._lock:
+            for name, names in (variables or {}).items():
+                self._variables[name] = frozenset(names)
+            for path in sorted(self._dir.glob("*.md")):
+                self._templates[path.stem] = self._load(path.stem)
+
+    def get(self, name: str) -> Template:
+        template = self._templates.get(name)
+        if template is not None and not self._hot_reload:
+            return template
+        with self._lock:
+            template = self._templates.get(name)
+            if template is None or self._path(name).stat().st_mtime != template.mtime:
+                if template is not None:
+                    logger.info("Reloading prompt %s", name)
+                template = self._templates[name] = self._load(name)
+            return template
+
+
+registry = TemplateRegistry()
@@ -0,0 +1,83 @@
+"""Fixtures: every test runs against a fresh in-memory backend or a fakeredis server.
+
+The Redis fixtures need fakeredis (and lupa for the Lua scripts); they skip without it.
+"""
+import os
+import types
+
+os.environ.setdefault("TEAMFLOW_STORAGE_BACKEND", "memory")
+os.environ.setdefault("CELERY_TASK_ALWAYS_EAGER", "true")
+
+import pytest  # noqa: E402
+
+from teamflow_fastapi import storage, storage_redis  # noqa: E402
+from teamflow_fastapi.storage_memory import MemoryBackend  # noqa: E402
+from teamflow_fastapi.storage_sqlite import SQLiteBackend  # noqa: E402
+
+
+class Clock:
+    """A frozen clock that moves only on advance() (or a patched module's sleep)."""
+
+    def __init__(self, monkeypatch) -> None:
+        self.now = 1_700_000_000.0
+        self._monkeypatch = monkeypatch
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+    def patch(self, *modules) -> "Clock":
+        """Replace each module's ``time`` with this clock."""
+        fake = types.SimpleNamespace(time=self.time, monotonic=self.time, sleep=self.advance)
+        for module in modules:
+            self._monkeypatch.setattr(module, "time", fake)
+        return self
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return Clock(monkeypatch)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point the shared Redis clients at one fakeredis server; returns the text client."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    clients = {
+        True: fakeredis.FakeRedis(server=server, decode_responses=True),
+        False: fakeredis.FakeRedis(server=server),
+    }
+    monkeypatch.setattr(storage_redis, "_clients", clients)
+    monkeypatch.setattr(storage_redis, "_pool_pid", os.getpid())
+    monkeypatch.setattr(storage_redis, "_transition_script", None)
+    return clients[True]
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    backend = MemoryBackend()
+    monkeypatch.setattr(storage, "_backend", backend)
+    return backend
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "teamflow.sqlite3"))
+    monkeypatch.setattr(storage, "_backend", backend)
+    return backend
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis-split", "redis-compact"])
+def backend(request, monkeypatch):
+    """The process-wide storage backend, once per backend and Redis layout."""
+    if request.param in {"memory", "sqlite"}:
+        return request.getfixturevalue(f"{request.param}_backend")
+    request.getfixturevalue("fake_redis")
+    monkeypatch.setattr(storage_redis, "COMPACT_LAYOUT", request.param == "redis-compact")
+    backend = storage_redis.RedisBackend()
+    monkeypatch.setattr(storage, "_backend", backend)
+    return backend
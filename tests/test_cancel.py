@@ -0,0 +1,69 @@
+import asyncio
+import time
+import types
+
+import pytest
+
+from teamflow_fastapi import storage, tasks
+
+PRD = "# Product Requirements (PRD)"
+
+
+@pytest.fixture
+def runner(memory_backend, monkeypatch):
+    """A Runner whose calls take latency seconds; returns the names of the calls made."""
+    calls = []
+
+    def use(latency: float):
+        def run_sync(agent, input_text, **kwargs):
+            calls.append("run_sync")
+            time.sleep(latency)
+            return PRD
+
+        async def run(agent, input_text, **kwargs):
+            calls.append("run")
+            await asyncio.sleep(latency)
+            return PRD
+
+        monkeypatch.setattr(tasks, "Runner", types.SimpleNamespace(run_sync=run_sync, run=run))
+        return calls
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(tasks, "OPENAI_AGENT_TRACE", False)
+    storage.init_run("r1", "A task tracker")
+    storage.transition_run("r1", run_status="running")
+    return use
+
+
+def _call():
+    return tasks._call_model("Product Manager", "Write a PRD", "Go.", "r1", "pm", 0)
+
+
+def test_inflight_cancel_is_off_by_default():
+    assert tasks.TEAMFLOW_CANCEL_INFLIGHT is False
+
+
+def test_calls_stay_synchronous_without_inflight_cancel(runner, monkeypatch):
+    calls = runner(0)
+    monkeypatch.setattr(tasks, "TEAMFLOW_CANCEL_INFLIGHT", False)
+
+    def no_agent_loop(*args, **kwargs):
+        raise AssertionError("agent loop used")
+
+    monkeypatch.setattr(tasks, "run_on_agent_loop", no_agent_loop)
+
+    assert _call() == PRD
+    assert calls == ["run_sync"]
+
+
+def test_inflight_cancel_aborts_the_call(runner, monkeypatch):
+    calls = runner(5)
+    monkeypatch.setattr(tasks, "TEAMFLOW_CANCEL_INFLIGHT", True)
+    monkeypatch.setattr(tasks, "TEAMFLOW_CANCEL_POLL_MS", 50)
+    storage.transition_run("r1", run_status="cancelled")
+
+    started = time.monotonic()
+    with pytest.raises(tasks._CallAborted):
+        _call()
+    assert time.monotonic() - started < 2
+    assert calls == ["run"]
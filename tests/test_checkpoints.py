@@ -0,0 +1,117 @@
+import pytest
+
+from teamflow_fastapi import storage
+from teamflow_fastapi.checkpoints import completed_nodes, load_checkpoints, write_checkpoint
+from teamflow_fastapi.pipeline import build_pipeline
+
+PIPELINE = build_pipeline(1, True)
+ALL_NODES = {node.name for node in PIPELINE.nodes}
+
+
+def _read(run_id: str):
+    return lambda name: (
+        storage.get_idea(run_id) if name == "idea" else storage.get_artifact(run_id, name)
+    ) or ""
+
+
+@pytest.fixture
+def finished_run(memory_backend):
+    """A run whose every node finished and checkpointed, as orchestrate_run leaves it.
+
+    Returns the outputs each node wrote.
+    """
+    storage.init_run("r1", "A task tracker")
+    read = _read("r1")
+    written = {}
+    for node in PIPELINE.nodes:
+        inputs = {name: read(name) for name in node.inputs}
+        outputs = {name: f"# {name} by {node.name}" for name in node.outputs}
+        for name, content in outputs.items():
+            storage.set_artifact("r1", name, content)
+        write_checkpoint("r1", node, inputs, outputs)
+        written[node.name] = outputs
+    return written
+
+
+def test_all_nodes_done_when_storage_matches(finished_run):
+    assert completed_nodes(PIPELINE, load_checkpoints("r1"), _read("r1")) == ALL_NODES
+
+
+def test_nothing_done_without_checkpoints(memory_backend):
+    storage.init_run("r1", "A task tracker")
+
+    assert completed_nodes(PIPELINE, {}, _read("r1")) == set()
+
+
+def test_output_changed_after_checkpoint_reruns_its_writer(finished_run):
+    # The artifact no longer matches what review checkpointed (e.g. a crash between
+    # a rewrite and its checkpoint).
+    storage.set_artifact("r1", "review", "# review edited elsewhere")
+
+    done = completed_nodes(PIPELINE, load_checkpoints("r1"), _read("r1"))
+
+    assert done == ALL_NODES - {"review"}
+
+
+def test_rerun_of_a_reviser_reruns_the_writer_it_overwrote(finished_run):
+    storage.set_artifact("r1", "stack", "# stack edited elsewhere")
+
+    done = completed_nodes(PIPELINE, load_checkpoints("r1"), _read("r1"))
+
+    # principal reruns, so revise_1 does; storage holds revise_1's arch/api rather
+    # than the tech output revise_1 has to start from, so tech reruns as well.
+    assert done == {"pm"}
+
+
+def test_storage_behind_checkpoint_falls_back_to_earlier_writer(finished_run):
+    # revise_1 checkpointed, but storage still holds the architecture tech wrote.
+    storage.set_artifact("r1", "arch", finished_run["tech"]["arch"])
+    storage.set_artifact("r1", "api", finished_run["tech"]["api"])
+
+    done = completed_nodes(PIPELINE, load_checkpoints("r1"), _read("r1"))
+
+    assert done == {"pm", "tech", "qa", "principal"}
+
+
+def test_missing_checkpoint_reruns_node_and_dependents(finished_run):
+    storage.set_run_meta("r1", {"ckpt:review": ""})
+
+    done = completed_nodes(PIPELINE, load_checkpoints("r1"), _read("r1"))
+
+    assert done == ALL_NODES - {"review"}
+
+
+def test_missing_checkpoint_before_revision(memory_backend):
+    # Crash after principal finished but before qa did: nothing has overwritten
+    # arch/api yet, so only qa and what follows it rerun.
+    storage.init_run("r1", "A task tracker")
+    read = _read("r1")
+    for node in PIPELINE.nodes[:4]:
+        inputs = {name: read(name) for name in node.inputs}
+        outputs = {name: f"# {name} by {node.name}" for name in node.outputs}
+        for name, content in outputs.items():
+            storage.set_artifact("r1", name, content)
+        if node.name != "qa":
+            write_checkpoint("r1", node, inputs, outputs)
+
+    done = completed_nodes(PIPELINE, load_checkpoints("r1"), read)
+
+    assert done == {"pm", "tech", "principal"}
+
+
+def test_changed_idea_reruns_everything(finished_run):
+    read = _read("r1")
+
+    def read_with_new_idea(name):
+        return "A different idea" if name == "idea" else read(name)
+
+    assert completed_nodes(PIPELINE, load_checkpoints("r1"), read_with_new_idea) == set()
+
+
+def test_corrupt_checkpoint_is_ignored(finished_run):
+    storage.set_run_meta("r1", {"ckpt:review": "{not json"})
+
+    checkpoints = load_checkpoints("r1")
+
+    assert "review" not in checkpoints
+    assert completed_nodes(PIPELINE, checkpoints, _read("r1")) == ALL_NODES - {"review"}
@@ -0,0 +1,79 @@
+import pytest
+
+from teamflow_fastapi import storage, storage_redis, tasks
+from teamflow_fastapi.pipeline import build_pipeline
+
+NODE = build_pipeline(0, False).by_name["pm"]
+
+
+def test_drafts_append_and_clear(backend):
+    storage.init_run("r1", "An idea")
+
+    for delta in ("# Product", " Requirements\n", "- ünïcode bullet"):
+        storage.append_draft("r1", "draft_pm", delta)
+
+    assert storage.get_draft("r1", "draft_pm") == "# Product Requirements\n- ünïcode bullet"
+    storage.clear_draft("r1", "draft_pm")
+    assert storage.get_draft("r1", "draft_pm") is None
+
+
+def test_redis_drafts_skip_compression_and_metrics(fake_redis, monkeypatch):
+    monkeypatch.setattr(storage_redis, "COMPACT_LAYOUT", True)
+    backend = storage_redis.RedisBackend()
+    backend.init_run("r1", "An idea")
+    chunk = "- A bullet that compresses very well.\n" * 100
+
+    for _ in range(10):
+        backend.append_draft("r1", "draft_pm", chunk)
+
+    assert backend.get_metrics().get("artifact_bytes_raw", 0) == 0
+    stored = fake_redis.get(storage_redis._draft_key("r1", "draft_pm"))
+    assert stored == chunk * 10  # raw text, no codec header
+    assert fake_redis.ttl(storage_redis._draft_key("r1", "draft_pm")) > 0
+
+
+@pytest.fixture
+def streaming_run(memory_backend, monkeypatch):
+    monkeypatch.setattr(tasks, "TEAMFLOW_AGENT_STREAMING", True)
+    storage.init_run("r1", "An idea")
+    storage.transition_run("r1", run_status="running")
+
+
+def _node_runner(monkeypatch, error):
+    def run(run_id, node, inputs):
+        storage.append_draft(run_id, "draft_pm", "# Half a PRD")
+        raise error
+
+    monkeypatch.setitem(tasks._NODE_RUNNERS, "pm", run)
+
+
+def test_draft_cleared_when_step_fails(streaming_run, monkeypatch):
+    _node_runner(monkeypatch, RuntimeError("model error"))
+
+    with pytest.raises(RuntimeError):
+        tasks._run_node("r1", NODE, tasks._RunArtifacts("r1"))
+
+    assert storage.get_run_status("r1") == "failed"
+    assert storage.get_draft("r1", "draft_pm") is None
+
+
+def test_draft_cleared_when_call_aborted(streaming_run, monkeypatch):
+    _node_runner(monkeypatch, tasks._CallAborted("Product Manager", 1.5))
+
+    assert tasks._run_node("r1", NODE, tasks._RunArtifacts("r1")) is False
+    assert storage.get_draft("r1", "draft_pm") is None
+
+
+def test_leftover_draft_dropped_before_rerun(streaming_run, monkeypatch):
+    storage.append_draft("r1", "draft_pm", "# From a worker that died")
+    seen = []
+
+    def run(run_id, node, inputs):
+        seen.append(storage.get_draft(run_id, "draft_pm"))
+        return {"prd": "# Product Requirements (PRD)"}
+
+    monkeypatch.setitem(tasks._NODE_RUNNERS, "pm", run)
+
+    assert tasks._run_node("r1", NODE, tasks._RunArtifacts("r1"))
+    assert seen == [None]
+    assert storage.get_draft("r1", "draft_pm") is None
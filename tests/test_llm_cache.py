@@ -0,0 +1,26 @@
+from teamflow_fastapi.llm_cache import DiskCache
+
+
+def test_disk_cache_scans_only_when_over_the_limit(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_entries=10, ttl_seconds=60)
+    scans = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda: scans.append(1) or evict())
+
+    for n in range(30):
+        cache.set(f"{n:02d}" + "0" * 62, f"value {n}")
+
+    # One scan to learn the count, then one per 10% of the limit written past it.
+    assert len(scans) < 30 // 2
+    assert len(list(tmp_path.glob("*/*.json"))) <= 10
+    assert cache.get("29" + "0" * 62) == "value 29"
+    assert cache.get("00" + "0" * 62) is None
+
+
+def test_disk_cache_overwrite_does_not_grow_the_count(tmp_path):
+    cache = DiskCache(str(tmp_path), max_entries=10, ttl_seconds=60)
+
+    for _ in range(20):
+        cache.set("ab" + "0" * 62, "same key")
+
+    assert cache._count == 1
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Runs in a fresh interpreter: the backend and trace flags are read at import time.
+_SCRIPT = """
+import types
+
+from teamflow_fastapi import tasks
+
+assert tasks._stub_model is not None and tasks.OPENAI_AGENT_TRACE
+
+
+def no_runner(*args, **kwargs):
+    raise AssertionError("Runner used")
+
+
+tasks.Runner = types.SimpleNamespace(run_sync=no_runner, run=no_runner)
+print(tasks._call_model("Product Manager", "Write a PRD", "Go.", "r1", "pm", 0))
+"""
+
+
+def test_stub_backend_is_used_with_tracing_on():
+    env = {key: value for key, value in os.environ.items() if key != "OPENAI_API_KEY"}
+    env.update(
+        TEAMFLOW_MODEL_BACKEND="stub",
+        TEAMFLOW_STUB_LATENCY_MS="fixed:0",
+        OPENAI_AGENTS_TRACE="true",
+        TEAMFLOW_STORAGE_BACKEND="memory",
+    )
+
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith("# Product Requirements (PRD)")
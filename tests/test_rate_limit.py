@@ -0,0 +1,144 @@
+import pytest
+
+from teamflow_fastapi import rate_limit
+from teamflow_fastapi.rate_limit import (
+    RATE_LIMIT_POLL_MS,
+    RATE_LIMIT_STALE_MS,
+    MemoryLimiter,
+    RateLimitWaitCancelled,
+    RedisLimiter,
+)
+
+MODEL = "test-model"
+# One request per minute and no token budget: each grant empties the bucket.
+RPM, TPM = 1, 0
+
+
+@pytest.fixture
+def clock(clock):
+    return clock.patch(rate_limit)
+
+
+def _try(limiter, ticket: str):
+    return limiter.try_acquire(MODEL, ticket, RPM, TPM, 100)
+
+
+def test_memory_limiter_serves_queue_in_arrival_order(clock):
+    limiter = MemoryLimiter()
+    assert _try(limiter, "a") == (True, 0.0)
+
+    assert _try(limiter, "b") == (False, 60000.0)  # head of the queue: refill wait
+    clock.advance(0.05)
+    # Behind b: b's refill plus its own, less what refilled meanwhile.
+    assert _try(limiter, "c") == (False, 120000.0 - 50)
+
+    # The bucket refills while both keep polling; c still may not jump ahead of b.
+    for _ in range(60):
+        clock.advance(1)
+        _try(limiter, "c")
+        granted, _ = _try(limiter, "b")
+        if granted:
+            break
+    assert granted
+    assert not _try(limiter, "c")[0]
+    clock.advance(60)
+    assert _try(limiter, "c") == (True, 0.0)
+
+
+def test_memory_limiter_drops_stale_head(clock):
+    limiter = MemoryLimiter()
+    _try(limiter, "a")
+    _try(limiter, "b")
+    clock.advance(59)
+    assert not _try(limiter, "b")[0]  # last poll of b, then its worker dies
+    clock.advance(1)
+
+    assert _try(limiter, "c") == (False, 60000.0)  # b was seen just now; one call ahead
+    clock.advance(RATE_LIMIT_STALE_MS / 1000)
+    assert _try(limiter, "c") == (True, 0.0)
+
+
+def test_memory_limiter_leave_frees_the_head(clock):
+    limiter = MemoryLimiter()
+    _try(limiter, "a")
+    _try(limiter, "b")
+    clock.advance(60)
+    limiter.leave(MODEL, "b")
+
+    assert _try(limiter, "c") == (True, 0.0)
+
+
+@pytest.fixture
+def redis_limiter(fake_redis):
+    return RedisLimiter()
+
+
+def _refill(fake_redis) -> None:
+    bucket_key, _, _ = RedisLimiter._keys(MODEL)
+    fake_redis.hset(bucket_key, "req", "1")
+
+
+def test_redis_limiter_serves_queue_in_arrival_order(fake_redis, redis_limiter):
+    assert _try(redis_limiter, "a") == (True, 0.0)
+    granted, b_wait = _try(redis_limiter, "b")
+    assert not granted and b_wait > RATE_LIMIT_POLL_MS
+    granted, c_wait = _try(redis_limiter, "c")
+    assert not granted and c_wait > b_wait + 59000  # b's refill, then its own
+
+    _refill(fake_redis)
+    assert _try(redis_limiter, "c") == (False, 60000.0)  # still behind b
+    assert _try(redis_limiter, "b") == (True, 0.0)
+
+    granted, wait = _try(redis_limiter, "c")  # now the head, waiting on the refill
+    assert not granted and wait > RATE_LIMIT_POLL_MS
+    _refill(fake_redis)
+    assert _try(redis_limiter, "c") == (True, 0.0)
+
+
+def test_redis_limiter_drops_stale_head(fake_redis, redis_limiter):
+    _, queue_key, seen_key = RedisLimiter._keys(MODEL)
+    _try(redis_limiter, "a")
+    _try(redis_limiter, "b")
+    _refill(fake_redis)
+    assert _try(redis_limiter, "c") == (False, 60000.0)
+
+    fake_redis.hset(seen_key, "b", 0)  # b last polled long ago
+    assert _try(redis_limiter, "c") == (True, 0.0)
+    assert fake_redis.zrange(queue_key, 0, -1) == []
+    assert fake_redis.hgetall(seen_key) == {}
+
+
+def test_redis_limiter_leave_frees_the_head(fake_redis, redis_limiter):
+    _try(redis_limiter, "a")
+    _try(redis_limiter, "b")
+    _refill(fake_redis)
+    redis_limiter.leave(MODEL, "b")
+
+    assert _try(redis_limiter, "c") == (True, 0.0)
+
+
+def test_queued_wait_is_at_least_one_poll(clock):
+    limiter = MemoryLimiter()
+    rpm = 60000  # one request per ms
+    limiter._buckets[MODEL] = [0.5, 0.0, clock.now * 1000]
+    assert limiter.try_acquire(MODEL, "b", rpm, 0, 100) == (False, 0.5)
+
+    assert limiter.try_acquire(MODEL, "c", rpm, 0, 100) == (False, RATE_LIMIT_POLL_MS)
+
+
+def test_acquire_leaves_the_queue_when_cancelled(clock, monkeypatch):
+    limiter = MemoryLimiter()
+    monkeypatch.setattr(rate_limit, "_limiter", limiter)
+    monkeypatch.setattr(rate_limit, "budget_for", lambda model: (RPM, TPM))
+    _try(limiter, "a")
+    waits, polls = [], []
+
+    def should_cancel():
+        polls.append(clock.now)
+        return len(polls) == 3
+
+    with pytest.raises(RateLimitWaitCancelled):
+        rate_limit.acquire(MODEL, 100, on_wait=waits.append, should_cancel=should_cancel)
+
+    assert waits == [60000]
+    assert list(limiter._queues[MODEL]) == []
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from teamflow_fastapi import storage, storage_memory, tasks
+
+
+@pytest.fixture
+def clock(clock, memory_backend):
+    """Lease expiry is read from the memory backend's clock."""
+    return clock.patch(storage_memory)
+
+
+@pytest.fixture(autouse=True)
+def canned_nodes(monkeypatch):
+    """Every node writes a fixed artifact instead of calling a model."""
+
+    def run(run_id, node, inputs):
+        return {name: f"# {name} by {node.name}" for name in node.outputs}
+
+    for kind in list(tasks._NODE_RUNNERS):
+        monkeypatch.setitem(tasks._NODE_RUNNERS, kind, run)
+
+
+def _event_types(run_id: str):
+    return [json.loads(raw)["type"] for raw in storage.get_events(run_id)]
+
+
+def test_run_waiting_for_finalize_is_not_resumed(clock):
+    storage.init_run("r1", "A task tracker")
+    tasks.orchestrate_run.run("r1")
+    assert storage.get_run_status("r1") == "running"
+
+    # finalize sits in a busy lane for well past the run lease.
+    clock.advance(tasks.TEAMFLOW_RUN_LEASE_SECONDS * 5)
+
+    assert tasks.recover_stale_runs.run() == []
+    assert "run_recovering" not in _event_types("r1")
+    assert storage.count_active_runs() == 1  # still counts against admission limits
+
+    tasks.finalize.run("r1")
+    assert storage.get_run_status("r1") == "completed"
+    assert storage.count_active_runs() == 0
+    assert _event_types("r1").count("run_completed") == 1
+
+
+def test_finalize_that_never_arrives_is_recovered(clock):
+    storage.init_run("r1", "A task tracker")
+    tasks.orchestrate_run.run("r1")
+
+    clock.advance(tasks.TEAMFLOW_FINALIZE_LEASE_SECONDS + 1)
+
+    assert tasks.recover_stale_runs.run() == ["r1"]
+    assert storage.get_run_status("r1") == "completed"
+    assert "run_resumed" in _event_types("r1")
+
+
+def test_run_whose_worker_died_is_resumed(clock):
+    storage.init_run("r1", "A task tracker")
+    storage.transition_run("r1", run_status="running", steps={"pm": "running"})
+    storage.touch_active_run("r1", tasks.TEAMFLOW_RUN_LEASE_SECONDS)
+
+    clock.advance(tasks.TEAMFLOW_RUN_LEASE_SECONDS + 1)
+
+    assert tasks.recover_stale_runs.run() == ["r1"]
+    assert storage.get_run_status("r1") == "completed"
+    events = _event_types("r1")
+    assert events.count("run_recovering") == 1 and events.count("run_resumed") == 1
+    assert storage.count_active_runs() == 0
@@ -0,0 +1,62 @@
+import pytest
+
+from teamflow_fastapi import similarity, storage_redis
+from teamflow_fastapi.similarity import MemoryIndex, RedisIndex, signature
+
+IDEA = "A shared task tracker for small teams with due dates and reminders"
+
+
+@pytest.fixture
+def clock(clock):
+    return clock.patch(similarity)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def index(request):
+    if request.param == "memory":
+        return MemoryIndex()
+    request.getfixturevalue("fake_redis")
+    return RedisIndex()
+
+
+def test_near_duplicate_is_a_candidate(index):
+    index.add("r1", signature(IDEA))
+    index.add("r2", signature("Recipe planner with a weekly grocery list"))
+
+    found = index.candidates(signature(IDEA + "!"))
+
+    assert "r1" in found
+    assert "r2" not in found
+    assert similarity.similarity(found["r1"], signature(IDEA)) == 1.0
+
+
+def test_redis_buckets_are_capped(fake_redis, clock, monkeypatch):
+    monkeypatch.setattr(similarity, "TEAMFLOW_SIMILARITY_MAX_BUCKET", 3)
+    index = RedisIndex()
+    sig = signature(IDEA)
+    for n in range(5):
+        clock.advance(1)
+        index.add(f"r{n}", sig)
+
+    buckets = list(fake_redis.scan_iter(match="teamflow:simidx:[0-9]*"))
+    assert len(buckets) == similarity.BANDS
+    for key in buckets:
+        assert fake_redis.zrange(key, 0, -1) == ["r2", "r3", "r4"]
+    assert sorted(index.candidates(sig)) == ["r2", "r3", "r4"]
+
+
+def test_redis_buckets_drop_runs_older_than_the_ttl(fake_redis, clock):
+    index = RedisIndex()
+    sig = signature(IDEA)
+    index.add("old", sig)
+    clock.advance(storage_redis.REDIS_TTL_SECONDS + 1)
+
+    # Out of the lookup window before any trim ...
+    assert index.candidates(sig) == {}
+    index.add("new", sig)
+    # ... and out of the bucket after the next add.
+    buckets = list(fake_redis.scan_iter(match="teamflow:simidx:[0-9]*"))
+    assert len(buckets) == similarity.BANDS
+    for key in buckets:
+        assert fake_redis.zrange(key, 0, -1) == ["new"]
+        assert fake_redis.ttl(key) > 0
@@ -0,0 +1,121 @@
+import pytest
+
+from teamflow_fastapi import storage_redis
+from teamflow_fastapi.storage_redis import RedisBackend, migrate_all_runs, migrate_run_layout
+
+# Big enough to be stored compressed, so the migration has to copy raw bytes.
+LONG_PRD = "# Product Requirements (PRD)\n\n" + "- Users can share task lists.\n" * 200
+
+
+@pytest.fixture
+def split_run(fake_redis, monkeypatch):
+    """A run written in the split layout; returns the fakeredis client."""
+    monkeypatch.setattr(storage_redis, "COMPACT_LAYOUT", False)
+    backend = RedisBackend()
+    backend.init_run("r1", "A task tracker")
+    backend.set_run_meta("r1", {"lane": "fast", "fast_mode": "1"})
+    backend.transition_run(
+        "r1", run_status="running", steps={"pm": "completed"}, events=[{"type": "run_started"}]
+    )
+    backend.set_artifact("r1", "prd", LONG_PRD)
+    backend.set_artifact("r1", "arch", "# System Architecture")
+    fake_redis.expire(storage_redis._meta_key("r1"), 1234)
+    monkeypatch.setattr(storage_redis, "COMPACT_LAYOUT", True)
+    return fake_redis
+
+
+def _split_keys(run_id: str):
+    return [
+        storage_redis._meta_key(run_id),
+        storage_redis._idea_key(run_id),
+        storage_redis._step_key(run_id),
+        storage_redis._artifact_key(run_id, "prd"),
+        storage_redis._artifact_key(run_id, "arch"),
+    ]
+
+
+def test_prd_is_stored_compressed(split_run):
+    raw = storage_redis.get_binary_redis().hget(storage_redis._run_key("r1"), "a:prd")
+    assert raw is None  # not migrated yet
+    stored = storage_redis.get_binary_redis().get(storage_redis._artifact_key("r1", "prd"))
+    assert stored[:1] == b"\x00"
+
+
+def test_migrate_all_runs_moves_everything_into_one_hash(split_run):
+    assert migrate_all_runs() == 1
+
+    assert split_run.exists(*_split_keys("r1")) == 0
+    backend = RedisBackend()
+    assert backend.get_run_status("r1") == "running"
+    assert backend.get_idea("r1") == "A task tracker"
+    meta = backend.get_run_meta("r1")
+    assert meta["lane"] == "fast" and meta["fast_mode"] == "1"
+    assert backend.get_step_statuses("r1")["pm"] == "completed"
+    assert backend.get_artifact("r1", "prd") == LONG_PRD
+    assert backend.get_artifact("r1", "arch") == "# System Architecture"
+    assert backend.list_artifacts("r1")["test"] is False
+    # The event stream is shared by both layouts and stays where it was.
+    assert len(backend.get_events("r1")) == 1
+    # The run keeps the TTL it had, not a fresh one.
+    assert 0 < split_run.ttl(storage_redis._run_key("r1")) <= 1234
+
+
+def test_first_read_migrates_lazily(split_run):
+    snapshot = RedisBackend().get_run_snapshot("r1")
+
+    assert snapshot["meta"]["status"] == "running"
+    assert snapshot["steps"]["pm"] == "completed"
+    assert snapshot["artifacts"]["prd"] is True
+    assert split_run.exists(*_split_keys("r1")) == 0
+
+
+def test_writes_apply_after_migration(split_run):
+    migrate_all_runs()
+    backend = RedisBackend()
+
+    backend.set_run_status("r1", "completed")
+    backend.set_step_status("r1", "review", "skipped")
+    assert backend.get_run_status("r1") == "completed"
+    assert backend.get_step_statuses("r1")["review"] == "skipped"
+    assert split_run.exists(*_split_keys("r1")) == 0
+
+
+def test_transitions_apply_after_migration(split_run):
+    migrate_all_runs()
+    backend = RedisBackend()
+
+    assert backend.transition_run("r1", run_status="completed", steps={"review": "skipped"})
+    assert not backend.transition_run("r1", run_status="running")
+    assert backend.get_run_status("r1") == "completed"
+    assert backend.get_step_statuses("r1")["review"] == "skipped"
+
+
+def test_writes_apply_after_migration(split_run):
+    migrate_all_runs()
+    backend = RedisBackend()
+
+    backend.set_run_status("r1", "completed")
+    backend.set_step_status("r1", "review", "skipped")
+    assert backend.get_run_status("r1") == "completed"
+    assert backend.get_step_statuses("r1")["review"] == "skipped"
+    assert split_run.exists(*_split_keys("r1")) == 0
+
+
+def test_transitions_apply_after_migration(split_run):
+    migrate_all_runs()
+    backend = RedisBackend()
+
+    assert backend.transition_run("r1", run_status="completed", steps={"review": "skipped"})
+    assert not backend.transition_run("r1", run_status="running")
+    assert backend.get_run_status("r1") == "completed"
+    assert backend.get_step_statuses("r1")["review"] == "skipped"
+
+
+def test_migrating_unknown_or_compact_run_is_a_no_op(split_run):
+    assert migrate_run_layout("missing") is False
+    assert migrate_run_layout("r1") is True
+    assert migrate_run_layout("r1") is False
+    assert migrate_all_runs() == 0
+
+
+
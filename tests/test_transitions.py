@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from teamflow_fastapi import storage
+from teamflow_fastapi.storage_base import RUN_TRANSITIONS
+
+STATUSES = sorted(RUN_TRANSITIONS)
+
+
+def _run_in(run_id: str, status: str) -> None:
+    storage.init_run(run_id, "An idea")
+    storage.set_run_status(run_id, status)
+
+
+@pytest.mark.parametrize("target", STATUSES)
+@pytest.mark.parametrize("current", STATUSES)
+def test_transition_matrix(backend, current, target):
+    _run_in("r1", current)
+    allowed = target in RUN_TRANSITIONS[current]
+
+    applied = storage.transition_run(
+        "r1",
+        run_status=target,
+        steps={"pm": "running"},
+        events=[{"type": "probe"}],
+    )
+
+    assert applied is allowed
+    assert storage.get_run_status("r1") == (target if allowed else current)
+    # A refused transition writes nothing: no step change, no event.
+    assert storage.get_step_statuses("r1")["pm"] == ("running" if allowed else "pending")
+    assert len(storage.get_events("r1")) == (1 if allowed else 0)
+
+
+def test_cancelled_run_cannot_go_back_to_running(backend):
+    _run_in("r1", "cancelled")
+
+    assert not storage.transition_run("r1", run_status="running")
+    assert storage.get_run_status("r1") == "cancelled"
+    # Regenerate goes through queued instead.
+    assert storage.transition_run("r1", run_status="queued")
+    assert storage.transition_run("r1", run_status="running")
+
+
+def test_require_status_without_status_change(backend):
+    _run_in("r1", "running")
+
+    assert storage.transition_run(
+        "r1", steps={"qa": "completed"}, require_status={"running"}
+    )
+    storage.set_run_status("r1", "cancelled")
+    assert not storage.transition_run(
+        "r1",
+        steps={"review": "completed"},
+        events=[{"type": "step_completed"}],
+        require_status={"running"},
+    )
+
+    steps = storage.get_step_statuses("r1")
+    assert steps["qa"] == "completed"
+    assert steps["review"] == "pending"
+    assert storage.get_events("r1") == []
+
+
+def test_require_status_narrows_allowed_transitions(backend):
+    _run_in("r1", "queued")
+
+    # queued -> running is allowed, but not from the statuses required here.
+    assert not storage.transition_run("r1", run_status="running", require_status={"running"})
+    assert storage.transition_run("r1", run_status="running", require_status={"queued"})
+
+
+def test_events_keep_order(backend):
+    _run_in("r1", "queued")
+
+    storage.transition_run(
+        "r1",
+        run_status="running",
+        events=[{"type": "run_started"}, {"type": "step_started", "step": "pm"}],
+    )
+
+    assert [json.loads(raw)["type"] for raw in storage.get_events("r1")] == [
+        "run_started",
+        "step_started",
+    ]
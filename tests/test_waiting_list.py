@@ -0,0 +1,21 @@
+from teamflow_fastapi import storage
+
+
+def test_waiting_list_positions_and_order(backend):
+    assert [storage.push_waiting_run(run_id) for run_id in ("r1", "r2", "r3")] == [1, 2, 3]
+
+    assert storage.count_waiting_runs() == 3
+    assert storage.pop_waiting_runs(2) == ["r1", "r2"]
+    assert storage.push_waiting_run("r4") == 2
+    assert storage.pop_waiting_runs(10) == ["r3", "r4"]
+    assert storage.count_waiting_runs() == 0
+
+
+def test_pushing_a_queued_run_again_keeps_its_place(backend):
+    for run_id in ("r1", "r2", "r3"):
+        storage.push_waiting_run(run_id)
+
+    assert storage.push_waiting_run("r1") == 1
+    assert storage.push_waiting_run("r2") == 2
+    assert storage.count_waiting_runs() == 3
+    assert storage.pop_waiting_runs(3) == ["r1", "r2", "r3"]